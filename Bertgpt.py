@@ -1,16 +1,62 @@
-import re
-from transformers import pipeline
-
-# Load models once (no spacy needed!)
-ner_model = pipeline(
-    "ner",
-    model="d4data/biomedical-ner-all",
-    aggregation_strategy="simple"
-)
-classifier = pipeline(
-    "zero-shot-classification",
-    model="typeform/distilbert-base-uncased-mnli"
-)
+from bisect import bisect_right
+
+import config
+import food_kb
+import model_registry
+import segmenter
+
+NER_MODEL_NAME = "d4data/biomedical-ner-all"
+INTENT_MODEL_NAME = "typeform/distilbert-base-uncased-mnli"
+
+# Bump when segmentation / NER / intent output changes
+NLP_VERSION = "2"
+
+def nlp_version():
+    """Everything that affects NLP output, for cache keys."""
+    return f"{NLP_VERSION}|{NER_MODEL_NAME}|{INTENT_MODEL_NAME}|{config.NLP_BACKEND}"
+
+
+# Models are built on first use (see model_registry), not at import time.
+# NLP_BACKEND=onnx swaps in the int8 ONNX Runtime models (onnx_backend).
+def _load_ner_model(backend=None):
+    if (backend or config.NLP_BACKEND) == "onnx":
+        import onnx_backend
+        return onnx_backend.load_pipeline("ner", NER_MODEL_NAME, aggregation_strategy="simple")
+
+    from transformers import pipeline
+    return pipeline(
+        "ner",
+        model=NER_MODEL_NAME,
+        aggregation_strategy="simple"
+    )
+
+def _load_classifier(backend=None):
+    if (backend or config.NLP_BACKEND) == "onnx":
+        import onnx_backend
+        return onnx_backend.load_pipeline("zero-shot-classification", INTENT_MODEL_NAME)
+
+    from transformers import pipeline
+    return pipeline(
+        "zero-shot-classification",
+        model=INTENT_MODEL_NAME
+    )
+
+model_registry.register("biomedical_ner", _load_ner_model)
+model_registry.register("intent_classifier", _load_classifier)
+
+def get_ner_model():
+    return model_registry.get("biomedical_ner")
+
+def get_classifier():
+    return model_registry.get("intent_classifier")
+
+def __getattr__(name):
+    # Keep `Bertgpt.ner_model` / `Bertgpt.classifier` working, lazily
+    if name == "ner_model":
+        return get_ner_model()
+    if name == "classifier":
+        return get_classifier()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 LABELS = [
     "diagnosis",
@@ -19,33 +65,207 @@ LABELS = [
     "lifestyle advice"
 ]
 
+# Sentences per forward pass; batches are length-sorted so padding stays small
+NER_BATCH_SIZE = 16
+
+# Windowed NER over a whole document: window length (capped by the model)
+# and tokens shared by consecutive windows
+NER_WINDOW_TOKENS = 512
+NER_WINDOW_OVERLAP = 128
+
+# Same hypothesis the zero-shot pipeline uses by default
+HYPOTHESIS_TEMPLATE = "This example is {}."
+# (sentence, hypothesis) pairs per forward pass
+INTENT_BATCH_SIZE = 32
+
 def clean_and_segment(text):
-    """Clean and segment text without spacy - using regex instead"""
-    text = text.lower()
-    text = re.sub(r"[^a-zA-Z0-9., ]", "", text)
-    
-    # Simple sentence splitting using regex (replaces spacy)
-    # Split on . ! ? followed by space or end of string
-    sentences = re.split(r'[.!?]+\s+', text)
-    
-    # Clean and filter sentences
-    sentences = [s.strip() for s in sentences if len(s.strip()) > 5]
-    
-    return sentences
-
-def extract_entities(sentences):
+    """Clean and segment text without spacy (see segmenter); numbers,
+    ranges and units such as "70-100 mg/dl" or "7.2%" are kept"""
+    return segmenter.sentences(text)
+
+def clean_and_segment_stream(chunks):
+    """clean_and_segment over text arriving in pieces (e.g. PDF pages from
+    extractor.extract_text_stream); yields each sentence once its piece
+    completes it"""
+    stream = segmenter.Segmenter()
+    for chunk in chunks:
+        for _, _, sentence in stream.feed(chunk):
+            yield sentence
+    for _, _, sentence in stream.close():
+        yield sentence
+
+def extract_entities(sentences, batch_size=NER_BATCH_SIZE):
+    """Batched NER over all sentences.
+
+    Sentences are sorted by length before batching so each batch pads to a
+    similar size, then results are put back in document order. Every entity
+    dict gets a ``sentence_index`` pointing back into ``sentences``.
+    """
+    if not sentences:
+        return []
+
+    ner_model = get_ner_model()
+    order = sorted(range(len(sentences)), key=lambda i: len(sentences[i]))
+    per_sentence = [[] for _ in sentences]
+
+    for start in range(0, len(order), batch_size):
+        chunk = order[start:start + batch_size]
+        outputs = ner_model([sentences[i] for i in chunk], batch_size=batch_size)
+        for i, out in zip(chunk, outputs):
+            per_sentence[i] = out
+
     entities = []
-    for s in sentences:
-        entities.extend(ner_model(s))
+    for i, out in enumerate(per_sentence):
+        for e in out:
+            entities.append({**e, "sentence_index": i})
+    return entities
+
+def _group_tokens(text, tokens, id2label):
+    """Merge consecutive tokens with the same entity type into spans, like
+    the pipeline's "simple" aggregation. ``tokens`` is a start-sorted list
+    of (start, end, label id, score)."""
+    entities, current = [], None
+    for start, end, label_id, score in tokens:
+        label = id2label[label_id]
+        if label == "O":
+            current = None
+            continue
+        tag, _, group = label.partition("-") if "-" in label else ("I", "", label)
+        if current is not None and current["entity_group"] == group and tag != "B":
+            current["end"] = end
+            current["scores"].append(score)
+            continue
+        current = {"entity_group": group, "start": start, "end": end, "scores": [score]}
+        entities.append(current)
+
+    for e in entities:
+        scores = e.pop("scores")
+        e["score"] = sum(scores) / len(scores)
+        e["word"] = text[e["start"]:e["end"]].lower()
     return entities
 
-def classify_intents(sentences):
+def extract_entities_windowed(text, window=None, overlap=None, batch_size=NER_BATCH_SIZE):
+    """NER over a whole document in overlapping token windows.
+
+    The text is tokenized once; windows of ``window`` tokens, each sharing
+    ``overlap`` tokens with the previous one, run through the model in
+    batches, so cost grows linearly with the document and nothing past the
+    model's length limit is dropped. A token seen by two windows takes the
+    prediction from the window where it is furthest from the edge; tokens
+    are then merged into entity spans by character offset. ``start``/``end``
+    index ``text`` and ``sentence_index`` points into
+    ``clean_and_segment(text)`` (None between sentences).
+    """
+    if not text or not text.strip():
+        return []
+    import torch
+
+    ner_model = get_ner_model()
+    tokenizer, model = ner_model.tokenizer, ner_model.model
+    window = min(window or NER_WINDOW_TOKENS, tokenizer.model_max_length)
+    overlap = min(overlap or NER_WINDOW_OVERLAP, window // 2)
+
+    encoded = tokenizer(
+        text,
+        truncation=True,
+        max_length=window,
+        stride=overlap,
+        return_overflowing_tokens=True,
+        return_offsets_mapping=True
+    )
+    best = {}  # (start, end) -> (distance to window edge, label id, score)
+    for first in range(0, len(encoded["input_ids"]), batch_size):
+        rows = range(first, min(first + batch_size, len(encoded["input_ids"])))
+        width = max(len(encoded["input_ids"][r]) for r in rows)
+        input_ids = torch.full((len(rows), width), tokenizer.pad_token_id or 0, dtype=torch.long)
+        attention_mask = torch.zeros((len(rows), width), dtype=torch.long)
+        for b, r in enumerate(rows):
+            ids = encoded["input_ids"][r]
+            input_ids[b, :len(ids)] = torch.tensor(ids)
+            attention_mask[b, :len(ids)] = 1
+        with torch.no_grad():
+            logits = model(input_ids=input_ids, attention_mask=attention_mask).logits
+            probs = torch.softmax(logits, dim=-1)
+        scores, labels = probs.max(dim=-1)
+
+        for b, r in enumerate(rows):
+            sequence_ids = encoded.sequence_ids(r)
+            positions = [j for j, sid in enumerate(sequence_ids) if sid is not None]
+            if not positions:
+                continue
+            lo, hi = positions[0], positions[-1]
+            for j in positions:
+                span = tuple(encoded["offset_mapping"][r][j])
+                distance = min(j - lo, hi - j)
+                if span not in best or distance > best[span][0]:
+                    best[span] = (distance, int(labels[b, j]), float(scores[b, j]))
+
+    tokens = sorted((start, end, label, score) for (start, end), (_, label, score) in best.items())
+    entities = _group_tokens(text, tokens, model.config.id2label)
+
+    spans = [(start, end) for start, end, _ in segmenter.sentences_with_spans(text)]
+    starts = [start for start, _ in spans]
+    for e in entities:
+        i = bisect_right(starts, e["start"]) - 1
+        e["sentence_index"] = i if i >= 0 and e["start"] < spans[i][1] else None
+    return entities
+
+def _entailment_id(model):
+    for idx, label in model.config.id2label.items():
+        if label.lower().startswith("entail"):
+            return int(idx)
+    return -1
+
+def classify_intents(sentences, entities=None, batch_size=INTENT_BATCH_SIZE):
+    """Zero-shot intent classification for a whole document in one pass.
+
+    All (sentence, label hypothesis) pairs are built up front and scored in
+    length-sorted padded batches. Per sentence the entailment logits are
+    softmaxed across LABELS, matching the single-label zero-shot pipeline.
+    If ``entities`` from extract_entities is given, sentences without any
+    entity are skipped.
+    """
+    indices = list(range(len(sentences)))
+    if entities is not None:
+        with_entities = {e["sentence_index"] for e in entities}
+        indices = [i for i in indices if i in with_entities]
+    if not indices:
+        return []
+
+    import torch
+
+    classifier = get_classifier()
+    tokenizer = classifier.tokenizer
+    model = classifier.model
+    entail_id = _entailment_id(model)
+    hypotheses = [HYPOTHESIS_TEMPLATE.format(label) for label in LABELS]
+
+    pairs = [(i, j) for i in indices for j in range(len(LABELS))]
+    pairs.sort(key=lambda p: len(sentences[p[0]]))
+
+    logits = {}
+    with torch.no_grad():
+        for start in range(0, len(pairs), batch_size):
+            chunk = pairs[start:start + batch_size]
+            inputs = tokenizer(
+                [sentences[i] for i, _ in chunk],
+                [hypotheses[j] for _, j in chunk],
+                padding=True,
+                truncation="only_first",
+                return_tensors="pt"
+            ).to(model.device)
+            out = model(**inputs).logits[:, entail_id].tolist()
+            for pair, value in zip(chunk, out):
+                logits[pair] = value
+
     results = []
-    for s in sentences:
-        out = classifier(s, LABELS)
+    for i in indices:
+        scores = torch.tensor([logits[i, j] for j in range(len(LABELS))]).softmax(-1).tolist()
+        best = max(range(len(LABELS)), key=scores.__getitem__)
         results.append({
-            "sentence": s,
-            "intent": out["labels"][0]
+            "sentence": sentences[i],
+            "intent": LABELS[best],
+            "scores": dict(zip(LABELS, scores))
         })
     return results
 
@@ -71,14 +291,15 @@ def build_structured_intent(entities, intents):
     return structured
 
 def generate_diet_guidelines(intent):
+    """Guidelines for the detected diseases; food lists come from the
+    condition → food rules knowledge base (see food_kb)."""
     disease = ", ".join(intent["diseases"]) if intent["diseases"] else "General"
     diet = ", ".join(intent["diet_advice"]) if intent["diet_advice"] else "No specific advice"
     lifestyle = ", ".join(intent["lifestyle_advice"]) if intent["lifestyle_advice"] else "No specific advice"
 
     return {
         "condition": disease,
-        "allowed_foods": ["vegetables", "whole grains", "fruits"],
-        "restricted_foods": ["sugar", "fried food", "junk food"],
         "diet_plan": f"Follow a balanced diet. {diet}",
-        "lifestyle_advice": lifestyle
+        "lifestyle_advice": lifestyle,
+        **food_kb.get_kb().guidelines(intent["diseases"])
     }
@@ -0,0 +1,106 @@
+"""Aho-Corasick automaton for matching many phrases in one linear scan.
+
+Used by lab_extractor (analyte names), lexicon (disease / food terms),
+food_kb (condition names) and nutrition (food names).
+Patterns are added with a value, ``build()`` computes the failure links,
+and ``finditer`` reports every (start, end, value) occurrence in a single
+pass over the text, however many patterns there are. Matching is on the
+exact characters given, so callers lower-case both sides.
+
+The automaton is plain lists and dicts (see ``to_data`` / ``from_data``),
+so it can be written with marshal and loaded without rebuilding.
+"""
+from collections import deque
+
+
+def _is_word_char(c):
+    return c.isalnum() or c == "_"
+
+
+class Automaton:
+    def __init__(self):
+        self.goto = [{}]      # state -> {char: next state}
+        self.fail = [0]
+        self.out = [[]]       # state -> [(pattern length, value)] ending here
+        self.built = False
+
+    def add(self, pattern, value):
+        state = 0
+        for c in pattern:
+            next_state = self.goto[state].get(c)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][c] = next_state
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append([])
+            state = next_state
+        self.out[state].append((len(pattern), value))
+        self.built = False
+
+    def build(self):
+        queue = deque(self.goto[0].values())
+        for state in queue:
+            self.fail[state] = 0
+        while queue:
+            state = queue.popleft()
+            for c, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and c not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(c, 0)
+                self.fail[next_state] = target if target != next_state else 0
+                # inherit matches of the longest proper suffix
+                self.out[next_state] = self.out[next_state] + self.out[self.fail[next_state]]
+        self.built = True
+        return self
+
+    def finditer(self, text, whole_words=True):
+        """Yield (start, end, value) for every occurrence, ordered by end.
+
+        With ``whole_words`` a match must not start or end inside a word.
+        """
+        if not self.built:
+            self.build()
+        goto, fail, out = self.goto, self.fail, self.out
+        state = 0
+        for i, c in enumerate(text):
+            while state and c not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(c, 0)
+            if not out[state]:
+                continue
+            end = i + 1
+            for length, value in out[state]:
+                start = end - length
+                if whole_words and (
+                    (start > 0 and _is_word_char(text[start - 1]) and _is_word_char(text[start]))
+                    or (end < len(text) and _is_word_char(text[end]) and _is_word_char(text[end - 1]))
+                ):
+                    continue
+                yield start, end, value
+
+    def longest(self, text, whole_words=True):
+        """Leftmost-longest, non-overlapping matches as (start, end, value)."""
+        matches = sorted(self.finditer(text, whole_words), key=lambda m: (m[0], -m[1]))
+        chosen, last_end = [], 0
+        for start, end, value in matches:
+            if start >= last_end:
+                chosen.append((start, end, value))
+                last_end = end
+        return chosen
+
+    def to_data(self):
+        if not self.built:
+            self.build()
+        return {"goto": self.goto, "fail": self.fail, "out": self.out}
+
+    @classmethod
+    def from_data(cls, data):
+        automaton = cls()
+        automaton.goto = data["goto"]
+        automaton.fail = data["fail"]
+        automaton.out = [[tuple(match) for match in matches] for matches in data["out"]]
+        automaton.built = True
+        return automaton
@@ -0,0 +1,336 @@
+"""HTTP API (plain ASGI) around DietPipeline.
+
+    uvicorn api:app            or   python -m dietplanner serve
+
+Endpoints (JSON in, JSON out):
+
+    POST /analyze  {"filename": "report.pdf", "content_base64": "..."}
+                   or {"text": "...", "numeric_data": {...}}
+                   -> entities, intents, guidelines, risk prediction
+    POST /plan     same body as /analyze (runs it first), or
+                   {"guidelines": {...}, "prediction": ...};
+                   "tier": "local" skips the LLM (plan_synth)
+                   -> plan text + parsed days
+    GET  /health   -> scheduler / cache statistics
+
+NER and intent classification for all in-flight requests go through two
+MicroBatchers that share one model thread, so concurrent uploads are
+scored in joint batches instead of contending for the CPU. When a queue
+is full the API answers 503 with Retry-After.
+"""
+import asyncio
+import base64
+import binascii
+import json
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+import lexicon
+import plan_cache
+import result_cache
+import risk_model
+from llm_pool import AsyncLLMPool, make_async_client
+from micro_batch import MicroBatcher, QueueFull
+from pipeline import PLAN_TIERS, AnalysisResult, DietPipeline
+
+MAX_BODY_BYTES = 25 * 1024 * 1024
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or []
+
+
+def _to_json(value):
+    if hasattr(value, "item"):
+        return value.item()
+    if hasattr(value, "__dict__"):
+        return vars(value)
+    return str(value)
+
+
+def _split_by_request(sentence_lists, per_sentence):
+    """Cut a flat per-sentence list back into one list per request."""
+    out, start = [], 0
+    for sentences in sentence_lists:
+        out.append(per_sentence[start:start + len(sentences)])
+        start += len(sentences)
+    return out
+
+
+class DietAPI:
+    def __init__(self, pipeline=None, client=None, max_batch_size=None, max_wait_ms=None,
+                 max_queue=None, llm_concurrency=None):
+        self.pipeline = pipeline
+        self.client = client
+        self.max_batch_size = max_batch_size or config.API_MAX_BATCH_SENTENCES
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else config.API_MAX_WAIT_MS) / 1000
+        self.max_queue = max_queue or config.API_MAX_QUEUE
+        self.llm_concurrency = llm_concurrency
+        self._started = False
+
+    # -----------------------
+    # Lifecycle
+    # -----------------------
+    def _start(self):
+        if self._started:
+            return
+        if self.pipeline is None:
+            try:
+                model = risk_model.load_model()
+            except Exception:
+                model = None
+            self.pipeline = DietPipeline(
+                model=model,
+                client=self.client,
+                cache=result_cache.ResultCache(),
+                plan_cache=plan_cache.PlanCache()
+            )
+        nlp = self.pipeline.nlp
+
+        # One thread for all model work: batches run back to back instead
+        # of fighting over the cores
+        self._model_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="nlp")
+        self.ner_batcher = MicroBatcher(
+            self._ner_batch(nlp), self.max_batch_size, self.max_wait, self.max_queue,
+            executor=self._model_thread, name="ner"
+        )
+        self.intent_batcher = MicroBatcher(
+            self._intent_batch(nlp), self.max_batch_size, self.max_wait, self.max_queue,
+            executor=self._model_thread, name="intents"
+        )
+
+        client = self.client or self.pipeline.client
+        self._async_client = make_async_client(client) if client else None
+        self.llm = AsyncLLMPool(self._async_client, max_concurrency=self.llm_concurrency) \
+            if self._async_client else None
+        self._started = True
+
+    async def _stop(self):
+        if not self._started:
+            return
+        await self.ner_batcher.close()
+        await self.intent_batcher.close()
+        self._model_thread.shutdown(wait=False)
+        if self._async_client is not None:
+            await self._async_client.close()
+        self._started = False
+
+    @staticmethod
+    def _ner_batch(nlp):
+        def run(sentence_lists):
+            flat = [s for sentences in sentence_lists for s in sentences]
+            starts, total = [], 0
+            for sentences in sentence_lists:
+                starts.append(total)
+                total += len(sentences)
+            out = [[] for _ in sentence_lists]
+            for entity in nlp.extract_entities(flat):
+                # last request starting at or before this sentence owns it
+                owner = bisect_right(starts, entity["sentence_index"]) - 1
+                out[owner].append({**entity, "sentence_index": entity["sentence_index"] - starts[owner]})
+            return out
+        return run
+
+    @staticmethod
+    def _intent_batch(nlp):
+        def run(sentence_lists):
+            flat = [s for sentences in sentence_lists for s in sentences]
+            return _split_by_request(sentence_lists, nlp.classify_intents(flat))
+        return run
+
+    # -----------------------
+    # Handlers
+    # -----------------------
+    def _extraction(self, body):
+        if "content_base64" in body:
+            try:
+                data = base64.b64decode(body["content_base64"], validate=True)
+            except (binascii.Error, ValueError):
+                raise HTTPError(400, "content_base64 is not valid base64")
+            filename = body.get("filename")
+            if not filename or "." not in filename:
+                raise HTTPError(400, "filename with an extension is required with content_base64")
+            return self.pipeline.extract(data, filename)
+        if isinstance(body.get("text"), str):
+            return self.pipeline.from_text(body["text"], body.get("numeric_data"))
+        raise HTTPError(400, "send either content_base64 + filename or text")
+
+    async def _lexicon_entities(self, sentences):
+        # the lexicon scan is cheap enough for the event loop; only the
+        # ambiguous sentences (hybrid mode) join the NER micro-batches
+        hybrid = self.pipeline.ner_mode == "hybrid"
+        entities, ambiguous = lexicon.get_lexicon().tag(sentences, hybrid=hybrid)
+        if hybrid and ambiguous:
+            model_entities = await self.ner_batcher.submit([sentences[i] for i in ambiguous])
+            entities = lexicon.merge_model_entities(entities, ambiguous, model_entities)
+        return entities
+
+    async def _analyze(self, body):
+        loop = asyncio.get_running_loop()
+        # extraction (pdfplumber, pandas) is CPU work too; keep it off the loop
+        extraction = await loop.run_in_executor(None, self._extraction, body)
+
+        analysis = self.pipeline.cached_analysis(extraction)
+        if analysis is None:
+            sentences, filtered = self.pipeline.segment(extraction.text, extraction.sentences)
+            entities, intents = [], []
+            if filtered.sentences:
+                windowed = self.pipeline.ner_mode == "windowed"
+                if windowed:
+                    # whole-document windows don't mix across requests; run
+                    # them on the model thread between micro-batches
+                    ner = asyncio.get_running_loop().run_in_executor(
+                        self._model_thread, self.pipeline.nlp.extract_entities_windowed, extraction.text
+                    )
+                elif self.pipeline.ner_mode in ("fast", "hybrid"):
+                    ner = self._lexicon_entities(filtered.sentences)
+                else:
+                    ner = self.ner_batcher.submit(filtered.sentences)
+                try:
+                    entities, intents = await asyncio.gather(ner, self.intent_batcher.submit(filtered.sentences))
+                except QueueFull as e:
+                    raise HTTPError(503, str(e), [(b"retry-after", b"1")])
+                if not windowed:
+                    entities = self.pipeline.restore_indices(entities, filtered)
+            analysis = self.pipeline.finish_analysis(extraction, sentences, entities, intents, filtered.removed)
+
+        prediction = self.pipeline.assess(extraction)
+        return extraction, analysis, prediction
+
+    async def analyze(self, body):
+        extraction, analysis, prediction = await self._analyze(body)
+        return {
+            "file_sha256": extraction.file_hash,
+            "characters": len(extraction.text),
+            "numeric_data": extraction.numeric_data,
+            "entities": analysis.entities,
+            "intents": analysis.intents,
+            "filtered": analysis.filtered,
+            "structured": analysis.structured,
+            "guidelines": analysis.guidelines,
+            "prediction": prediction
+        }
+
+    async def plan(self, body):
+        if "guidelines" in body:
+            if not isinstance(body["guidelines"], dict):
+                raise HTTPError(400, "guidelines must be an object")
+            analysis = AnalysisResult([], [], [], {}, body["guidelines"])
+            prediction = body.get("prediction", "Insufficient numerical data")
+            response = {}
+        else:
+            _, analysis, prediction = await self._analyze(body)
+            response = {"guidelines": analysis.guidelines}
+
+        tier = body.get("tier")
+        if tier is not None and tier not in PLAN_TIERS:
+            raise HTTPError(400, f"tier must be one of {list(PLAN_TIERS)}")
+        result = await self.pipeline.plan_async(analysis, prediction, self.llm, tier=tier)
+        response.update({
+            "prediction": prediction,
+            "plan": result.plan,
+            "days": result.days,
+            "error": result.error
+        })
+        return response
+
+    def health(self):
+        return {
+            "status": "ok",
+            "ner": self.ner_batcher.stats(),
+            "intents": self.intent_batcher.stats(),
+            "cache": self.pipeline.cache.stats() if self.pipeline.cache else None,
+            "plan_cache": self.pipeline.plan_cache.stats() if self.pipeline.plan_cache else None
+        }
+
+    # -----------------------
+    # ASGI plumbing
+    # -----------------------
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        self._start()
+        headers = []
+        try:
+            route = (scope["method"], scope["path"].rstrip("/") or "/")
+            if route == ("GET", "/health"):
+                status, payload = 200, self.health()
+            elif route == ("POST", "/analyze"):
+                status, payload = 200, await self.analyze(await self._read_json(receive))
+            elif route == ("POST", "/plan"):
+                status, payload = 200, await self.plan(await self._read_json(receive))
+            elif scope["path"].rstrip("/") in ("/health", "/analyze", "/plan"):
+                raise HTTPError(405, "method not allowed")
+            else:
+                raise HTTPError(404, "not found")
+        except HTTPError as e:
+            status, payload, headers = e.status, {"error": e.message}, e.headers
+        except Exception as e:
+            status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+
+        body = json.dumps(payload, default=_to_json).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode())
+            ] + headers
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def _read_json(self, receive):
+        chunks, size = [], 0
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                raise HTTPError(400, "client disconnected")
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > MAX_BODY_BYTES:
+                raise HTTPError(413, f"body larger than {MAX_BODY_BYTES} bytes")
+            chunks.append(chunk)
+            if not message.get("more_body"):
+                break
+        try:
+            body = json.loads(b"".join(chunks) or b"{}")
+        except json.JSONDecodeError as e:
+            raise HTTPError(400, f"invalid JSON: {e}")
+        if not isinstance(body, dict):
+            raise HTTPError(400, "JSON body must be an object")
+        return body
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    self._start()
+                except Exception as e:
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self._stop()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+def _default_client():
+    import os
+    if not os.getenv("OPENAI_API_KEY"):
+        return None
+    from openai import OpenAI
+    return OpenAI()
+
+
+app = DietAPI(client=_default_client())
@@ -1,26 +1,19 @@
 import streamlit as st
-import joblib
 import os
 import json
 from datetime import datetime
 from dotenv import load_dotenv
 from openai import OpenAI
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib.units import inch
-import io
 
 # your files
-from extractor import extract_text
-from Bertgpt import (
-    clean_and_segment,
-    extract_entities,
-    classify_intents,
-    build_structured_intent,
-    generate_diet_guidelines
-)
+import config
+import model_registry
+import plan_cache
+import result_cache
+import risk_model
+from pdf_report import generate_pdf
+from pipeline import DietPipeline
+from planner import DietPlanParser, parse_diet_plan
 
 # -----------------------
 # Setup
@@ -513,7 +506,7 @@ client = init_openai()
 @st.cache_resource
 def load_model():
     try:
-        return joblib.load("best_model.pkl")
+        return risk_model.load_model()
     except Exception as e:
         st.warning(f"ML Model not loaded: {e}")
         return None
@@ -521,185 +514,100 @@ def load_model():
 model = load_model()
 
 # -----------------------
-# PDF Generator
+# NLP Model Warmup (opt-in)
 # -----------------------
-def generate_pdf(diet_plan_data, patient_info):
-    """Generate a professional PDF of the diet plan"""
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter, topMargin=0.5*inch, bottomMargin=0.5*inch)
-    story = []
-    styles = getSampleStyleSheet()
-    
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#1e3a8a'),
-        spaceAfter=30,
-        alignment=1
-    )
-    
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=16,
-        textColor=colors.HexColor('#0891b2'),
-        spaceAfter=12,
-        spaceBefore=12
-    )
-    
-    story.append(Paragraph("🥗 AI Diet Planner", title_style))
-    story.append(Paragraph("Your Personalized Weekly Diet Plan", styles['Normal']))
-    story.append(Paragraph(f"Generated on: {datetime.now().strftime('%B %d, %Y')}", styles['Normal']))
-    story.append(Spacer(1, 0.3*inch))
-    
-    if patient_info:
-        story.append(Paragraph("Patient Information", heading_style))
-        info_data = [[k, str(v)] for k, v in patient_info.items()]
-        info_table = Table(info_data, colWidths=[2*inch, 4*inch])
-        info_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#e0f2fe')),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#0891b2'))
-        ]))
-        story.append(info_table)
-        story.append(Spacer(1, 0.3*inch))
-    
-    story.append(Paragraph("Your Weekly Diet Plan", heading_style))
-    
-    for line in diet_plan_data.split('\n'):
-        if line.strip():
-            story.append(Paragraph(line, styles['Normal']))
-            story.append(Spacer(1, 0.1*inch))
-    
-    story.append(Spacer(1, 0.5*inch))
-    story.append(Paragraph("Developed by Dhruv Bhalla | AI-Powered Healthcare", styles['Italic']))
-    story.append(Paragraph("⚠️ This is AI-generated guidance, not medical advice. Consult a doctor.", styles['Italic']))
-    
-    doc.build(story)
-    buffer.seek(0)
-    return buffer
+@st.cache_resource
+def warmup_nlp_models():
+    # Set WARMUP_MODELS=1 to load the NER / intent models in the background
+    # at startup instead of on the first report
+    if os.getenv("WARMUP_MODELS", "").lower() in ("1", "true", "yes"):
+        return model_registry.warmup()
+    return None
 
-# -----------------------
-# Parse Diet Plan
-# -----------------------
-def parse_diet_plan(plan_text):
-    """Parse the diet plan text into structured day-by-day format"""
-    days = []
-    current_day = None
-    current_meal = None
-    
-    lines = plan_text.split('\n')
-    
-    for line in lines:
-        line = line.strip()
-        if not line or line in ['---', '***', '___']:
-            continue
-        
-        line_lower = line.lower()
-        
-        day_keywords = ['day 1', 'day 2', 'day 3', 'day 4', 'day 5', 'day 6', 'day 7',
-                        'day one', 'day two', 'day three', 'day four', 'day five', 'day six', 'day seven']
-        
-        if any(keyword in line_lower for keyword in day_keywords):
-            if current_day:
-                days.append(current_day)
-            current_day = {
-                'title': line,
-                'breakfast': '',
-                'lunch': '',
-                'dinner': '',
-                'snacks': '',
-                'notes': ''
-            }
-            current_meal = None
-            continue
-        
-        if current_day:
-            if 'breakfast' in line_lower or 'morning meal' in line_lower:
-                current_meal = 'breakfast'
-                continue
-            elif 'lunch' in line_lower or 'afternoon meal' in line_lower or 'mid-day' in line_lower:
-                current_meal = 'lunch'
-                continue
-            elif 'dinner' in line_lower or 'evening meal' in line_lower or 'night' in line_lower:
-                current_meal = 'dinner'
-                continue
-            elif 'snack' in line_lower or 'mid-meal' in line_lower:
-                current_meal = 'snacks'
-                continue
-            elif any(word in line_lower for word in ['note', 'tip', 'important', 'remember', 'hydration']):
-                current_meal = 'notes'
-            
-            if current_meal:
-                line = line.replace('**', '').replace('*', '').strip()
-                if line and not line.startswith('#'):
-                    current_day[current_meal] += line + '\n'
-    
-    if current_day:
-        days.append(current_day)
-    
-    return days
+warmup_nlp_models()
 
 # -----------------------
-# Diet Plan Generator
+# Result Cache
 # -----------------------
-def generate_week_plan(structured, prediction):
-    if not client:
-        return "⚠️ OpenAI API not configured. Please add OPENAI_API_KEY."
-
-    prompt = f"""
-You are an expert clinical nutritionist creating a personalized Indian diet plan.
-
-Patient Information:
-- Condition: {structured.get('condition', 'General')}
-- Health Risk Score: {prediction}
-- Detected Issues: {', '.join(structured.get('diseases', ['None']))}
-
-Create a DETAILED 7-day Indian diet plan. For EACH day from Day 1 to Day 7, provide:
-
-**Day [Number]**
-
-**Breakfast:**
-- Specific items with quantities (e.g., 2 chapatis, 1 cup dal, etc.)
-
-**Lunch:**
-- Specific items with quantities
-
-**Dinner:**
-- Specific items with quantities
+@st.cache_resource
+def get_result_cache():
+    return result_cache.ResultCache()
 
-**Snacks (Optional):**
-- Healthy between-meal options
+cache = get_result_cache()
 
-**Important Notes:**
-- Hydration reminders
-- Timing suggestions
+@st.cache_resource
+def get_plan_cache():
+    return plan_cache.PlanCache()
 
-At the end, include:
-- Foods to COMPLETELY AVOID
-- Foods to PREFER and increase
-- General nutritional guidelines
+plans = get_plan_cache()
 
-Use simple, home-cooked Indian foods. Be very specific about portions.
+# -----------------------
+# Pipeline
+# -----------------------
+@st.cache_resource
+def get_pipeline():
+    return DietPipeline(model=model, client=client, cache=cache, plan_cache=plans)
 
-IMPORTANT: This is dietary guidance, not medical advice.
-"""
+pipeline = get_pipeline()
 
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3,
-            max_tokens=2000
-        )
-        return response.choices[0].message.content
-    except Exception as e:
-        return f"⚠️ Error generating diet plan: {str(e)}"
+# -----------------------
+# Day Card Renderer
+# -----------------------
+def render_day(day):
+    """Render one parsed day as a card with meal columns"""
+    st.markdown(f"""
+    <div class="day-card">
+        <h3>📅 {day['title']}</h3>
+    """, unsafe_allow_html=True)
+    
+    meal_col1, meal_col2, meal_col3 = st.columns(3)
+    
+    with meal_col1:
+        st.markdown(f"""
+        <div class="meal-section">
+            <h4>🌅 Breakfast</h4>
+            <p>{day['breakfast'].strip() if day['breakfast'].strip() else 'Similar to Day 1'}</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with meal_col2:
+        st.markdown(f"""
+        <div class="meal-section">
+            <h4>☀️ Lunch</h4>
+            <p>{day['lunch'].strip() if day['lunch'].strip() else 'Similar to Day 1'}</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with meal_col3:
+        st.markdown(f"""
+        <div class="meal-section">
+            <h4>🌙 Dinner</h4>
+            <p>{day['dinner'].strip() if day['dinner'].strip() else 'Similar to Day 1'}</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    if day['snacks'].strip() or day['notes'].strip():
+        notes_col1, notes_col2 = st.columns(2)
+    
+        if day['snacks'].strip():
+            with notes_col1:
+                st.markdown(f"""
+                <div class="meal-section">
+                    <h4>🍎 Snacks</h4>
+                    <p>{day['snacks'].strip()}</p>
+                </div>
+                """, unsafe_allow_html=True)
+    
+        if day['notes'].strip():
+            with notes_col2:
+                st.markdown(f"""
+                <div class="meal-section">
+                    <h4>📝 Notes</h4>
+                    <p>{day['notes'].strip()}</p>
+                </div>
+                """, unsafe_allow_html=True)
+    
+    st.markdown('</div>', unsafe_allow_html=True)
 
 # -----------------------
 # Sidebar
@@ -725,6 +633,14 @@ with st.sidebar:
     Healthcare Tech Innovator
     """)
     
+    st.markdown("### 🛠️ Options")
+    stream_plan = st.checkbox("Show each day as soon as it is written", value=True)
+    parallel_plan = st.checkbox(
+        "Generate days in parallel",
+        value=False,
+        help="One shorter request per day, sent concurrently. Faster and never cut off, but days are not streamed."
+    )
+    
     st.markdown("### ⚙️ System Status")
     if model:
         st.success("✅ ML Model: Loaded")
@@ -735,6 +651,23 @@ with st.sidebar:
         st.success("✅ OpenAI API: Connected")
     else:
         st.error("❌ OpenAI API: Not connected")
+        if config.PLAN_FALLBACK == "kb":
+            st.caption("Plans are built from the local food knowledge base instead.")
+
+    cache_stats = cache.stats()
+    cache_hits = sum(t["hits"] for t in cache_stats.values())
+    cache_lookups = cache_hits + sum(t["misses"] for t in cache_stats.values())
+    st.caption(f"🗄️ Result cache: {cache_hits}/{cache_lookups} hits")
+    plan_stats = plans.stats()
+    st.caption(f"🍱 Plan cache: {plan_stats['hit_rate']:.0%} hit rate, {plan_stats['entries']} plans stored")
+
+    for name, info in model_registry.stats().items():
+        if info.get("error"):
+            st.warning(f"⚠️ {name}: {info['error']}")
+        elif info["loaded"]:
+            st.caption(f"🧠 {name}: loaded in {info['load_seconds']:.1f}s, +{info['rss_delta_mb']:.0f} MB")
+        else:
+            st.caption(f"💤 {name}: loads on first use")
 
 # -----------------------
 # Main App
@@ -766,7 +699,8 @@ if uploaded_file:
             status_text.info("📄 Extracting text from document...")
             progress_bar.progress(15)
             
-            text, numeric_data = extract_text(uploaded_file)
+            extraction = pipeline.extract(uploaded_file)
+            text = extraction.text
             
             if not text or len(text.strip()) < 10:
                 st.error("❌ Could not extract meaningful text from the file.")
@@ -785,17 +719,15 @@ if uploaded_file:
             status_text.info("🧠 Analyzing medical information...")
             progress_bar.progress(35)
             
-            sentences = clean_and_segment(text)
-            progress_bar.progress(45)
-            
-            entities = extract_entities(sentences)
-            progress_bar.progress(55)
-            
-            intents = classify_intents(sentences)
-            progress_bar.progress(65)
-            
-            structured = build_structured_intent(entities, intents)
-            guidelines = generate_diet_guidelines(structured)
+            nlp_progress = {"segment": 45, "entities": 55, "intents": 65}
+            analysis = pipeline.analyze(extraction, progress=lambda stage: progress_bar.progress(nlp_progress[stage]))
+            entities = analysis.entities
+            guidelines = analysis.guidelines
+            if analysis.filtered and sum(analysis.filtered.values()):
+                st.caption(
+                    f"Skipped {sum(analysis.filtered.values())} of {len(analysis.sentences)} sentences "
+                    f"before analysis (repeated headers, boilerplate, table rows)"
+                )
             
             with stat_col2:
                 st.markdown(f"""
@@ -810,21 +742,34 @@ if uploaded_file:
             status_text.info("📊 Running health assessment...")
             progress_bar.progress(80)
             
-            if numeric_data and model:
-                try:
-                    features = [[float(v) if isinstance(v, (int, float, str)) and str(v).replace('.','',1).replace('-','',1).isdigit() else 0 for v in numeric_data.values()]]
-                    prediction = model.predict(features)[0]
-                except Exception as e:
-                    prediction = f"Could not generate prediction: {str(e)}"
-            else:
-                prediction = "Insufficient numerical data"
+            prediction = pipeline.assess(extraction)
             
             progress_bar.progress(85)
             
             status_text.info("🥗 Generating diet plan...")
             progress_bar.progress(90)
             
-            plan = generate_week_plan(guidelines, prediction)
+            if parallel_plan:
+                plan = pipeline.plan(analysis, prediction, mode="parallel").plan
+            elif stream_plan and client:
+                # render days while the rest of the plan is still streaming
+                live_plan = st.empty()
+                parser = DietPlanParser()
+                live_days = []
+                parts = []
+                for delta in pipeline.stream_plan(analysis, prediction):
+                    parts.append(delta)
+                    new_days = parser.feed(delta)
+                    if new_days:
+                        live_days.extend(new_days)
+                        with live_plan.container():
+                            st.markdown('<h3 class="section-header">🥗 Your Plan So Far</h3>', unsafe_allow_html=True)
+                            for day in live_days:
+                                render_day(day)
+                plan = "".join(parts)
+                live_plan.empty()
+            else:
+                plan = pipeline.plan(analysis, prediction).plan
             
             progress_bar.progress(100)
             status_text.success("✅ Complete!")
@@ -857,6 +802,11 @@ if uploaded_file:
                     st.markdown("**✅ Recommended Foods:**")
                     for food in guidelines.get('allowed_foods', []):
                         st.success(f"• {food}")
+                    
+                    if guidelines.get('limited_foods'):
+                        st.markdown("**⚖️ Foods to Limit:**")
+                        for food in guidelines['limited_foods']:
+                            st.warning(f"• {food}")
                 
                 with col2:
                     st.markdown("**❌ Foods to Avoid:**")
@@ -878,59 +828,7 @@ if uploaded_file:
                 
                 if days and len(days) > 0:
                     for day in days:
-                        st.markdown(f"""
-                        <div class="day-card">
-                            <h3>📅 {day['title']}</h3>
-                        """, unsafe_allow_html=True)
-                        
-                        meal_col1, meal_col2, meal_col3 = st.columns(3)
-                        
-                        with meal_col1:
-                            st.markdown(f"""
-                            <div class="meal-section">
-                                <h4>🌅 Breakfast</h4>
-                                <p>{day['breakfast'].strip() if day['breakfast'].strip() else 'Similar to Day 1'}</p>
-                            </div>
-                            """, unsafe_allow_html=True)
-                        
-                        with meal_col2:
-                            st.markdown(f"""
-                            <div class="meal-section">
-                                <h4>☀️ Lunch</h4>
-                                <p>{day['lunch'].strip() if day['lunch'].strip() else 'Similar to Day 1'}</p>
-                            </div>
-                            """, unsafe_allow_html=True)
-                        
-                        with meal_col3:
-                            st.markdown(f"""
-                            <div class="meal-section">
-                                <h4>🌙 Dinner</h4>
-                                <p>{day['dinner'].strip() if day['dinner'].strip() else 'Similar to Day 1'}</p>
-                            </div>
-                            """, unsafe_allow_html=True)
-                        
-                        if day['snacks'].strip() or day['notes'].strip():
-                            notes_col1, notes_col2 = st.columns(2)
-                            
-                            if day['snacks'].strip():
-                                with notes_col1:
-                                    st.markdown(f"""
-                                    <div class="meal-section">
-                                        <h4>🍎 Snacks</h4>
-                                        <p>{day['snacks'].strip()}</p>
-                                    </div>
-                                    """, unsafe_allow_html=True)
-                            
-                            if day['notes'].strip():
-                                with notes_col2:
-                                    st.markdown(f"""
-                                    <div class="meal-section">
-                                        <h4>📝 Notes</h4>
-                                        <p>{day['notes'].strip()}</p>
-                                    </div>
-                                    """, unsafe_allow_html=True)
-                        
-                        st.markdown('</div>', unsafe_allow_html=True)
+                        render_day(day)
                 else:
                     st.markdown(plan)
                 
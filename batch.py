@@ -0,0 +1,255 @@
+"""Headless batch processing of a directory of medical reports.
+
+CPU-bound stages (text extraction, NER, intent classification, risk model)
+run in a process pool, one report per task; plan generation runs on an
+async LLM pool so many requests are in flight while the CPU workers keep
+going. Every finished report is appended to a JSONL file right away, and
+reports whose file hash is already in that file are skipped, so an
+interrupted run can simply be restarted.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import plan_cache
+import result_cache
+import risk_model
+from llm_pool import AsyncLLMPool, make_async_client
+from pipeline import DietPipeline
+
+SUPPORTED_EXTENSIONS = {"pdf", "txt", "csv", "png", "jpg", "jpeg"}
+
+STAGES = ("extract", "nlp", "risk", "plan", "pdf")
+
+_worker_pipeline = None
+
+
+def find_reports(directory, recursive=True):
+    paths = []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if name.rsplit(".", 1)[-1].lower() in SUPPORTED_EXTENSIONS:
+                paths.append(os.path.join(root, name))
+        if not recursive:
+            break
+    return paths
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_done(output_path):
+    """Hashes of reports already written successfully to ``output_path``."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # partial last line from an interrupted run
+            if not record.get("error"):
+                done.add(record.get("file_sha256"))
+    return done
+
+
+def _init_worker(torch_threads):
+    global _worker_pipeline
+    # Each worker gets a share of the cores instead of all of them
+    try:
+        import torch
+        torch.set_num_threads(torch_threads)
+    except ImportError:
+        pass
+    try:
+        model = risk_model.load_model()
+    except Exception:
+        model = None
+    # reports are already spread over processes; don't nest page/OCR pools
+    _worker_pipeline = DietPipeline(model=model, cache=result_cache.ResultCache(), extract_workers=1)
+
+
+def analyze_report(path):
+    """CPU stages for one report; runs inside a pool worker."""
+    timings = {}
+
+    start = time.perf_counter()
+    extraction = _worker_pipeline.extract(path)
+    timings["extract"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    analysis = _worker_pipeline.analyze(extraction)
+    timings["nlp"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    prediction = _worker_pipeline.assess(extraction)
+    timings["risk"] = time.perf_counter() - start
+
+    return extraction, analysis, prediction, timings
+
+
+class BatchStats:
+    def __init__(self, total):
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.started = time.perf_counter()
+        self.stage_seconds = {stage: 0.0 for stage in STAGES}
+        self.stage_items = {stage: 0 for stage in STAGES}
+
+    def add(self, timings):
+        for stage, seconds in timings.items():
+            self.stage_seconds[stage] += seconds
+            self.stage_items[stage] += 1
+
+    def progress_line(self, path, ok):
+        elapsed = time.perf_counter() - self.started
+        finished = self.done + self.failed
+        rate = finished / elapsed if elapsed else 0.0
+        eta = (self.total - finished) / rate if rate else 0.0
+        status = "ok" if ok else "FAILED"
+        return (f"[{finished}/{self.total}] {status} {os.path.basename(path)} "
+                f"({rate:.2f} reports/s, ETA {eta:.0f}s)")
+
+    def summary(self):
+        wall = time.perf_counter() - self.started
+        lines = [f"Processed {self.done} reports ({self.failed} failed) in {wall:.1f}s "
+                 f"-> {self.done / wall if wall else 0.0:.2f} reports/s"]
+        for stage in STAGES:
+            items, seconds = self.stage_items[stage], self.stage_seconds[stage]
+            if items:
+                lines.append(f"  {stage:<8} {items:>6} items  {seconds:8.1f}s busy  "
+                             f"{seconds / items * 1000:8.1f} ms/item  "
+                             f"{items / seconds if seconds else 0.0:8.2f} items/s per worker")
+        return "\n".join(lines)
+
+
+async def _process(path, file_hash, executor, planner, llm, pdf_dir):
+    record = {"path": path, "file_sha256": file_hash}
+    try:
+        return await _run_stages(record, executor, planner, llm, pdf_dir)
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+        return record
+
+
+async def _run_stages(record, executor, planner, llm, pdf_dir):
+    loop = asyncio.get_running_loop()
+    path, file_hash = record["path"], record["file_sha256"]
+
+    extraction, analysis, prediction, timings = await loop.run_in_executor(
+        executor, analyze_report, path
+    )
+    record.update({
+        "characters": len(extraction.text),
+        "entities": len(analysis.entities),
+        "structured": analysis.structured,
+        "guidelines": analysis.guidelines,
+        "prediction": prediction
+    })
+
+    if planner is not None:
+        start = time.perf_counter()
+        result = await planner.plan_async(analysis, prediction, llm)
+        timings["plan"] = time.perf_counter() - start
+        record["plan"] = result.plan
+        record["days"] = result.days
+        if result.error:
+            record["error"] = result.error
+
+        if pdf_dir and not result.error:
+            from pdf_report import generate_pdf
+            start = time.perf_counter()
+            patient_info = {
+                "Condition": analysis.guidelines.get("condition", "General"),
+                "Health Assessment": str(prediction),
+                "Source": os.path.basename(path)
+            }
+            pdf = await loop.run_in_executor(None, generate_pdf, result.plan, patient_info)
+            pdf_path = os.path.join(pdf_dir, f"{file_hash[:16]}.pdf")
+            with open(pdf_path, "wb") as f:
+                f.write(pdf.getvalue())
+            record["pdf"] = pdf_path
+            timings["pdf"] = time.perf_counter() - start
+
+    record["timings"] = timings
+    return record
+
+
+async def run_batch(directory, output_path, pdf_dir=None, workers=None,
+                    llm_concurrency=None, generate_plans=True, client=None, plan_tier=None, log=sys.stderr):
+    paths = find_reports(directory)
+    done = load_done(output_path)
+
+    pending = []
+    seen = set()
+    skipped = duplicates = 0
+    for path in paths:
+        file_hash = file_sha256(path)
+        if file_hash in done:
+            skipped += 1
+        elif file_hash in seen:
+            duplicates += 1  # identical copies are only processed once
+        else:
+            seen.add(file_hash)
+            pending.append((path, file_hash))
+    print(f"{len(paths)} reports found, {skipped} already done, {duplicates} duplicates, "
+          f"{len(pending)} to process", file=log)
+
+    stats = BatchStats(len(pending))
+    if not pending:
+        return stats
+
+    workers = workers or max(1, (os.cpu_count() or 2) // 2)
+    torch_threads = max(1, (os.cpu_count() or 1) // workers)
+    if pdf_dir:
+        os.makedirs(pdf_dir, exist_ok=True)
+
+    # the plan stage runs here in the parent, on the event loop
+    planner = DietPipeline(
+        cache=result_cache.ResultCache(),
+        plan_cache=plan_cache.PlanCache(),
+        plan_tier=plan_tier
+    ) if generate_plans else None
+    async_client = make_async_client(client) if generate_plans and client else None
+    llm = AsyncLLMPool(async_client, max_concurrency=llm_concurrency) if async_client else None
+
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(torch_threads,)
+        ) as executor, open(output_path, "a", encoding="utf-8") as out:
+            tasks = [
+                _process(path, file_hash, executor, planner, llm, pdf_dir)
+                for path, file_hash in pending
+            ]
+            for future in asyncio.as_completed(tasks):
+                record = await future
+                ok = not record.get("error")
+                if ok:
+                    stats.done += 1
+                else:
+                    stats.failed += 1
+                stats.add(record.get("timings", {}))
+
+                out.write(json.dumps(record, default=str) + "\n")
+                out.flush()
+                print(stats.progress_line(record["path"], ok), file=log)
+    finally:
+        if async_client is not None:
+            await async_client.close()
+
+    print(stats.summary(), file=log)
+    return stats
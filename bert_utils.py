@@ -1,14 +1,25 @@
-from transformers import pipeline
+import model_registry
 
-ner = pipeline(
-    "ner",
-    model="dslim/bert-base-NER",
-    aggregation_strategy="simple"
-)
+
+def _load_ner():
+    from transformers import pipeline
+    return pipeline(
+        "ner",
+        model="dslim/bert-base-NER",
+        aggregation_strategy="simple"
+    )
+
+model_registry.register("general_ner", _load_ner)
+
+def __getattr__(name):
+    # `bert_utils.ner` is built on first access
+    if name == "ner":
+        return model_registry.get("general_ner")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def extract_entities(text):
 
-    results = ner(text)
+    results = model_registry.get("general_ner")(text)
 
     entities = []
 
@@ -0,0 +1,127 @@
+"""Runtime settings, read from the environment (or a .env file)."""
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# "torch" (default) or "onnx" for the int8 ONNX Runtime models
+NLP_BACKEND = os.getenv("NLP_BACKEND", "torch").lower()
+
+# Root for on-disk caches and exported model artifacts
+CACHE_DIR = os.getenv(
+    "DIETPLANNER_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "dietplanner")
+)
+ONNX_DIR = os.path.join(CACHE_DIR, "onnx")
+MODEL_DIR = os.path.join(CACHE_DIR, "models")
+
+# Published risk-model artifacts (see model_artifact); the active version is
+# re-checked every RISK_MODEL_CHECK_SECONDS so new versions load without a restart
+RISK_ARTIFACT_DIR = os.getenv(
+    "RISK_ARTIFACT_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "risk")
+)
+RISK_MODEL_CHECK_SECONDS = float(os.getenv("RISK_MODEL_CHECK_SECONDS", "5"))
+
+# Instruction set the dynamic int8 quantization targets: avx2, avx512, avx512_vnni or arm64
+ONNX_QUANT_ARCH = os.getenv("ONNX_QUANT_ARCH", "avx2").lower()
+
+# Content-addressed result cache (see result_cache)
+RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH", os.path.join(CACHE_DIR, "results.sqlite3"))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "5000"))
+RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", str(30 * 24 * 3600)))
+
+# Profile-keyed cache of LLM diet plans (see plan_cache)
+PLAN_CACHE_PATH = os.getenv("PLAN_CACHE_PATH", os.path.join(CACHE_DIR, "plans.sqlite3"))
+PLAN_CACHE_MAX_ENTRIES = int(os.getenv("PLAN_CACHE_MAX_ENTRIES", "2000"))
+PLAN_CACHE_TTL = int(os.getenv("PLAN_CACHE_TTL", str(30 * 24 * 3600)))
+# Jaccard similarity of disease sets needed to reuse a near-identical
+# profile's plan; 0 disables near-duplicate matching
+PLAN_CACHE_SIMILARITY = float(os.getenv("PLAN_CACHE_SIMILARITY", "0"))
+
+# Async LLM request pool (see llm_pool)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", "2"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+LLM_BACKOFF = float(os.getenv("LLM_BACKOFF", "1.0"))
+
+# HTTP API micro-batching (see api, micro_batch)
+API_MAX_BATCH_SENTENCES = int(os.getenv("API_MAX_BATCH_SENTENCES", "64"))
+API_MAX_WAIT_MS = float(os.getenv("API_MAX_WAIT_MS", "10"))
+API_MAX_QUEUE = int(os.getenv("API_MAX_QUEUE", "256"))
+
+# Page-parallel PDF extraction (see extractor); PDF_WORKERS=1 disables it
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "16"))
+PDF_PAGE_CHUNK = int(os.getenv("PDF_PAGE_CHUNK", "8"))
+PDF_PAGE_TIMEOUT = float(os.getenv("PDF_PAGE_TIMEOUT", "30"))
+
+# Tesseract OCR for images and scanned PDF pages (see ocr)
+OCR_LANG = os.getenv("OCR_LANG", "eng")
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(os.cpu_count() or 1)))
+OCR_DPI = int(os.getenv("OCR_DPI", "300"))
+OCR_MAX_SIDE = int(os.getenv("OCR_MAX_SIDE", "4000"))
+OCR_TILE_HEIGHT = int(os.getenv("OCR_TILE_HEIGHT", "1000"))
+
+# CSV ingestion (see csv_ingest): "auto" streams files of CSV_CHUNKED_MIN_MB
+# or more in chunks, "chunked" / "full" force one way
+CSV_MODE = os.getenv("CSV_MODE", "auto").lower()
+CSV_CHUNKED_MIN_MB = float(os.getenv("CSV_CHUNKED_MIN_MB", "5"))
+CSV_CHUNK_ROWS = int(os.getenv("CSV_CHUNK_ROWS", "20000"))
+CSV_MAX_TEXT_VALUES = int(os.getenv("CSV_MAX_TEXT_VALUES", "500"))
+# Comma-separated column whitelist; empty reads every column
+CSV_COLUMNS = [c.strip() for c in os.getenv("CSV_COLUMNS", "").split(",") if c.strip()]
+# Candidate names (case-insensitive) of the patient and result-date keys
+CSV_PATIENT_COLUMNS = os.getenv("CSV_PATIENT_COLUMNS", "patient_id,patient,mrn").split(",")
+CSV_DATE_COLUMNS = os.getenv(
+    "CSV_DATE_COLUMNS", "result_date,collection_date,collected,date,timestamp"
+).split(",")
+
+# Batched risk scoring (see risk_engine): "booster", "treelite" or "sklearn"
+RISK_BACKEND = os.getenv("RISK_BACKEND", "booster").lower()
+RISK_NUM_THREADS = int(os.getenv("RISK_NUM_THREADS", str(os.cpu_count() or 1)))
+RISK_TOP_FEATURES = int(os.getenv("RISK_TOP_FEATURES", "3"))
+
+# Drop repeated / boilerplate / numeric-only sentences before the NLP models
+# (see sentence_filter); SENTENCE_NEAR_DUP is the MinHash similarity for
+# near-duplicates, 0 to only drop exact repeats
+SENTENCE_FILTER = os.getenv("SENTENCE_FILTER", "1") not in ("0", "false", "no")
+SENTENCE_NEAR_DUP = float(os.getenv("SENTENCE_NEAR_DUP", "0.8"))
+BOILERPLATE_PATH = os.getenv("BOILERPLATE_PATH", os.path.join(CACHE_DIR, "boilerplate.json"))
+
+# "sentences" (NER per sentence), "windowed" (whole document in overlapping
+# token windows, nothing past the model's length limit is dropped), "fast"
+# (lexicon matcher only) or "hybrid" (lexicon, NER model for ambiguous
+# sentences); see lexicon
+NER_MODE = os.getenv("NER_MODE", "sentences").lower()
+LEXICON_PATH = os.getenv(
+    "LEXICON_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "lexicon.tsv")
+)
+
+# Condition → food rules (see food_kb) and the meal database the local plan
+# synthesizer picks from (see plan_synth)
+FOOD_RULES_PATH = os.getenv(
+    "FOOD_RULES_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "food_rules.json")
+)
+MEALS_PATH = os.getenv(
+    "MEALS_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "meals.json")
+)
+# Food composition table for plan nutrient totals and audits (see nutrition)
+FOODS_PATH = os.getenv(
+    "FOODS_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "foods.tsv")
+)
+# PLAN_TIER "llm" asks the LLM, "local" always uses the local synthesizer.
+# PLAN_FALLBACK "kb" builds the plan locally when the LLM is not configured
+# or fails; "none" returns the warning instead
+PLAN_TIER = os.getenv("PLAN_TIER", "llm").lower()
+PLAN_FALLBACK = os.getenv("PLAN_FALLBACK", "kb").lower()
+
+# Reports without a CSV table get their model features from the text (see
+# lab_extractor) when at least this many analytes are found; fewer (a lone
+# "Age 45") is not enough for a risk assessment
+LAB_MIN_FEATURES = int(os.getenv("LAB_MIN_FEATURES", "3"))
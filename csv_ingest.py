@@ -0,0 +1,118 @@
+"""Chunked CSV ingestion for large lab exports.
+
+Instead of loading the whole file, the CSV is read CSV_CHUNK_ROWS rows at
+a time with dtypes fixed from the first chunk (numeric columns as float64,
+the rest as strings), optionally restricted to a column whitelist. While
+streaming it keeps:
+
+* the selected row: the latest one by the date column if there is one,
+  otherwise the first, optionally only rows of one patient;
+* the distinct values of the text columns (diagnoses, comments, ...),
+  capped at CSV_MAX_TEXT_VALUES, which become the text for the NLP stage.
+
+So peak memory is one chunk plus those two, whatever the file size.
+"""
+import pandas as pd
+
+import config
+
+
+def match_column(columns, candidates):
+    lowered = {str(c).lower(): c for c in columns}
+    for candidate in candidates:
+        if candidate.lower() in lowered:
+            return lowered[candidate.lower()]
+    return None
+
+
+def infer_dtypes(sample):
+    """float64 for numeric columns of the first chunk, string otherwise."""
+    return {
+        column: "float64" if pd.api.types.is_numeric_dtype(dtype) else "string"
+        for column, dtype in sample.dtypes.items()
+    }
+
+
+def _chunks(source, dtypes, usecols, chunk_rows):
+    try:
+        source.seek(0)
+        yield from pd.read_csv(source, dtype=dtypes, usecols=usecols, chunksize=chunk_rows)
+    except (ValueError, TypeError):
+        # a later chunk broke a dtype guess (e.g. "<5" in a numeric column):
+        # read everything as text and coerce numbers per chunk instead.
+        # Chunks seen before the error come again; selection and the
+        # text set are unaffected by that.
+        numeric = [column for column, dtype in dtypes.items() if dtype == "float64"]
+        source.seek(0)
+        for chunk in pd.read_csv(source, dtype="string", usecols=usecols, chunksize=chunk_rows):
+            for column in numeric:
+                chunk[column] = pd.to_numeric(chunk[column], errors="coerce")
+            yield chunk
+
+
+def read_csv_report(uploaded_file, patient_id=None, columns=None, text_columns=None,
+                    chunk_rows=None, max_text_values=None):
+    """
+    (text, numeric_data) for a CSV report, streamed in chunks.
+
+    ``columns`` is the whitelist of columns to read (None: all), and
+    ``text_columns`` the columns whose values go into the text (None: the
+    non-numeric ones, except the patient and date keys). ``numeric_data``
+    is the selected row as a dict, like ``df.iloc[0].to_dict()``.
+    ``uploaded_file`` must be seekable; it is read twice (sample, then
+    chunks) rather than copied into memory.
+    """
+    columns = columns or config.CSV_COLUMNS or None
+    chunk_rows = chunk_rows or config.CSV_CHUNK_ROWS
+    max_text_values = max_text_values or config.CSV_MAX_TEXT_VALUES
+
+    uploaded_file.seek(0)
+    sample = pd.read_csv(uploaded_file, nrows=chunk_rows, usecols=columns)
+    dtypes = infer_dtypes(sample)
+    patient_column = match_column(sample.columns, config.CSV_PATIENT_COLUMNS)
+    date_column = match_column(sample.columns, config.CSV_DATE_COLUMNS)
+    if date_column is not None:
+        dtypes[date_column] = "string"
+    if patient_column is not None:
+        dtypes[patient_column] = "string"
+    if text_columns is None:
+        text_columns = [
+            column for column, dtype in dtypes.items()
+            if dtype == "string" and column not in (patient_column, date_column)
+        ]
+    del sample
+
+    selected, selected_date = None, None
+    text_values = {}  # insertion-ordered set
+    for chunk in _chunks(uploaded_file, dtypes, list(dtypes), chunk_rows):
+        if patient_id is not None and patient_column is not None:
+            chunk = chunk[chunk[patient_column] == str(patient_id)]
+        if chunk.empty:
+            continue
+
+        if date_column is not None:
+            dates = pd.to_datetime(chunk[date_column], errors="coerce")
+            if dates.notna().any():
+                latest = dates.idxmax()
+                if selected_date is None or dates[latest] > selected_date:
+                    selected, selected_date = chunk.loc[latest], dates[latest]
+        if selected is None:
+            selected = chunk.iloc[0]
+
+        for column in text_columns:
+            for value in chunk[column].dropna().unique():
+                if len(text_values) >= max_text_values:
+                    break
+                text_values.setdefault(str(value), None)
+
+        # no date to compare and the text budget is full: nothing left to learn
+        if date_column is None and len(text_values) >= max_text_values:
+            break
+
+    if selected is None:
+        return "", None
+    numeric_data = {
+        column: (None if pd.isna(value) else value.item() if hasattr(value, "item") else value)
+        for column, value in selected.items()
+    }
+    return "\n".join(text_values), numeric_data
@@ -0,0 +1,154 @@
+"""Command line entry point.
+
+    python -m dietplanner batch reports/ --out results.jsonl --pdf-dir plans/
+    python -m dietplanner serve --port 8000
+    python -m dietplanner score patients.csv --out scores.csv
+    python -m dietplanner score --benchmark
+    python -m dietplanner convert-model best_model.pkl
+    python -m dietplanner audit results.jsonl --out audit.csv
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+
+def _openai_client():
+    from dotenv import load_dotenv
+    load_dotenv()
+    if not os.getenv("OPENAI_API_KEY"):
+        return None
+    from openai import OpenAI
+    return OpenAI()
+
+
+def cmd_batch(args):
+    import batch
+    import config
+
+    local = args.plan_tier == "local"
+    client = None if args.no_plan or local else _openai_client()
+    if not args.no_plan and not local and client is None:
+        source = "the plan cache or the local synthesizer" if config.PLAN_FALLBACK == "kb" else "the plan cache"
+        print(f"OPENAI_API_KEY not set: plans will only come from {source}", file=sys.stderr)
+
+    stats = asyncio.run(batch.run_batch(
+        args.directory,
+        args.out,
+        pdf_dir=args.pdf_dir,
+        workers=args.workers,
+        llm_concurrency=args.llm_concurrency,
+        generate_plans=not args.no_plan,
+        client=client,
+        plan_tier=args.plan_tier
+    ))
+    return 1 if stats.failed else 0
+
+
+def cmd_serve(args):
+    try:
+        import uvicorn
+    except ImportError:
+        print("The API server needs uvicorn: pip install uvicorn", file=sys.stderr)
+        return 1
+    # one process: micro-batching only helps if requests share the models
+    uvicorn.run("api:app", host=args.host, port=args.port)
+    return 0
+
+
+def cmd_score(args):
+    import risk_engine
+
+    if args.benchmark:
+        report = risk_engine.benchmark(rows=args.rows, num_threads=args.threads)
+        for backend, result in report.items():
+            if "error" in result:
+                print(f"{backend:<9} unavailable: {result['error']}")
+            else:
+                print(f"{backend:<9} {result['rows_per_second']:>12,.0f} rows/s  "
+                      f"{result['seconds'] * 1000:8.1f} ms  max |diff| {result['max_abs_diff']:.2e}")
+        return 0
+    if not args.input:
+        print("score needs an input CSV (or --benchmark)", file=sys.stderr)
+        return 2
+
+    engine = risk_engine.RiskEngine(backend=args.backend, num_threads=args.threads)
+    start = time.perf_counter()
+    rows = risk_engine.score_csv(args.input, args.out, engine, top_k=args.top)
+    elapsed = time.perf_counter() - start
+    print(f"Scored {rows} patients in {elapsed:.1f}s -> {args.out}", file=sys.stderr)
+    return 0
+
+
+def cmd_convert_model(args):
+    import model_artifact
+
+    if args.publish:
+        model_artifact.publish(args.publish)
+        print(f"Published risk model {args.publish}")
+        return 0
+    version_dir = model_artifact.convert(args.pickle, version=args.version, activate=not args.no_activate)
+    print(f"Wrote {version_dir}" + ("" if args.no_activate else " (now active)"))
+    return 0
+
+
+def cmd_audit(args):
+    import nutrition
+
+    start = time.perf_counter()
+    plans = nutrition.audit_jsonl(args.input, args.out)
+    elapsed = time.perf_counter() - start
+    print(f"Audited {plans} plans in {elapsed:.1f}s ({plans / max(elapsed, 1e-9):,.0f}/s) -> {args.out}",
+          file=sys.stderr)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="dietplanner", description="AI Diet Planner tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("batch", help="process a directory of medical reports")
+    p.add_argument("directory")
+    p.add_argument("--out", default="results.jsonl", help="JSONL output (appended to, used for resuming)")
+    p.add_argument("--pdf-dir", help="also write one PDF plan per report here")
+    p.add_argument("--workers", type=int, help="CPU worker processes (default: half the cores)")
+    p.add_argument("--llm-concurrency", type=int, help="max concurrent LLM requests")
+    p.add_argument("--no-plan", action="store_true", help="skip plan generation (analysis only)")
+    p.add_argument("--plan-tier", choices=("llm", "local"),
+                   help="local: build plans with the offline synthesizer, no LLM (default: PLAN_TIER)")
+    p.set_defaults(func=cmd_batch)
+
+    p = commands.add_parser("serve", help="run the HTTP API (POST /analyze, POST /plan)")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8000)
+    p.set_defaults(func=cmd_serve)
+
+    p = commands.add_parser("score", help="batch risk scoring of a patient CSV")
+    p.add_argument("input", nargs="?", help="CSV with one patient per row")
+    p.add_argument("--out", default="scores.csv")
+    p.add_argument("--backend", choices=("booster", "treelite", "sklearn"), help="default: RISK_BACKEND")
+    p.add_argument("--threads", type=int, help="inference threads (default: RISK_NUM_THREADS)")
+    p.add_argument("--top", type=int, help="top contributing features per patient (0 = none)")
+    p.add_argument("--benchmark", action="store_true", help="compare backends on synthetic patients")
+    p.add_argument("--rows", type=int, default=100_000, help="rows for --benchmark")
+    p.set_defaults(func=cmd_score)
+
+    p = commands.add_parser("convert-model", help="convert a pickled model to a versioned artifact")
+    p.add_argument("pickle", nargs="?", default="best_model.pkl")
+    p.add_argument("--version", help="artifact version (default: model checksum prefix)")
+    p.add_argument("--no-activate", action="store_true", help="write it without publishing it")
+    p.add_argument("--publish", metavar="VERSION", help="only make an existing VERSION active")
+    p.set_defaults(func=cmd_convert_model)
+
+    p = commands.add_parser("audit", help="nutrient totals of batch plans vs their targets")
+    p.add_argument("input", help="JSONL written by the batch command")
+    p.add_argument("--out", default="audit.csv")
+    p.set_defaults(func=cmd_audit)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
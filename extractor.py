@@ -1,12 +1,170 @@
+import io
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
 import pdfplumber
 import pandas as pd
+from PIL import Image
+
+import config
+import csv_ingest
+import ocr
+
+# Bump when extraction output changes so cached text is not reused
+EXTRACTOR_VERSION = "3"
+
+IMAGE_TYPES = ("png", "jpg", "jpeg")
+
+
+def extractor_version():
+    """EXTRACTOR_VERSION plus the OCR setup: scans give "" without Tesseract,
+    so text cached without OCR must not be reused once it is installed."""
+    if not ocr.available():
+        return f"{EXTRACTOR_VERSION}:no-ocr"
+    return f"{EXTRACTOR_VERSION}:ocr-{ocr.OCR_VERSION}-{config.OCR_LANG}"
+
+
+# -------------------------
+# PDF pages
+# -------------------------
+def _read_bytes(uploaded_file):
+    return uploaded_file.getvalue() if hasattr(uploaded_file, "getvalue") else uploaded_file.read()
+
+
+def _extract_page_range(data, first, last):
+    """Text of pages [first, last) of a PDF given as bytes (pool worker)."""
+    with pdfplumber.open(io.BytesIO(data)) as pdf:
+        return [page.extract_text() or "" for page in pdf.pages[first:last]]
 
 
-def extract_text(uploaded_file):
+def iter_pdf_pages(uploaded_file, workers=None, chunk_size=None, page_timeout=None, ocr_fallback=True):
     """
-    Cloud-safe extractor
-    NO OCR
-    NO tesseract
+    Yield the text of each PDF page, in page order, as soon as it is ready.
+
+    PDFs with at least PDF_PARALLEL_MIN_PAGES pages are split into chunks of
+    ``chunk_size`` pages and extracted in a process pool; smaller ones (or
+    ``workers=1``) are read page by page in this process. A chunk still
+    running ``page_timeout`` seconds per page after it was handed to a
+    worker is given up on: its pages yield "" and the pool is replaced, so
+    the stuck worker is killed. Pages without a text layer (scans) are
+    rendered and OCR'd when Tesseract is available.
+    """
+    data = _read_bytes(uploaded_file)
+    pages = _iter_text_layer(data, workers, chunk_size, page_timeout)
+    if ocr_fallback and ocr.available():
+        pages = ocr.ocr_pages(_render_blank_pages(data, pages),
+                              workers=config.OCR_WORKERS if workers is None else workers)
+    yield from pages
+
+
+def _render_blank_pages(data, pages):
+    """Pass page text through; swap pages with no text for a page image."""
+    with pdfplumber.open(io.BytesIO(data)) as pdf:
+        for index, page_text in enumerate(pages):
+            if page_text.strip():
+                yield page_text
+                continue
+            page = pdf.pages[index]
+            yield page.to_image(resolution=config.OCR_DPI).original
+            page.close()
+
+
+def _iter_text_layer(data, workers, chunk_size, page_timeout):
+    workers = config.PDF_WORKERS if workers is None else workers
+    chunk_size = chunk_size or config.PDF_PAGE_CHUNK
+    page_timeout = config.PDF_PAGE_TIMEOUT if page_timeout is None else page_timeout
+
+    with pdfplumber.open(io.BytesIO(data)) as pdf:
+        page_count = len(pdf.pages)
+        if workers <= 1 or page_count < config.PDF_PARALLEL_MIN_PAGES:
+            for page in pdf.pages:
+                yield page.extract_text() or ""
+            return
+
+    ranges = [(first, min(first + chunk_size, page_count)) for first in range(0, page_count, chunk_size)]
+    workers = min(workers, len(ranges))
+    executor = ProcessPoolExecutor(max_workers=workers)
+    pending = {}  # chunk -> (future, deadline or None)
+    queued = 0
+
+    def submit(chunk):
+        first, last = ranges[chunk]
+        deadline = time.monotonic() + page_timeout * (last - first) if page_timeout else None
+        pending[chunk] = (executor.submit(_extract_page_range, data, first, last), deadline)
+
+    try:
+        # collect in chunk order so pages come out in order while later
+        # chunks keep extracting; a chunk is only submitted when a worker
+        # is free, so its deadline runs from when it starts
+        for chunk, (first, last) in enumerate(ranges):
+            while True:
+                running = sum(not future.done() for future, _ in pending.values())
+                while queued < len(ranges) and running < workers:
+                    submit(queued)
+                    queued, running = queued + 1, running + 1
+                future, deadline = pending[chunk]
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if future.done() or (remaining is not None and remaining <= 0):
+                    break
+                wait([f for f, _ in pending.values()], timeout=remaining, return_when=FIRST_COMPLETED)
+
+            future, _ = pending.pop(chunk)
+            if future.done():
+                pages = future.result()
+            else:
+                # a hung pdfplumber call cannot be cancelled: kill the pool
+                # and restart the other chunks that were in it
+                pages = [""] * (last - first)
+                _kill(executor)
+                executor = ProcessPoolExecutor(max_workers=workers)
+                for other, (running_future, _) in list(pending.items()):
+                    if not running_future.done():
+                        submit(other)
+            yield from pages
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _kill(executor):
+    processes = list((executor._processes or {}).values())  # no public API before Python 3.14
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.kill()
+
+
+def _use_chunked_csv(uploaded_file):
+    if config.CSV_MODE != "auto":
+        return config.CSV_MODE == "chunked"
+    if hasattr(uploaded_file, "getbuffer"):
+        size = uploaded_file.getbuffer().nbytes
+    else:
+        size = getattr(uploaded_file, "size", 0)
+    return size >= config.CSV_CHUNKED_MIN_MB * 1024 * 1024
+
+
+def extract_text_stream(uploaded_file, workers=None):
+    """
+    Yield report text piece by piece: one piece per PDF page, the whole
+    text for other file types. Lets segmentation start on the first pages
+    of a long PDF before the rest is extracted.
+    """
+    name = getattr(uploaded_file, "name", "")
+    if name.split(".")[-1].lower() == "pdf":
+        for page_text in iter_pdf_pages(uploaded_file, workers=workers):
+            if page_text:
+                yield page_text + "\n"
+    else:
+        text, _ = extract_text(uploaded_file)
+        if text:
+            yield text
+
+
+def extract_text(uploaded_file, workers=None):
+    """
+    Text (and CSV values) from an uploaded report.
+    Images and scanned PDF pages are OCR'd when Tesseract is installed;
+    without it they give empty text, so cloud hosts still work.
+    ``workers`` caps the PDF page and OCR pools (1 = in-process).
     """
 
     text = ""
@@ -16,14 +174,18 @@ def extract_text(uploaded_file):
     file_type = name.split(".")[-1].lower()
 
     # -------------------------
-    # PDF (text only)
+    # PDF (text layer, OCR for scanned pages)
     # -------------------------
     if file_type == "pdf":
-        with pdfplumber.open(uploaded_file) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
+        pages = iter_pdf_pages(uploaded_file, workers=workers)
+        text = "".join(page_text + "\n" for page_text in pages if page_text)
+
+    # -------------------------
+    # Images (OCR)
+    # -------------------------
+    elif file_type in IMAGE_TYPES:
+        with Image.open(uploaded_file) as image:
+            text = ocr.ocr_image(image, workers=workers)
 
     # -------------------------
     # TXT
@@ -34,6 +196,9 @@ def extract_text(uploaded_file):
     # -------------------------
     # CSV
     # -------------------------
+    elif file_type == "csv" and _use_chunked_csv(uploaded_file):
+        text, numeric_data = csv_ingest.read_csv_report(uploaded_file)
+
     elif file_type == "csv":
         df = pd.read_csv(uploaded_file)
         text = df.astype(str).to_string()
@@ -0,0 +1,118 @@
+"""Feature matrices for the LightGBM risk model, aligned to its schema.
+
+Report values are matched to the model's training columns
+(``feature_name_``) by normalized name or a known alias, never by position
+in the report, and parsed as numbers in one vectorized pass. Anything
+missing or unparseable is NaN, which LightGBM treats as a missing value
+rather than a real 0.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+# Training columns of best_model.pkl, used when a model exposes no names
+DEFAULT_FEATURES = (
+    "Pregnancies", "Glucose", "BloodPressure", "SkinThickness",
+    "Insulin", "BMI", "DiabetesPedigreeFunction", "Age"
+)
+
+# Other names lab exports use for the same measurement
+ALIASES = {
+    "Pregnancies": ("pregnancy", "pregnancy_count", "num_pregnancies", "gravida"),
+    "Glucose": ("glu", "blood_glucose", "fasting_glucose", "plasma_glucose", "fbs", "glucose_mg_dl"),
+    "BloodPressure": ("bp", "blood_pressure", "diastolic", "diastolic_bp", "dbp"),
+    "SkinThickness": ("skin", "skin_fold", "triceps_skinfold", "triceps"),
+    "Insulin": ("serum_insulin", "insulin_level"),
+    "BMI": ("body_mass_index",),
+    "DiabetesPedigreeFunction": ("dpf", "pedigree", "diabetes_pedigree", "pedigree_function"),
+    "Age": ("age_years", "patient_age")
+}
+
+_NUMBER_PATTERN = r"[-+]?(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][-+]?\d+)?"
+_NUMBER = re.compile(rf"^\s*({_NUMBER_PATTERN})")
+# "130/85": systolic / diastolic
+_PAIR = re.compile(rf"^\s*{_NUMBER_PATTERN}\s*/\s*({_NUMBER_PATTERN})")
+# "2025-01-01", "12/05/2024": a date, not a value
+_DATE = re.compile(r"^\s*\d{1,4}[-/.]\d{1,2}[-/.]\d{1,4}")
+# "1,200": thousands separators
+_GROUPING = re.compile(r"(?<=\d),(?=\d{3}(?!\d))")
+# features whose "x/y" values mean the second number (diastolic pressure),
+# as in lab_extractor
+SECOND_OF_PAIR = ("BloodPressure",)
+
+
+def _normalize(name):
+    return re.sub(r"[^a-z0-9]", "", str(name).lower())
+
+
+def feature_names(model):
+    """Training column names of ``model`` (sklearn wrapper or Booster)."""
+    for attribute in ("feature_name_", "feature_names_in_"):
+        names = getattr(model, attribute, None)
+        if names is not None:
+            return list(names)
+    if hasattr(model, "feature_name"):
+        return list(model.feature_name())
+    return list(DEFAULT_FEATURES)
+
+
+def column_map(columns, features):
+    """{feature: source column} for every feature found among ``columns``
+    by name or alias; unmatched features are left out."""
+    lookup = {}
+    for column in columns:
+        lookup.setdefault(_normalize(column), column)
+
+    mapping = {}
+    for feature in features:
+        for candidate in (feature,) + ALIASES.get(feature, ()):
+            column = lookup.get(_normalize(candidate))
+            if column is not None:
+                mapping[feature] = column
+                break
+    return mapping
+
+
+def parse_numeric(values, second_of_pair=False):
+    """Float64 array from mixed values: numbers, numeric strings ("1e-3",
+    "-0.5", "1,200"), strings with units ("7.2 %"); NaN for dates and
+    everything else. "x/y" values give x, or y with ``second_of_pair``.
+
+    >>> parse_numeric([148, "1e-3", "1,200", "250,000 /uL", "7.2 %", "2025-01-01", "n/a"]).tolist()
+    [148.0, 0.001, 1200.0, 250000.0, 7.2, nan, nan]
+    """
+    series = pd.Series(values, dtype=object)
+    numbers = pd.to_numeric(series, errors="coerce")
+    missing = series[numbers.isna()]
+    strings = missing[missing.map(lambda v: isinstance(v, str))]
+    if len(strings):
+        strings = strings.str.replace(_GROUPING, "", regex=True)
+        parsed = pd.to_numeric(strings.str.extract(_NUMBER, expand=False), errors="coerce")
+        if second_of_pair:
+            second = pd.to_numeric(strings.str.extract(_PAIR, expand=False), errors="coerce")
+            parsed = second.where(second.notna(), parsed)
+        parsed[strings.str.match(_DATE)] = np.nan
+        numbers[strings.index] = parsed
+    return numbers.to_numpy(dtype=np.float64)
+
+
+def build_matrix(records, features=DEFAULT_FEATURES):
+    """float32 matrix (one row per record, one column per feature).
+
+    ``records`` is a DataFrame or a list of dicts (e.g. numeric_data of
+    many reports); columns are matched by name/alias per record set.
+    """
+    frame = records if isinstance(records, pd.DataFrame) else pd.DataFrame.from_records(list(records))
+    mapping = column_map(frame.columns, features)
+    matrix = np.full((len(frame), len(features)), np.nan, dtype=np.float32)
+    for index, feature in enumerate(features):
+        column = mapping.get(feature)
+        if column is not None:
+            matrix[:, index] = parse_numeric(frame[column].to_numpy(), feature in SECOND_OF_PAIR)
+    return matrix
+
+
+def build_features(numeric_data, features=DEFAULT_FEATURES):
+    """One-row float32 matrix for a single report's numeric values."""
+    return build_matrix([numeric_data], features)
@@ -0,0 +1,193 @@
+"""Condition → food rules knowledge base (data/food_rules.json).
+
+Each condition lists the disease names it covers and the foods to prefer,
+limit and avoid. On load every list becomes a frozenset and all disease
+names go into one aho_corasick.Automaton, so ``guidelines`` for a set of
+detected diseases is a single scan of the names plus a few set unions and
+differences; results are memoized per set of conditions.
+
+With several conditions the strictest rule for a food wins (avoid > limit
+> prefer): CKD's "avoid bananas" beats hypertension's "prefer bananas".
+Every food that was downgraded that way is reported in ``conflicts``.
+
+Daily ``targets`` (kcal, macro energy shares, sodium, fibre) combine the
+same way: the lowest kcal and sodium, the highest fibre, and the overlap of
+the macro ranges (the lower range when they do not overlap, e.g. CKD's
+protein limit over diabetes' protein goal). The general targets fill in
+whatever no detected condition sets. When the merged macro ranges cannot
+add up to 100% (CKD's low protein with diabetes' carbohydrate cap), the
+carbohydrate and fat ranges are widened by MACRO_SLACK points beyond what
+closes the gap; protein is kept. plan_synth builds plans from them.
+
+The food lists go into every LLM plan prompt, so ``fingerprint``
+(KB_VERSION plus a checksum of the rules file) is part of the plan cache
+keys (planner.prompt_version): editing the rules retires cached plans.
+"""
+import hashlib
+import json
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Tuple
+
+import config
+from aho_corasick import Automaton
+
+# Bump when the rules format or merging change
+KB_VERSION = "2"
+GENERAL = "general"
+RULES = ("prefer", "limit", "avoid")
+# percentage points of room left in the macro ranges after closing a gap
+MACRO_SLACK = 5
+
+
+@dataclass(frozen=True)
+class Rules:
+    conditions: Tuple[str, ...]
+    allowed: Tuple[str, ...]
+    limited: Tuple[str, ...]
+    restricted: Tuple[str, ...]
+    conflicts: Tuple[Tuple[str, str, Tuple[str, ...]], ...]   # (food, rule kept, conditions overruled)
+    advice: Tuple[str, ...]
+    targets: Tuple[Tuple[str, Any], ...]
+
+
+def _ordered_union(lists):
+    seen = {}
+    for foods in lists:
+        for food in foods:
+            seen.setdefault(food, None)
+    return tuple(seen)
+
+
+def _merge_targets(per_condition, general):
+    targets = {}
+    for condition_targets in per_condition:
+        for key, value in condition_targets.items():
+            if key not in targets:
+                targets[key] = value
+            elif key.endswith("_pct"):
+                low, high = max(targets[key][0], value[0]), min(targets[key][1], value[1])
+                targets[key] = (low, high) if low <= high else min(targets[key], value, key=lambda r: r[1])
+            elif key == "fiber_g":
+                targets[key] = max(targets[key], value)
+            else:
+                targets[key] = min(targets[key], value)
+    return _feasible_macros({**general, **targets})
+
+
+def _feasible_macros(targets):
+    """Widen the carbohydrate and fat ranges until the macro energy shares
+    can add up to 100%."""
+    keys = ("protein_pct", "carbs_pct", "fat_pct")
+    if not all(key in targets for key in keys):
+        return targets
+    low = sum(targets[key][0] for key in keys)
+    high = sum(targets[key][1] for key in keys)
+    shift = (100 + MACRO_SLACK - high) / 2 if high < 100 else (100 - MACRO_SLACK - low) / 2 if low > 100 else 0
+    if not shift:
+        return targets
+    index = 1 if shift > 0 else 0
+    widened = dict(targets)
+    for key in ("carbs_pct", "fat_pct"):
+        bounds = list(targets[key])
+        bounds[index] += shift
+        widened[key] = tuple(bounds)
+    return widened
+
+
+class FoodKB:
+    def __init__(self, conditions, fingerprint=""):
+        self.fingerprint = fingerprint
+        # condition -> {"prefer"/"limit"/"avoid": frozenset, "order": {...}, "advice", "targets"}
+        self.conditions = {}
+        self.names = Automaton()
+        for condition, rules in conditions.items():
+            self.conditions[condition] = {
+                **{rule: frozenset(rules.get(rule, ())) for rule in RULES},
+                "order": {rule: tuple(rules.get(rule, ())) for rule in RULES},
+                "advice": rules.get("advice", ""),
+                "targets": {k: tuple(v) if isinstance(v, list) else v
+                            for k, v in rules.get("targets", {}).items()}
+            }
+            for name in {condition, *rules.get("names", ())}:
+                self.names.add(" ".join(name.lower().split()), condition)
+        self.names.build()
+        self.rules = lru_cache(maxsize=1024)(self._rules)
+
+    @classmethod
+    def load(cls, path=None):
+        with open(path or config.FOOD_RULES_PATH, "rb") as f:
+            raw = f.read()
+        digest = hashlib.sha256(raw).hexdigest()
+        return cls(json.loads(raw.decode("utf-8"))["conditions"], f"{KB_VERSION}-{digest[:16]}")
+
+    def foods(self):
+        """Every food any condition prefers, limits or avoids."""
+        return frozenset().union(*(rules[rule] for rules in self.conditions.values() for rule in RULES))
+
+    def match_conditions(self, diseases):
+        """KB conditions named in ``diseases`` (free text from NER / the
+        lexicon), as a frozenset; empty when none is known."""
+        found = set()
+        for disease in diseases:
+            text = " ".join(str(disease).lower().split())
+            found.update(condition for _, _, condition in self.names.finditer(text))
+        found.discard(GENERAL)
+        return frozenset(found)
+
+    def _rules(self, conditions):
+        names = sorted(conditions) or [GENERAL]
+        rules = [self.conditions[name] for name in names]
+
+        restricted = frozenset().union(*(r["avoid"] for r in rules))
+        limited = frozenset().union(*(r["limit"] for r in rules)) - restricted
+        conflicts = []
+        for food in _ordered_union(r["order"]["prefer"] for r in rules):
+            kept = "avoid" if food in restricted else "limit" if food in limited else None
+            if kept:
+                overruled = tuple(n for n, r in zip(names, rules) if food in r["prefer"])
+                conflicts.append((food, kept, overruled))
+        for food in _ordered_union(r["order"]["limit"] for r in rules):
+            if food in restricted:
+                overruled = tuple(n for n, r in zip(names, rules) if food in r["limit"])
+                conflicts.append((food, "avoid", overruled))
+
+        return Rules(
+            conditions=tuple(names),
+            allowed=tuple(f for f in _ordered_union(r["order"]["prefer"] for r in rules)
+                          if f not in restricted and f not in limited),
+            limited=tuple(f for f in _ordered_union(r["order"]["limit"] for r in rules) if f in limited),
+            restricted=_ordered_union(r["order"]["avoid"] for r in rules),
+            conflicts=tuple(conflicts),
+            advice=tuple(r["advice"] for r in rules if r["advice"]),
+            targets=tuple(_merge_targets(
+                [r["targets"] for r in rules], self.conditions.get(GENERAL, {}).get("targets", {})
+            ).items())
+        )
+
+    def guidelines(self, diseases):
+        """Food lists for the detected ``diseases``; the general rules when
+        no known condition is among them."""
+        rules = self.rules(self.match_conditions(diseases))
+        return {
+            "kb_conditions": list(rules.conditions),
+            "allowed_foods": list(rules.allowed),
+            "limited_foods": list(rules.limited),
+            "restricted_foods": list(rules.restricted),
+            "conflicts": [
+                {"food": food, "rule": kept, "overruled": list(overruled)}
+                for food, kept, overruled in rules.conflicts
+            ],
+            "kb_advice": list(rules.advice),
+            "targets": dict(rules.targets)
+        }
+
+
+_kb = None
+
+
+def get_kb():
+    global _kb
+    if _kb is None:
+        _kb = FoodKB.load()
+    return _kb
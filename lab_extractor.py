@@ -0,0 +1,209 @@
+"""Rule-based lab-value extraction: report text → risk-model features.
+
+One Aho-Corasick scan (aho_corasick.Automaton) finds every analyte name
+or alias in the lower-cased text; a short anchored regex right after each
+hit reads the value, the unit and an optional reference range. The whole
+pass is linear in the text length and needs no transformer, so PDF, image
+and TXT reports get a feature vector just like CSV exports do.
+
+    "Fasting Blood Sugar : 6.1 mmol/L (3.9 - 5.5)"
+        → LabValue("Glucose", 109.898, "mmol/l", ref_low=70.262, ref_high=99.088)
+    "BP 130/85 mmHg"
+        → LabValue("BloodPressure", 85.0, "mmhg")   # diastolic, as trained
+
+Values are converted to the units the model was trained on; anything
+outside PLAUSIBLE_RANGES is treated as a misread and skipped, and so is a
+number followed by a dose unit ("on insulin 10 units twice daily" is a
+medication, not a lab value).
+"""
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+import config
+import features
+from aho_corasick import Automaton
+
+# Phrases lab reports use in running text, on top of features.ALIASES
+ANALYTE_NAMES = {
+    "Pregnancies": ("pregnancies", "number of pregnancies", "no of pregnancies", "gravida", "parity"),
+    "Glucose": (
+        "glucose", "blood glucose", "plasma glucose", "fasting glucose", "fasting plasma glucose",
+        "blood sugar", "fasting blood sugar", "glucose fasting", "glucose tolerance test", "ogtt",
+        "2 hr glucose", "2 hour glucose", "2h glucose", "fbs", "fpg", "glu"
+    ),
+    "BloodPressure": ("blood pressure", "bp", "diastolic", "diastolic bp", "diastolic blood pressure", "dbp"),
+    "SkinThickness": ("skin thickness", "skinfold thickness", "skin fold thickness", "triceps skinfold",
+                      "triceps skin fold"),
+    "Insulin": ("insulin", "serum insulin", "fasting insulin", "2 hour insulin", "insulin level"),
+    "BMI": ("bmi", "body mass index"),
+    "DiabetesPedigreeFunction": ("diabetes pedigree function", "diabetes pedigree", "pedigree function", "dpf"),
+    "Age": ("age", "patient age", "age years", "age yrs")
+}
+
+# unit → (analyte, factor) into the training units
+UNIT_FACTORS = {
+    ("Glucose", "mmol/l"): 18.016,
+    ("Insulin", "pmol/l"): 1 / 6.0,
+    ("SkinThickness", "cm"): 10.0,
+    ("Age", "months"): 1 / 12.0
+}
+DEFAULT_UNITS = {
+    "Glucose": "mg/dl", "BloodPressure": "mmhg", "SkinThickness": "mm",
+    "Insulin": "uu/ml", "BMI": "kg/m2", "Age": "years"
+}
+
+# Values outside these (training units) are misreads: dates, IDs, page numbers
+PLAUSIBLE_RANGES = {
+    "Pregnancies": (0, 20),
+    "Glucose": (20, 800),
+    "BloodPressure": (20, 200),
+    "SkinThickness": (1, 100),
+    "Insulin": (0, 1000),
+    "BMI": (10, 80),
+    "DiabetesPedigreeFunction": (0, 3),
+    "Age": (1, 120)
+}
+
+# how far past an analyte name its value may appear
+MAX_GAP = 40
+
+_VALUE = re.compile(
+    r"[\s:=\-–.\[\]]*"                                    # separators
+    r"(?:\((?:[a-z/%µ0-9 .]{1,15})\)[\s:=\-–]*)?"         # "(mg/dl)" before the value
+    r"(?:(?:is|was|of|at|result|value|level)\s*[:=]?\s*)*"
+    r"[<>≤≥]?\s*"
+    r"(?P<value>\d+(?:[.,]\d+)?)"
+    r"(?:\s*/\s*(?P<second>\d+(?:\.\d+)?))?"              # 130/85
+    r"(?:\s*(?P<unit>mg\s*/\s*dl|mg\s*%|mmol\s*/\s*l|pmol\s*/\s*l|[uµμ]\s*[iu]?u\s*/\s*ml|miu\s*/\s*l|"
+    r"mm\s*hg|kg\s*/\s*m\s*(?:2|²|\^2)|mm|cm|years?|yrs?|y/o|months?|%))?"
+)
+_RANGE = re.compile(
+    r"[\s(\[]*(?:(?:ref(?:erence)?\.?|normal|range|bio\.? ref\.? interval)[\s.:=]*)*"
+    r"(?P<low>\d+(?:\.\d+)?)\s*(?:-|–|to)\s*(?P<high>\d+(?:\.\d+)?)[)\]]?"
+)
+# "10 units", "500 mg", "1 tablet": a dose (a unit captured above, such as
+# mg/dl, comes first)
+_DOSE = re.compile(r"\s*(?:units?|iu|u|mg|mcg|µg|tabs?|tablets?|caps?|capsules?|puffs?)\b(?!\s*/)")
+_AGE_SUFFIX = re.compile(r"(?<![\d.])(\d{1,3})\s*(?:years?|yrs?|y)[\s/-]*(?:old|male|female|m\b|f\b)")
+_UNIT_SPACES = re.compile(r"\s+")
+
+
+@dataclass
+class LabValue:
+    analyte: str                  # model feature name
+    value: float                  # in training units
+    unit: str
+    raw: str                      # matched report text
+    start: int
+    end: int
+    ref_low: Optional[float] = None
+    ref_high: Optional[float] = None
+
+    @property
+    def flag(self):
+        """"low" / "high" against the report's own reference range."""
+        if self.ref_low is not None and self.value < self.ref_low:
+            return "low"
+        if self.ref_high is not None and self.value > self.ref_high:
+            return "high"
+        return None
+
+
+def _normalize_unit(unit):
+    unit = _UNIT_SPACES.sub("", unit)
+    unit = unit.replace("µ", "u").replace("μ", "u")
+    if unit == "mg%":
+        return "mg/dl"
+    if unit in ("uiu/ml", "uu/ml", "miu/l"):
+        return "uu/ml"  # 1 mIU/L == 1 µIU/mL
+    if unit.startswith("kg/m"):
+        return "kg/m2"
+    if unit in ("year", "years", "yr", "yrs", "y/o"):
+        return "years"
+    if unit in ("month", "months"):
+        return "months"
+    return unit
+
+
+def build_automaton():
+    automaton = Automaton()
+    for feature in features.DEFAULT_FEATURES:
+        names = {feature.lower()} | set(ANALYTE_NAMES.get(feature, ()))
+        names |= {alias.replace("_", " ") for alias in features.ALIASES.get(feature, ())}
+        for name in names:
+            automaton.add(name, feature)
+    return automaton.build()
+
+
+_automaton = None
+
+
+def get_automaton():
+    global _automaton
+    if _automaton is None:
+        _automaton = build_automaton()
+    return _automaton
+
+
+def _read_value(analyte, text, start, end):
+    match = _VALUE.match(text, end, end + MAX_GAP)
+    if match is None or _DOSE.match(text, match.end()):
+        return None
+    value = float(match.group("value").replace(",", "."))
+    unit = _normalize_unit(match.group("unit") or "") or DEFAULT_UNITS.get(analyte, "")
+    if match.group("second"):
+        if analyte != "BloodPressure":
+            return None  # "x/y" for anything else is a date or a ratio
+        value = float(match.group("second"))  # systolic/diastolic
+    factor = UNIT_FACTORS.get((analyte, unit), 1.0)
+
+    ref_low = ref_high = None
+    value_end = match.end()
+    ranged = _RANGE.match(text, value_end, value_end + MAX_GAP)
+    if ranged:
+        ref_low = round(float(ranged.group("low")) * factor, 3)
+        ref_high = round(float(ranged.group("high")) * factor, 3)
+        value_end = ranged.end()
+
+    value *= factor
+    low, high = PLAUSIBLE_RANGES[analyte]
+    if not low <= value <= high:
+        return None
+    return LabValue(analyte, round(value, 3), unit, text[start:value_end], start, value_end, ref_low, ref_high)
+
+
+def extract_lab_values(text):
+    """Every readable analyte value in ``text``, in document order."""
+    lowered = text.lower()
+    if len(lowered) != len(text):
+        # a few characters lower-case to two; keep offsets aligned
+        lowered = "".join(c.lower() if len(c.lower()) == 1 else c for c in text)
+    values = []
+    for start, end, analyte in get_automaton().longest(lowered):
+        lab_value = _read_value(analyte, lowered, start, end)
+        if lab_value is not None:
+            lab_value.raw = text[lab_value.start:lab_value.end]
+            values.append(lab_value)
+
+    # "54 years old", "45 yrs / F" carry the age after the number
+    for match in _AGE_SUFFIX.finditer(lowered):
+        age = float(match.group(1))
+        if PLAUSIBLE_RANGES["Age"][0] <= age <= PLAUSIBLE_RANGES["Age"][1]:
+            values.append(LabValue("Age", age, "years", text[match.start():match.end()],
+                                   match.start(), match.end()))
+    values.sort(key=lambda v: v.start)
+    return values
+
+
+def extract_numeric(text, min_features=None):
+    """numeric_data dict {feature: value} for the risk model, first reading
+    of each analyte winning; None when fewer than ``min_features`` (default
+    LAB_MIN_FEATURES) analytes were found."""
+    min_features = config.LAB_MIN_FEATURES if min_features is None else min_features
+    numeric_data = {}
+    for lab_value in extract_lab_values(text or ""):
+        numeric_data.setdefault(lab_value.analyte, lab_value.value)
+    if not numeric_data or len(numeric_data) < min_features:
+        return None
+    return numeric_data
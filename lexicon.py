@@ -0,0 +1,169 @@
+"""Dictionary matcher for diseases, foods and nutrients: a cheap NER tier.
+
+The lexicon (LEXICON_PATH, default data/lexicon.tsv) lists synonyms as
+
+    term <TAB> concept <TAB> category <TAB> ambiguous
+
+with category "disease", "food", "nutrient" or "cue". All terms are
+compiled into one aho_corasick.Automaton, which is marshalled to MODEL_DIR
+under the lexicon's checksum, so later processes load it instead of
+rebuilding. ``tag`` then finds every term of every sentence in one linear
+scan per sentence.
+
+Matches come out in the Bertgpt.extract_entities format; diseases get
+entity_group "Disease_disorder" (what build_structured_intent keeps), with
+the canonical concept as ``word``. A sentence is *ambiguous* when one of
+its terms is marked ambiguous or maps to several concepts ("sugar", "ms"),
+or when it has a diagnosis cue ("diagnosed with", "k/c/o") but no known
+disease. NER_MODE "fast" uses the lexicon alone; "hybrid" uses it for
+clear sentences and sends only the ambiguous ones to the NER model.
+"""
+import hashlib
+import marshal
+import os
+from dataclasses import dataclass
+
+import config
+from aho_corasick import Automaton
+
+# Bump when the compiled format or matching rules change
+LEXICON_VERSION = "1"
+
+ENTITY_GROUPS = {"disease": "Disease_disorder", "food": "Food", "nutrient": "Nutrient"}
+CUE = "cue"
+
+
+@dataclass(frozen=True)
+class Entry:
+    concept: str
+    category: str
+    ambiguous: bool
+
+
+def read_tsv(path):
+    """{term: [Entry, ...]} from a lexicon file."""
+    terms = {}
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.rstrip("\r\n")
+            if not line.strip() or line.startswith("#"):
+                continue
+            fields = line.split("\t")
+            if len(fields) < 3:
+                raise ValueError(f"{path}:{line_number}: expected term, concept, category[, ambiguous]")
+            term, concept, category = (field.strip() for field in fields[:3])
+            if category not in ENTITY_GROUPS and category != CUE:
+                raise ValueError(f"{path}:{line_number}: unknown category '{category}'")
+            ambiguous = len(fields) > 3 and fields[3].strip() not in ("", "0")
+            entry = Entry(concept.lower(), category, ambiguous)
+            entries = terms.setdefault(" ".join(term.lower().split()), [])
+            if entry not in entries:
+                entries.append(entry)
+    return terms
+
+
+class Lexicon:
+    def __init__(self, automaton, terms, fingerprint=""):
+        self.automaton = automaton
+        self.terms = terms              # term index -> (term, [Entry, ...])
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def compile(cls, path, fingerprint=""):
+        automaton = Automaton()
+        terms = []
+        for term, entries in read_tsv(path).items():
+            automaton.add(term, len(terms))
+            terms.append((term, entries))
+        return cls(automaton.build(), terms, fingerprint)
+
+    @classmethod
+    def load(cls, path=None, cache_dir=None):
+        """Lexicon for ``path``, from the compiled file when it is current."""
+        path = path or config.LEXICON_PATH
+        cache_dir = cache_dir or config.MODEL_DIR
+        with open(path, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        fingerprint = f"{LEXICON_VERSION}-{digest[:16]}"
+        compiled_path = os.path.join(cache_dir, f"lexicon-{fingerprint}.marshal")
+
+        try:
+            with open(compiled_path, "rb") as f:
+                data = marshal.load(f)
+            terms = [(term, [Entry(*entry) for entry in entries]) for term, entries in data["terms"]]
+            return cls(Automaton.from_data(data["automaton"]), terms, fingerprint)
+        except (OSError, EOFError, ValueError, TypeError, KeyError):
+            pass
+
+        lexicon = cls.compile(path, fingerprint)
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{compiled_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            marshal.dump({
+                "automaton": lexicon.automaton.to_data(),
+                "terms": [(term, [(e.concept, e.category, e.ambiguous) for e in entries])
+                          for term, entries in lexicon.terms]
+            }, f)
+        os.replace(tmp_path, compiled_path)
+        return lexicon
+
+    def match(self, sentence):
+        """(start, end, term, [Entry, ...]) for the longest terms in ``sentence``."""
+        return [
+            (start, end) + self.terms[index]
+            for start, end, index in self.automaton.longest(sentence.lower())
+        ]
+
+    def tag(self, sentences, hybrid=False):
+        """(entities, ambiguous sentence indices) for a list of sentences.
+
+        With ``hybrid`` the ambiguous sentences get no lexicon entities;
+        they are meant for the NER model (see merge_model_entities).
+        Otherwise an ambiguous term only counts in a sentence with a
+        diagnosis cue ("k/c/o dm", but not "avoid sugar").
+        """
+        entities, ambiguous = [], []
+        for i, sentence in enumerate(sentences):
+            found, has_cue, has_disease, unclear = [], False, False, False
+            for start, end, term, entries in self.match(sentence):
+                if any(e.category == CUE for e in entries):
+                    has_cue = True
+                    continue
+                term_unclear = len(entries) > 1 or entries[0].ambiguous
+                unclear = unclear or term_unclear
+                entry = entries[0]
+                has_disease = has_disease or entry.category == "disease"
+                found.append({
+                    "entity_group": ENTITY_GROUPS[entry.category],
+                    "word": entry.concept,
+                    "text": sentence[start:end],
+                    "start": start,
+                    "end": end,
+                    "score": 0.5 if term_unclear else 1.0,
+                    "source": "lexicon",
+                    "sentence_index": i
+                })
+            if unclear or (has_cue and not has_disease):
+                ambiguous.append(i)
+                if hybrid:
+                    continue
+            entities.extend(e for e in found if has_cue or e["score"] == 1.0)
+        return entities, ambiguous
+
+
+def merge_model_entities(entities, ambiguous, model_entities):
+    """Lexicon entities plus NER-model entities found in the ambiguous
+    sentences (whose ``sentence_index`` counts within ``ambiguous``)."""
+    merged = entities + [{**e, "sentence_index": ambiguous[e["sentence_index"]]} for e in model_entities]
+    merged.sort(key=lambda e: (e["sentence_index"], e["start"]))
+    return merged
+
+
+_lexicon = None
+
+
+def get_lexicon():
+    global _lexicon
+    if _lexicon is None:
+        _lexicon = Lexicon.load()
+    return _lexicon
@@ -0,0 +1,85 @@
+"""Bounded pool for concurrent chat completion requests.
+
+Wraps an ``AsyncOpenAI`` (or any OpenAI-compatible async) client: at most
+``max_concurrency`` requests are in flight, each attempt has its own
+timeout, and transient failures (timeouts, connection errors, rate limits,
+5xx, empty completions) are retried with exponential backoff and jitter.
+"""
+import asyncio
+import random
+
+import config
+
+
+class EmptyCompletion(Exception):
+    """The API answered without any text (``content`` None or blank)."""
+
+
+def _is_retryable(error):
+    if isinstance(error, (asyncio.TimeoutError, EmptyCompletion)):
+        return True
+    try:
+        import openai
+    except ImportError:
+        return False
+    return isinstance(error, (
+        openai.APITimeoutError,
+        openai.APIConnectionError,
+        openai.RateLimitError,
+        openai.InternalServerError
+    ))
+
+
+def make_async_client(client=None):
+    """AsyncOpenAI client with the same credentials as a sync ``client``.
+
+    Retries are left to the pool, so the SDK's own retries are disabled.
+    """
+    from openai import AsyncOpenAI
+    if client is None:
+        return AsyncOpenAI(max_retries=0)
+    return AsyncOpenAI(api_key=client.api_key, base_url=client.base_url, max_retries=0)
+
+
+class AsyncLLMPool:
+    def __init__(self, client, max_concurrency=None, retries=None, timeout=None, backoff=None):
+        self.client = client
+        self.retries = config.LLM_RETRIES if retries is None else retries
+        self.timeout = config.LLM_TIMEOUT if timeout is None else timeout
+        self.backoff = config.LLM_BACKOFF if backoff is None else backoff
+        self._semaphore = asyncio.Semaphore(
+            config.LLM_MAX_CONCURRENCY if max_concurrency is None else max_concurrency
+        )
+        self.requests = 0
+        self.retried = 0
+        self.failed = 0
+
+    async def complete(self, prompt, **params):
+        """Return the completion text for ``prompt``.
+
+        ``params`` go straight to ``chat.completions.create``. Raises the
+        last error once retries are exhausted (EmptyCompletion if every
+        answer was empty).
+        """
+        for attempt in range(self.retries + 1):
+            async with self._semaphore:
+                self.requests += 1
+                try:
+                    response = await asyncio.wait_for(
+                        self.client.chat.completions.create(
+                            messages=[{"role": "user", "content": prompt}],
+                            **params
+                        ),
+                        self.timeout
+                    )
+                    content = response.choices[0].message.content
+                    if not (content or "").strip():
+                        raise EmptyCompletion("The model returned an empty completion")
+                    return content
+                except Exception as e:
+                    if attempt == self.retries or not _is_retryable(e):
+                        self.failed += 1
+                        raise
+            # back off outside the semaphore so waiting doesn't hold a slot
+            self.retried += 1
+            await asyncio.sleep(self.backoff * (2 ** attempt) * (0.5 + random.random()))
@@ -0,0 +1,122 @@
+"""Micro-batching scheduler for model calls shared across requests.
+
+Concurrent requests each submit their own work item (e.g. a report's
+sentence list). The scheduler collects items until the batch reaches
+``max_batch_size`` (measured with ``size``) or ``max_wait`` seconds have
+passed since the first one arrived, runs ``fn`` once over the whole batch
+in an executor thread and hands every caller its own slice of the result.
+The queue is bounded: when it is full, ``submit`` raises QueueFull right
+away so the server can answer 503 instead of piling up work.
+"""
+import asyncio
+import time
+
+
+class QueueFull(Exception):
+    pass
+
+
+class MicroBatcher:
+    def __init__(self, fn, max_batch_size=64, max_wait=0.01, max_queue=256,
+                 executor=None, size=len, name="batcher"):
+        """``fn`` takes a list of items and returns a list of results in
+        the same order. ``executor`` None means the loop's default."""
+        self.fn = fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self.executor = executor
+        self.size = size
+        self.name = name
+        self._queue = None
+        self._worker = None
+
+        self.batches = 0
+        self.items = 0
+        self.units = 0
+        self.rejected = 0
+        self.busy_seconds = 0.0
+        self.largest_batch = 0
+
+    def _ensure_started(self):
+        if self._worker is None or self._worker.done():
+            self._queue = self._queue or asyncio.Queue(self.max_queue)
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, item):
+        """Queue ``item`` and wait for its result."""
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((item, future))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise QueueFull(f"{self.name} queue is full ({self.max_queue} waiting)")
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        size = self.size(batch[0][0])
+        deadline = loop.time() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                await asyncio.sleep(min(remaining, 0.001))
+                continue
+            batch.append(item)
+            size += self.size(item[0])
+        return batch, size
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch, size = await self._collect()
+            # callers that went away (client disconnects) need no work
+            batch = [(item, future) for item, future in batch if not future.done()]
+            if not batch:
+                continue
+
+            start = time.perf_counter()
+            try:
+                results = await loop.run_in_executor(self.executor, self.fn, [item for item, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            finally:
+                self.busy_seconds += time.perf_counter() - start
+
+            self.batches += 1
+            self.items += len(batch)
+            self.units += size
+            self.largest_batch = max(self.largest_batch, size)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    async def close(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "batches": self.batches,
+            "requests": self.items,
+            "units": self.units,
+            "avg_batch_size": self.units / self.batches if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "rejected": self.rejected,
+            "busy_seconds": self.busy_seconds
+        }
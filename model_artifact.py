@@ -0,0 +1,190 @@
+"""Versioned risk-model artifacts: native LightGBM model + JSON manifest.
+
+Layout (RISK_ARTIFACT_DIR):
+
+    models/risk/
+        CURRENT                 name of the active version
+        <version>/model.txt     LightGBM text model (Booster.save_model)
+        <version>/manifest.json feature schema, class labels, checksum, ...
+
+Loading never unpickles anything: the model file's SHA-256 is computed
+over a memory mapping (no copy of the file in Python) and checked against
+the manifest, then LightGBM parses the file itself (Booster(model_file=)).
+``convert`` is the one-time migration from best_model.pkl. A ModelHandle
+re-reads CURRENT every few seconds, so publishing a new version swaps the
+model in running processes without a restart.
+"""
+import hashlib
+import json
+import mmap
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+import config
+
+FORMAT_VERSION = 1
+MODEL_FILE = "model.txt"
+MANIFEST_FILE = "manifest.json"
+CURRENT_FILE = "CURRENT"
+
+
+class ArtifactError(Exception):
+    pass
+
+
+class RiskModel:
+    """A loaded artifact with the parts of the LGBMClassifier API the app
+    uses (``predict``, ``predict_proba``, ``feature_name_``, ``classes_``)."""
+
+    def __init__(self, booster, manifest, path):
+        self.booster = booster
+        self.manifest = manifest
+        self.path = path
+        self.version = manifest["version"]
+        self.feature_name_ = list(manifest["feature_names"])
+        self.classes_ = np.asarray(manifest["classes"])
+
+    def predict_proba(self, X):
+        positive = self.booster.predict(X)
+        return np.column_stack([1 - positive, positive])
+
+    def predict(self, X):
+        # same rule as LGBMClassifier.predict: argmax of [1 - p, p]
+        return self.classes_[(self.booster.predict(X) > 0.5).astype(int)]
+
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    # newline="" keeps the bytes exactly as checksummed on every platform
+    with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def load(version_dir):
+    """Load and verify one artifact directory."""
+    import lightgbm
+
+    try:
+        with open(os.path.join(version_dir, MANIFEST_FILE), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ArtifactError(f"Unreadable manifest in {version_dir}: {e}")
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise ArtifactError(f"Unsupported artifact format {manifest.get('format_version')} in {version_dir}")
+
+    model_path = os.path.join(version_dir, manifest.get("model_file", MODEL_FILE))
+    try:
+        with open(model_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            digest = hashlib.sha256(mapped).hexdigest()
+    except (OSError, ValueError) as e:  # ValueError: empty file
+        raise ArtifactError(f"Unreadable model file {model_path}: {e}")
+    if digest != manifest["sha256"]:
+        raise ArtifactError(f"Checksum mismatch for {model_path}: expected {manifest['sha256']}, got {digest}")
+
+    # version directories are never rewritten after publishing, so the file
+    # LightGBM reads is the one just checked
+    booster = lightgbm.Booster(model_file=model_path)
+    if booster.feature_name() != manifest["feature_names"]:
+        raise ArtifactError(f"Feature schema of {model_path} does not match its manifest")
+    return RiskModel(booster, manifest, version_dir)
+
+
+def current_version(root=None):
+    root = root or config.RISK_ARTIFACT_DIR
+    try:
+        with open(os.path.join(root, CURRENT_FILE), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def load_current(root=None):
+    root = root or config.RISK_ARTIFACT_DIR
+    version = current_version(root)
+    if version is None:
+        raise ArtifactError(f"No published risk model in {root}")
+    return load(os.path.join(root, version))
+
+
+def publish(version, root=None):
+    """Make ``version`` the active model (atomic rename of CURRENT)."""
+    root = root or config.RISK_ARTIFACT_DIR
+    load(os.path.join(root, version))  # refuse to publish a broken artifact
+    _write_atomic(os.path.join(root, CURRENT_FILE), version + "\n")
+
+
+def convert(pickle_path, root=None, version=None, activate=True):
+    """Write an artifact from a joblib-pickled LGBMClassifier.
+
+    The pickle is only trusted here, once; returns the artifact directory.
+    """
+    import joblib
+    import lightgbm
+
+    root = root or config.RISK_ARTIFACT_DIR
+    model = joblib.load(pickle_path)
+    booster = model.booster_
+    model_str = booster.model_to_string()
+    digest = hashlib.sha256(model_str.encode("utf-8")).hexdigest()
+    version = version or digest[:12]
+
+    version_dir = os.path.join(root, version)
+    os.makedirs(version_dir, exist_ok=True)
+    _write_atomic(os.path.join(version_dir, MODEL_FILE), model_str)
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "name": "risk_model",
+        "version": version,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "model_file": MODEL_FILE,
+        "sha256": digest,
+        "feature_names": booster.feature_name(),
+        "classes": [c.item() if hasattr(c, "item") else c for c in model.classes_],
+        "objective": booster.params.get("objective", getattr(model, "objective", None)),
+        "num_trees": booster.num_trees(),
+        "lightgbm_version": lightgbm.__version__,
+        "source": os.path.basename(pickle_path)
+    }
+    _write_atomic(os.path.join(version_dir, MANIFEST_FILE), json.dumps(manifest, indent=2) + "\n")
+    if activate:
+        publish(version, root)
+    return version_dir
+
+
+class ModelHandle:
+    """The currently published RiskModel, reloaded when CURRENT changes.
+
+    Drop-in for the model object: attribute access is forwarded to the
+    active RiskModel, which is re-checked at most every ``check_seconds``.
+    """
+
+    def __init__(self, root=None, check_seconds=None):
+        self.root = root or config.RISK_ARTIFACT_DIR
+        self.check_seconds = config.RISK_MODEL_CHECK_SECONDS if check_seconds is None else check_seconds
+        self._lock = threading.Lock()
+        self._model = load_current(self.root)
+        self._checked = time.monotonic()
+        self.swaps = 0
+
+    def current(self):
+        if time.monotonic() - self._checked >= self.check_seconds:
+            with self._lock:
+                self._checked = time.monotonic()
+                version = current_version(self.root)
+                if version and version != self._model.version:
+                    try:
+                        self._model = load(os.path.join(self.root, version))
+                        self.swaps += 1
+                    except ArtifactError:
+                        pass  # keep serving the last good model
+        return self._model
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.current(), name)
@@ -0,0 +1,109 @@
+"""Lazy model registry.
+
+Models are registered with a loader function and only built the first time
+something asks for them, so importing Bertgpt / bert_utils is cheap. Load
+time and the resident memory growth seen during each load are recorded.
+"""
+import os
+import threading
+import time
+
+_loaders = {}
+_models = {}
+_stats = {}
+_locks = {}
+_registry_lock = threading.Lock()
+
+
+def _rss_bytes():
+    """Current resident set size of this process (best effort)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is KB on Linux, bytes on macOS
+        return rss if os.uname().sysname == "Darwin" else rss * 1024
+    except (ImportError, AttributeError):
+        return 0
+
+
+def register(name, loader):
+    """Register ``loader`` (a no-arg callable) under ``name``."""
+    with _registry_lock:
+        _loaders[name] = loader
+        _locks.setdefault(name, threading.Lock())
+        _models.pop(name, None)
+
+
+def get(name):
+    """Return the model registered as ``name``, loading it on first use."""
+    model = _models.get(name)
+    if model is not None:
+        return model
+
+    if name not in _loaders:
+        raise KeyError(f"No model registered as '{name}'")
+
+    with _locks[name]:
+        model = _models.get(name)
+        if model is not None:
+            return model
+
+        rss_before = _rss_bytes()
+        start = time.perf_counter()
+        model = _loaders[name]()
+        _stats[name] = {
+            "load_seconds": time.perf_counter() - start,
+            "rss_delta_mb": max(_rss_bytes() - rss_before, 0) / (1024 * 1024),
+        }
+        _models[name] = model
+        return model
+
+
+def is_loaded(name):
+    return name in _models
+
+
+def unload(name):
+    """Drop a loaded model so the next get() rebuilds it."""
+    with _locks.get(name, _registry_lock):
+        _models.pop(name, None)
+        _stats.pop(name, None)
+
+
+def warmup(names=None, background=True):
+    """Load models ahead of the first request.
+
+    With ``background=True`` the loads run in a daemon thread which is
+    returned; otherwise they run inline.
+    """
+    names = list(names) if names is not None else list(_loaders)
+
+    def _load_all():
+        for name in names:
+            try:
+                get(name)
+            except Exception as e:
+                _stats[name] = {"error": str(e)}
+
+    if not background:
+        _load_all()
+        return None
+
+    thread = threading.Thread(target=_load_all, name="model-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def stats():
+    """Per-model load status, load time and resident memory growth."""
+    report = {}
+    for name in _loaders:
+        entry = {"loaded": name in _models}
+        entry.update(_stats.get(name, {}))
+        report[name] = entry
+    return report
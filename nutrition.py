@@ -0,0 +1,510 @@
+"""Nutrient totals of diet plans, and portion adjustment towards targets.
+
+The food composition table (FOODS_PATH, default data/foods.tsv) gives the
+nutrients per 100 g of common Indian foods and dishes, plus the weight of
+one piece, one cup and a default serving. It is held as a foods ×
+NUTRIENTS matrix (per gram); every food name and alias goes into one
+aho_corasick.Automaton.
+
+``parse_line`` turns a meal line of a parse_diet_plan day into grams per
+food:
+
+    2 chapatis with 1 cup dal                        roti 80 g, dal 200 g
+    Dal (1 cup) and rice (1/2 cup)                   dal 200 g, rice 80 g
+    Grilled chicken breast 150g with salad           chicken 150 g, salad 100 g
+    Idli with sambar (3 idlis + 1 cup sambar)        idli 120 g, sambar 200 g
+    Palak paneer with jowar roti (1 cup + 2 rotis)   palak paneer 200 g, roti 80 g
+
+A line is split into items at "+", ",", "with", "and" outside brackets (an
+"or" alternative is dropped). An item's food is its last food term ("moong
+dal khichdi" is khichdi; "ghee on rotis" is ghee) and its quantity the
+number, size and unit in front of it, in brackets after it, after a dash /
+colon, or a number with a unit at its end. Thousands separators are
+dropped first ("1,200 g"). When the line is a dish name with one closing
+bracket that lists items ("+" / "," or food names inside), the brackets
+hold the items and the dish name only names the food of a quantity that
+has none ("1 cup" above). Parsed lines are memoized; stored plans repeat
+the same lines a lot.
+
+Totals are matrix products: a (plans × days × foods) gram array times the
+(foods × nutrients) table gives every day of every plan at once, so
+``score_plans`` re-scores thousands of stored plans per second against
+their targets (food_kb / plan_synth targets).
+
+``adjust_portions`` scales each food of a day within PORTION_BOUNDS to get
+as close as it can to the kcal, macro, fibre and sodium targets: a small
+bounded least-squares problem (scipy.optimize.lsq_linear).
+"""
+import json
+import re
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from typing import List
+
+import numpy as np
+
+import config
+from aho_corasick import Automaton
+from plan_synth import DEFAULT_TARGETS
+
+NUTRIENTS = ("kcal", "protein_g", "carbs_g", "fat_g", "fiber_g", "sugar_g",
+             "sodium_mg", "potassium_mg", "calcium_mg", "iron_mg")
+KCAL, PROTEIN, CARBS, FAT, FIBER, SUGAR, SODIUM = range(7)
+# energy per gram of protein, carbohydrate, fat
+MACRO_KCAL = {"protein_pct": (PROTEIN, 4), "carbs_pct": (CARBS, 4), "fat_pct": (FAT, 9)}
+# meal sections of a parse_diet_plan day (notes are not eaten)
+MEALS = ("breakfast", "lunch", "dinner", "snacks")
+
+# unit -> (measure, multiple); measure "g" is grams, "piece" / "cup" /
+# "serving" the food's own weights from the table
+UNITS = {}
+for _names, _unit in (
+    (("g", "gm", "gms", "gram", "grams", "ml"), ("g", 1)),
+    (("kg", "l", "litre", "liter"), ("g", 1000)),
+    (("glass", "glasses"), ("g", 250)),
+    (("tbsp", "tablespoon", "tablespoons"), ("g", 15)),
+    (("tsp", "teaspoon", "teaspoons"), ("g", 5)),
+    (("handful", "handfuls"), ("g", 30)),
+    (("cup", "cups"), ("cup", 1)),
+    (("katori", "katoris"), ("cup", 0.75)),
+    (("bowl", "bowls"), ("cup", 1.25)),
+    (("piece", "pieces", "pc", "pcs", "nos", "slice", "slices", "fillet", "fillets", "ball", "balls"), ("piece", 1)),
+    (("serving", "servings", "plate", "plates", "portion", "portions"), ("serving", 1)),
+):
+    UNITS.update(dict.fromkeys(_names, _unit))
+SIZES = {"small": 0.75, "medium": 1.0, "large": 1.3}
+NUMBER_WORDS = {"a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "half": 0.5}
+FRACTIONS = {"½": " 1/2", "¼": " 1/4", "¾": " 3/4", "⅓": " 1/3", "⅔": " 2/3"}
+
+# each food of a day may go from half to twice its portion
+PORTION_BOUNDS = (0.5, 2.0)
+# deviation weights of score_days / adjust_portions; "change" keeps the
+# adjusted portions near the written ones
+WEIGHTS = {"kcal": 1.0, "macro": 0.05, "sodium": 0.5, "fiber": 0.3, "change": 0.01}
+
+_NUMBER = r"\d+(?:\.\d+)?(?:\s+\d+/\d+|/\d+)?"
+_QUANTITY = (
+    rf"(?P<number>{_NUMBER}(?:\s*(?:-|–|to)\s*{_NUMBER})?|(?:{'|'.join(NUMBER_WORDS)})\b)"
+    rf"(?:\s+|(?=[a-z(]))?(?:(?P<size>{'|'.join(SIZES)})\s*)?"
+    rf"(?:(?P<unit>{'|'.join(sorted(UNITS, key=len, reverse=True))})\b\.?)?"
+    r"\s*(?:\(\s*(?P<grams>\d+(?:\.\d+)?)\s*(?:g|gm|gms|grams?|ml)\s*\))?"
+)
+_LEADING = re.compile(rf"(?:about|approx\.?|around)?\s*{_QUANTITY}(?:\s*of\b)?")
+_TRAILING = re.compile(rf"(?:[-–:]|\()\s*{_QUANTITY}\s*\)?\s*$")
+# "chicken breast 150g": a number and unit ending the item
+_BARE = re.compile(rf"\s(?=\d){_QUANTITY}$")
+_THOUSANDS = re.compile(r"(?<=\d),(?=\d{3}(?!\d))")
+_MULTIPLIER = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*[×x*]\s*")
+_SEPARATOR = re.compile(r"\s*(\+|,|;|&|\bwith\b|\band\b|\bor\b)\s*")
+_NOTE = re.compile(r"\([^()\d]*\)")
+_BULLET = re.compile(r"^\s*(?:[-*•·]|\d+[.)](?!\d))\s*")
+# "1 tsp ghee on rotis": the food is before the preposition
+_PREPOSITION = re.compile(r"\b(?:on|in|over|for|from)\b")
+
+
+@dataclass(frozen=True)
+class Portion:
+    meal: str
+    food: str
+    grams: float
+    scale: float = 1.0
+
+
+def _number(text):
+    if text in NUMBER_WORDS:
+        return NUMBER_WORDS[text]
+    # a range ("1-2 cups") counts as its middle
+    bounds = re.split(r"\s*(?:-|–|to)\s*", text)
+    values = []
+    for bound in bounds:
+        value = 0.0
+        for part in bound.split():
+            numerator, _, denominator = part.partition("/")
+            value += float(numerator) / float(denominator) if denominator else float(numerator)
+        values.append(value)
+    return sum(values) / len(values)
+
+
+def _closing_brackets(text):
+    """(name, portion) when ``text`` ends in a bracketed portion, else None."""
+    if not text.endswith(")"):
+        return None
+    depth = 0
+    for i in range(len(text) - 1, -1, -1):
+        depth += {")": 1, "(": -1}.get(text[i], 0)
+        if depth == 0:
+            return text[:i], text[i + 1:-1]
+    return None
+
+
+def _split_items(text):
+    """(separator in front, item) for ``text`` split at _SEPARATOR outside
+    brackets."""
+    items, start, separator = [], 0, ""
+    for match in _SEPARATOR.finditer(text):
+        if text.count("(", 0, match.start()) > text.count(")", 0, match.start()):
+            continue
+        items.append((separator, text[start:match.start()].strip()))
+        start, separator = match.end(), match.group(1)
+    items.append((separator, text[start:].strip()))
+    return items
+
+
+class FoodTable:
+    def __init__(self, rows):
+        self.foods = [row["food"] for row in rows]
+        self.index = {food: i for i, food in enumerate(self.foods)}
+        # (foods, NUTRIENTS) per gram
+        self.composition = np.array([[row[n] for n in NUTRIENTS] for row in rows], dtype=np.float64) / 100
+        self.serving_g = np.array([row["serving_g"] for row in rows], dtype=np.float64)
+        self.piece_g = np.array([row["piece_g"] or row["serving_g"] for row in rows], dtype=np.float64)
+        self.cup_g = np.array([row["cup_g"] or 200 for row in rows], dtype=np.float64)
+        self.automaton = Automaton()
+        for i, row in enumerate(rows):
+            for name in {row["food"], *row["aliases"]}:
+                for variant in (name, name + "s", name + "es"):
+                    self.automaton.add(variant, i)
+        self.automaton.build()
+        self.parse_line = lru_cache(maxsize=65536)(self._parse_line)
+
+    @classmethod
+    def load(cls, path=None):
+        path = path or config.FOODS_PATH
+        rows = []
+        with open(path, encoding="utf-8") as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.rstrip("\r\n")
+                if not line.strip() or line.startswith("#"):
+                    continue
+                fields = line.split("\t")
+                if len(fields) != 5 + len(NUTRIENTS):
+                    raise ValueError(f"{path}:{line_number}: expected {5 + len(NUTRIENTS)} columns, got {len(fields)}")
+                food, aliases, piece_g, cup_g, serving_g = (field.strip() for field in fields[:5])
+                rows.append({
+                    "food": " ".join(food.lower().split()),
+                    "aliases": [" ".join(a.lower().split()) for a in aliases.split("|") if a.strip()],
+                    "piece_g": float(piece_g or 0),
+                    "cup_g": float(cup_g or 0),
+                    "serving_g": float(serving_g),
+                    **{n: float(v or 0) for n, v in zip(NUTRIENTS, fields[5:])}
+                })
+        return cls(rows)
+
+    # -----------------------
+    # Meal line parsing
+    # -----------------------
+    def _food(self, text):
+        """Index of the last food term of ``text`` (before a preposition), or None."""
+        matches = (self.automaton.longest(_PREPOSITION.split(text, 1)[0])
+                   or self.automaton.longest(text))
+        return matches[-1][2] if matches else None
+
+    def _items(self, text):
+        """(food index or None, quantity match or None) per item of ``text``."""
+        items = []
+        for separator, item in _split_items(text):
+            if not item or separator == "or":
+                continue
+            # "dal (1 cup)": the bracket is the quantity of the food before it
+            brackets = _closing_brackets(item)
+            if brackets and re.search(r"\d", brackets[1]):
+                name, inside = brackets[0].strip(), brackets[1].strip()
+                food = self._food(name)
+                items.append((self._food(inside) if food is None else food, _LEADING.match(inside)))
+                continue
+            quantity = _LEADING.match(item) or _TRAILING.search(item)
+            if quantity is None:
+                bare = _BARE.search(item)
+                quantity = bare if bare and (bare.group("unit") or bare.group("grams")) else None
+            items.append((self._food(item), quantity))
+        return items
+
+    def _grams(self, food, quantity, multiplier):
+        if quantity is None:
+            return self.serving_g[food] * multiplier
+        if quantity.group("grams"):
+            return float(quantity.group("grams")) * multiplier
+        number = _number(quantity.group("number")) * multiplier
+        measure, multiple = UNITS.get(quantity.group("unit"), ("piece", 1))
+        if measure == "g":
+            return number * multiple
+        size = SIZES.get(quantity.group("size"), 1.0)
+        weight = {"piece": self.piece_g, "cup": self.cup_g, "serving": self.serving_g}[measure][food]
+        return number * multiple * size * weight
+
+    def _parse_line(self, line):
+        """((food index, grams), ...), number of items that were not understood.
+
+        >>> table = get_food_table()
+        >>> for line in ("Dal (1 cup) and rice (1/2 cup)", "Rice (1 cup) with rajma (1 cup)",
+        ...              "Chapati (2) with paneer curry (1 cup)", "Upma (1 bowl) + buttermilk (1 glass)",
+        ...              "Grilled chicken breast 150g with salad", "1,200 g rice",
+        ...              "Idli with sambar (3 idlis + 1 cup sambar)"):
+        ...     found, unmatched = table.parse_line(line)
+        ...     print([(table.foods[food], grams) for food, grams in found], unmatched)
+        [('dal', 200.0), ('rice', 80.0)] 0
+        [('rice', 160.0), ('rajma', 200.0)] 0
+        [('roti', 80.0), ('curry', 200.0)] 0
+        [('upma', 225.0), ('buttermilk', 250.0)] 0
+        [('chicken', 150.0), ('salad', 100.0)] 0
+        [('rice', 1200.0)] 0
+        [('idli', 120.0), ('sambar', 200.0)] 0
+        """
+        text = _BULLET.sub("", line.lower())
+        for fraction, replacement in FRACTIONS.items():
+            text = text.replace(fraction, replacement)
+        text = _NOTE.sub(" ", text).replace("*", " ").strip()
+        text = _THOUSANDS.sub("", " ".join(text.split()))
+
+        name, portion = "", text
+        brackets = _closing_brackets(text)
+        # one closing bracket listing the items: "dish (1 cup + 2 rotis)";
+        # otherwise each bracket is the quantity of the food before it
+        if (brackets and "(" not in brackets[0] and re.search(r"\d", brackets[1])
+                and (re.search(r"[+,]", brackets[1]) or self._food(brackets[1]) is not None)):
+            name, portion = brackets
+        multiplier = 1.0
+        scaled = _MULTIPLIER.match(portion)
+        if scaled:
+            multiplier = float(scaled.group(1))
+            portion = portion[scaled.end():]
+
+        items = self._items(portion)
+        named = [food for food, _ in items if food is not None]
+        # quantities without a food take the dish name's foods in order
+        dish_foods = [food for food, _ in self._items(name) if food is not None and food not in named]
+        found, unmatched = [], 0
+        for food, quantity in items:
+            if food is None:
+                if quantity is None or not dish_foods:
+                    unmatched += 1
+                    continue
+                food = dish_foods.pop(0)
+            found.append((food, float(self._grams(food, quantity, multiplier))))
+        return tuple(found), unmatched
+
+    def portions(self, day) -> List[Portion]:
+        """Foods and grams of a parse_diet_plan day, meal by meal."""
+        portions = []
+        for meal in MEALS:
+            for line in (day.get(meal) or "").split("\n"):
+                if line.strip():
+                    portions.extend(Portion(meal, self.foods[food], grams) for food, grams in self.parse_line(line)[0])
+        return portions
+
+    # -----------------------
+    # Totals
+    # -----------------------
+    def plan_grams(self, plans, days=7):
+        """Grams per food for a list of plans (each a list of parse_diet_plan
+        days): a (plans, days, foods) array, a (plans, days) mask of the
+        days present, and the number of meal items not understood per plan."""
+        n_foods = len(self.foods)
+        positions, grams = [], []
+        present = np.zeros((len(plans), days), dtype=bool)
+        unmatched = np.zeros(len(plans), dtype=np.int64)
+        for p, plan in enumerate(plans):
+            for d, day in enumerate(plan[:days]):
+                present[p, d] = True
+                base = (p * days + d) * n_foods
+                for meal in MEALS:
+                    for line in (day.get(meal) or "").split("\n"):
+                        if not line.strip():
+                            continue
+                        found, missed = self.parse_line(line)
+                        unmatched[p] += missed
+                        for food, amount in found:
+                            positions.append(base + food)
+                            grams.append(amount)
+        quantities = np.bincount(
+            np.asarray(positions, dtype=np.int64), weights=np.asarray(grams, dtype=np.float64),
+            minlength=len(plans) * days * n_foods
+        ).reshape(len(plans), days, n_foods)
+        return quantities, present, unmatched
+
+    def totals(self, quantities):
+        """Nutrient totals for a (..., foods) gram array: (..., NUTRIENTS)."""
+        return quantities @ self.composition
+
+
+def _target_arrays(targets, plans):
+    """Targets (one dict, or one per plan) as arrays over plans; macro
+    ranges as (plans, 2)."""
+    if targets is None or isinstance(targets, dict):
+        targets = [targets] * plans
+    merged = [{**DEFAULT_TARGETS, **(t or {})} for t in targets]
+    return {key: np.array([t[key] for t in merged], dtype=np.float64) for key in DEFAULT_TARGETS}
+
+
+def _range_penalty(share, low, high):
+    """Percentage points outside [low, high] (0 inside)."""
+    return np.maximum(low - share, 0) + np.maximum(share - high, 0)
+
+
+def score_days(totals, targets):
+    """Deviation of (plans, days, NUTRIENTS) totals from per-plan targets
+    (see _target_arrays), each (plans, days); 0 means on target.
+
+    kcal_error is relative, macro_error the percentage points of energy
+    outside the macro ranges, sodium_excess and fiber_shortfall relative
+    to their targets; ``score`` weighs them with WEIGHTS.
+    """
+    kcal_target = targets["kcal"][:, None]
+    energy = np.maximum(totals[..., KCAL], 1)
+    deviations = {"kcal_error": np.abs(totals[..., KCAL] - kcal_target) / kcal_target}
+    macro = np.zeros(totals.shape[:-1])
+    for key, (column, kcal_per_gram) in MACRO_KCAL.items():
+        share = 100 * totals[..., column] * kcal_per_gram / energy
+        macro += _range_penalty(share, targets[key][:, 0, None], targets[key][:, 1, None])
+    deviations["macro_error"] = macro
+    sodium_target = targets["sodium_mg"][:, None]
+    deviations["sodium_excess"] = np.maximum(totals[..., SODIUM] - sodium_target, 0) / sodium_target
+    fiber_target = targets["fiber_g"][:, None]
+    deviations["fiber_shortfall"] = np.maximum(fiber_target - totals[..., FIBER], 0) / fiber_target
+    deviations["score"] = (WEIGHTS["kcal"] * deviations["kcal_error"] + WEIGHTS["macro"] * macro
+                           + WEIGHTS["sodium"] * deviations["sodium_excess"]
+                           + WEIGHTS["fiber"] * deviations["fiber_shortfall"])
+    return deviations
+
+
+def score_plans(plans, targets=None, table=None, days=7):
+    """Re-score many plans at once.
+
+    ``plans`` is a list of parse_diet_plan outputs, ``targets`` one dict
+    for all of them or one per plan (food_kb guidelines["targets"]; missing
+    keys from plan_synth.DEFAULT_TARGETS). Returns arrays over plans: the
+    mean daily amount of every nutrient, the mean daily deviations of
+    score_days, "days" found and "unmatched" meal items.
+    """
+    table = table or get_food_table()
+    quantities, present, unmatched = table.plan_grams(plans, days)
+    totals = table.totals(quantities)
+    deviations = score_days(totals, _target_arrays(targets, len(plans)))
+    day_count = present.sum(axis=1)
+    per_day = np.maximum(day_count, 1)
+    result = {"days": day_count, "unmatched": unmatched}
+    for i, nutrient in enumerate(NUTRIENTS):
+        result[nutrient] = totals[..., i].sum(axis=1) / per_day
+    for key, values in deviations.items():
+        result[key] = np.where(present, values, 0).sum(axis=1) / per_day
+    return result
+
+
+def plan_nutrition(days, table=None):
+    """Totals of one plan: {"days": [{nutrient: amount}], "week": {...},
+    "daily_average": {...}}."""
+    table = table or get_food_table()
+    quantities, present, _ = table.plan_grams([days], max(len(days), 1))
+    totals = table.totals(quantities[0])[present[0]]
+    as_dict = lambda values: dict(zip(NUTRIENTS, np.round(values, 1).tolist()))
+    week = totals.sum(axis=0)
+    return {
+        "days": [as_dict(day) for day in totals],
+        "week": as_dict(week),
+        "daily_average": as_dict(week / max(len(totals), 1))
+    }
+
+
+# -----------------------
+# Portion adjustment
+# -----------------------
+def adjust_portions(day, targets=None, table=None, bounds=PORTION_BOUNDS):
+    """Portions of one parse_diet_plan day scaled towards ``targets``.
+
+    Minimizes the weighted, target-relative misses of kcal, the macro
+    energy shares (range middles), fibre (only if short) and sodium (only
+    if over), plus a small cost for each change, with every scale in
+    ``bounds``. Returns (portions with new grams and their scale, totals
+    before, totals after).
+    """
+    from scipy.optimize import lsq_linear
+
+    table = table or get_food_table()
+    targets = {**DEFAULT_TARGETS, **(targets or {})}
+    portions = table.portions(day)
+    if not portions:
+        empty = dict.fromkeys(NUTRIENTS, 0.0)
+        return portions, empty, empty
+
+    foods = np.array([table.index[p.food] for p in portions])
+    grams = np.array([p.grams for p in portions])
+    # (NUTRIENTS, portions): totals are contribution @ scales
+    contribution = (table.composition[foods] * grams[:, None]).T
+    before = contribution.sum(axis=1)
+
+    kcal = targets["kcal"]
+    rows = [WEIGHTS["kcal"] * contribution[KCAL] / kcal]
+    goals = [WEIGHTS["kcal"]]
+    for key, (column, kcal_per_gram) in MACRO_KCAL.items():
+        # share of the kcal target, in percentage points
+        weight = WEIGHTS["macro"] * 100
+        rows.append(weight * contribution[column] * kcal_per_gram / kcal)
+        goals.append(weight * sum(targets[key]) / 200)
+    if before[FIBER] < targets["fiber_g"]:
+        rows.append(WEIGHTS["fiber"] * contribution[FIBER] / targets["fiber_g"])
+        goals.append(WEIGHTS["fiber"])
+    if before[SODIUM] > targets["sodium_mg"]:
+        rows.append(WEIGHTS["sodium"] * contribution[SODIUM] / targets["sodium_mg"])
+        goals.append(WEIGHTS["sodium"])
+    change = np.sqrt(WEIGHTS["change"])
+    matrix = np.vstack([np.array(rows), change * np.eye(len(portions))])
+    goal = np.concatenate([goals, np.full(len(portions), change)])
+
+    scales = lsq_linear(matrix, goal, bounds=bounds).x
+    after = contribution @ scales
+    adjusted = [replace(p, grams=round(float(p.grams * s), 1), scale=round(float(s), 3)) for p, s in zip(portions, scales)]
+    as_dict = lambda values: dict(zip(NUTRIENTS, np.round(values, 1).tolist()))
+    return adjusted, as_dict(before), as_dict(after)
+
+
+# -----------------------
+# Audit of batch output
+# -----------------------
+def audit_jsonl(input_path, output_path, table=None, chunk_records=5000):
+    """Score every plan in a batch JSONL file (see batch) against the
+    targets of its own guidelines and write one CSV row per plan; returns
+    the number of plans."""
+    import pandas as pd
+
+    from planner import parse_diet_plan
+
+    table = table or get_food_table()
+    count, header = 0, True
+
+    def flush(records):
+        scores = score_plans([r["days"] for r in records], [r["targets"] for r in records], table)
+        out = pd.DataFrame({"path": [r["path"] for r in records], **scores})
+        out.to_csv(output_path, mode="w" if header else "a", header=header, index=False, float_format="%.4g")
+
+    records = []
+    with open(input_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # partial last line from an interrupted run
+            days = record.get("days") or (parse_diet_plan(record["plan"]) if record.get("plan") else None)
+            if not days:
+                continue
+            records.append({
+                "path": record.get("path"),
+                "days": days,
+                "targets": (record.get("guidelines") or {}).get("targets")
+            })
+            if len(records) >= chunk_records:
+                flush(records)
+                count, header, records = count + len(records), False, []
+    if records:
+        flush(records)
+        count += len(records)
+    return count
+
+
+_food_table = None
+
+
+def get_food_table():
+    global _food_table
+    if _food_table is None:
+        _food_table = FoodTable.load()
+    return _food_table
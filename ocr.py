@@ -0,0 +1,188 @@
+"""Tesseract OCR for image uploads and scanned PDF pages.
+
+Each page image is converted to grayscale, downscaled if its long side is
+over OCR_MAX_SIDE, binarized with Otsu's threshold and cut into horizontal
+tiles at blank rows (so no text line is split). Tiles are OCR'd in a
+process pool and each page's text is cached by the hash of its pixels.
+Pages are read lazily and only a few tiles per worker are queued at a time,
+so memory stays flat on long 300-dpi scans.
+
+Tesseract is optional: without pytesseract or the tesseract binary,
+``available()`` is False and images give empty text.
+"""
+import hashlib
+import io
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image
+
+import config
+import result_cache
+
+# Bump when preprocessing or Tesseract settings change
+OCR_VERSION = "1"
+TIER = "ocr"
+
+_cache = None
+
+
+@lru_cache(maxsize=1)
+def available():
+    try:
+        import pytesseract
+        pytesseract.get_tesseract_version()
+        return True
+    except Exception:
+        return False
+
+
+def _get_cache():
+    global _cache
+    if _cache is None:
+        _cache = result_cache.ResultCache(tiers=(TIER,))
+    return _cache
+
+
+def image_key(image):
+    """Cache key of a page image: its pixels plus the OCR settings."""
+    digest = hashlib.sha256(image.tobytes()).hexdigest()
+    return result_cache.make_key(digest, image.mode, image.size, OCR_VERSION, config.OCR_LANG)
+
+
+# -----------------------
+# Preprocessing
+# -----------------------
+def _otsu_threshold(histogram):
+    hist = np.asarray(histogram[:256], dtype=np.float64)
+    levels = np.arange(256)
+    weight_bg = np.cumsum(hist)
+    weight_fg = weight_bg[-1] - weight_bg
+    mass_bg = np.cumsum(hist * levels)
+    mean_bg = mass_bg / np.maximum(weight_bg, 1)
+    mean_fg = (mass_bg[-1] - mass_bg) / np.maximum(weight_fg, 1)
+    return int(np.argmax(weight_bg * weight_fg * (mean_bg - mean_fg) ** 2))
+
+
+def prepare(image, max_side=None):
+    """Grayscale, size-capped, black-on-white copy of ``image``."""
+    max_side = max_side or config.OCR_MAX_SIDE
+    gray = image.convert("L")
+    if max(gray.size) > max_side:
+        gray.thumbnail((max_side, max_side), Image.LANCZOS)
+    threshold = _otsu_threshold(gray.histogram())
+    return gray.point([0] * (threshold + 1) + [255] * (255 - threshold))
+
+
+def split_tiles(image, tile_height=None):
+    """Cut a binarized page into strips of about ``tile_height`` rows,
+    moving each cut to the emptiest row nearby. Blank strips are dropped."""
+    tile_height = tile_height or config.OCR_TILE_HEIGHT
+    width, height = image.size
+    if height <= tile_height * 1.5:
+        return [image] if image.getextrema()[0] == 0 else []
+
+    ink = (np.asarray(image) == 0).sum(axis=1)  # dark pixels per row
+    search = tile_height // 4
+    tiles, top = [], 0
+    while height - top > tile_height * 1.5:
+        target = top + tile_height
+        window = ink[target - search:target + search]
+        # of the emptiest rows, the one closest to the target height
+        candidates = np.flatnonzero(window == window.min()) + target - search
+        cut = int(candidates[np.argmin(np.abs(candidates - target))])
+        if ink[top:cut].any():
+            tiles.append(image.crop((0, top, width, cut)))
+        top = cut
+    if ink[top:].any():
+        tiles.append(image.crop((0, top, width, height)))
+    return tiles
+
+
+def _encode(tile):
+    # 1-bit PNG: a 300-dpi strip is a few KB to ship to a worker
+    buffer = io.BytesIO()
+    tile.convert("1").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+# -----------------------
+# OCR
+# -----------------------
+def _init_worker():
+    # one Tesseract thread per process; the pool provides the parallelism
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+
+
+def _ocr_tile(png, lang):
+    import pytesseract
+    return pytesseract.image_to_string(Image.open(io.BytesIO(png)), lang=lang).strip()
+
+
+def _page_text(parts):
+    texts = [part.result() if isinstance(part, Future) else part for part in parts]
+    return "\n".join(text for text in texts if text)
+
+
+def ocr_pages(pages, workers=None, cache=None):
+    """
+    Yield OCR text for each item of ``pages``, in order.
+
+    Items are PIL images, or strings that are passed through unchanged
+    (PDF pages that already have a text layer). ``pages`` is consumed
+    lazily, a few pages ahead of what has been yielded.
+    """
+    workers = config.OCR_WORKERS if workers is None else workers
+    lang = config.OCR_LANG
+    ocr_enabled = available()
+    executor = None
+    pending = deque()  # (cache key or None, text parts)
+    queued_tiles = 0
+
+    def finish():
+        nonlocal queued_tiles
+        key, parts = pending.popleft()
+        queued_tiles -= sum(isinstance(part, Future) for part in parts)
+        text = _page_text(parts)
+        if key is not None:
+            (cache or _get_cache()).set(TIER, key, text)
+        return text
+
+    try:
+        for page in pages:
+            if isinstance(page, str) or not ocr_enabled:
+                pending.append((None, [page if isinstance(page, str) else ""]))
+            else:
+                key = image_key(page)
+                text = (cache or _get_cache()).get(TIER, key)
+                if text is not None:
+                    pending.append((None, [text]))
+                else:
+                    tiles = [_encode(tile) for tile in split_tiles(prepare(page))]
+                    if not tiles:
+                        pending.append((key, [""]))
+                    elif workers <= 1:
+                        pending.append((key, [_ocr_tile(tile, lang) for tile in tiles]))
+                    else:
+                        if executor is None:
+                            executor = ProcessPoolExecutor(workers, initializer=_init_worker)
+                        pending.append((key, [executor.submit(_ocr_tile, tile, lang) for tile in tiles]))
+                        queued_tiles += len(tiles)
+            page = None  # drop the page image before reading the next one
+
+            while pending and (queued_tiles > 2 * workers or not isinstance(pending[0][1][0], Future)
+                               or all(part.done() for part in pending[0][1])):
+                yield finish()
+        while pending:
+            yield finish()
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+
+def ocr_image(image, workers=None, cache=None):
+    """OCR text of a single PIL image ("" without Tesseract)."""
+    return next(ocr_pages([image], workers=workers, cache=cache))
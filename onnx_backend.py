@@ -0,0 +1,142 @@
+"""Optional ONNX Runtime backend for the NER and intent models.
+
+Enabled with NLP_BACKEND=onnx. Each HuggingFace model is exported to ONNX
+once, dynamically quantized to int8 and cached under config.ONNX_DIR, so
+later worker starts only load the small quantized file.
+
+Needs `optimum[onnxruntime]`, which is not a hard requirement of the app.
+"""
+import json
+import os
+import sys
+
+import config
+
+QUANTIZED_FILE = "model_quantized.onnx"
+
+_TASKS = {
+    "ner": "token-classification",
+    "zero-shot-classification": "text-classification",
+}
+
+
+def _require_optimum():
+    try:
+        import optimum.onnxruntime  # noqa: F401
+    except ImportError as e:
+        raise ImportError(
+            "NLP_BACKEND=onnx needs optimum with ONNX Runtime: "
+            "pip install 'optimum[onnxruntime]'"
+        ) from e
+
+
+def _model_class(task):
+    from optimum.onnxruntime import (
+        ORTModelForSequenceClassification,
+        ORTModelForTokenClassification
+    )
+    if _TASKS[task] == "token-classification":
+        return ORTModelForTokenClassification
+    return ORTModelForSequenceClassification
+
+
+def artifact_dir(model_name):
+    safe_name = model_name.strip("/").replace("/", "--")
+    return os.path.join(config.ONNX_DIR, f"{safe_name}-{config.ONNX_QUANT_ARCH}")
+
+
+def export_quantized(model_name, task):
+    """Export + int8-quantize ``model_name`` unless already cached.
+
+    Returns the directory holding the quantized model and its tokenizer.
+    """
+    _require_optimum()
+    out_dir = artifact_dir(model_name)
+    if os.path.exists(os.path.join(out_dir, QUANTIZED_FILE)):
+        return out_dir
+
+    from optimum.onnxruntime import ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+
+    os.makedirs(out_dir, exist_ok=True)
+    model = _model_class(task).from_pretrained(model_name, export=True)
+    model.save_pretrained(out_dir)
+    AutoTokenizer.from_pretrained(model_name).save_pretrained(out_dir)
+
+    make_config = getattr(AutoQuantizationConfig, config.ONNX_QUANT_ARCH)
+    qconfig = make_config(is_static=False, per_channel=False)
+    ORTQuantizer.from_pretrained(model).quantize(save_dir=out_dir, quantization_config=qconfig)
+
+    with open(os.path.join(out_dir, "export.json"), "w") as f:
+        json.dump({
+            "model": model_name,
+            "task": task,
+            "quantization": f"dynamic-int8-{config.ONNX_QUANT_ARCH}"
+        }, f, indent=2)
+    return out_dir
+
+
+def load_pipeline(task, model_name, **kwargs):
+    """Build a transformers pipeline on top of the quantized ONNX model."""
+    from transformers import AutoTokenizer, pipeline
+
+    out_dir = export_quantized(model_name, task)
+    model = _model_class(task).from_pretrained(out_dir, file_name=QUANTIZED_FILE)
+    tokenizer = AutoTokenizer.from_pretrained(out_dir)
+    return pipeline(task, model=model, tokenizer=tokenizer, **kwargs)
+
+
+def check_parity(sentences, min_agreement=0.95):
+    """Compare ONNX outputs against the PyTorch models on ``sentences``.
+
+    Reports NER span agreement (same start/end/entity_group), intent top-label
+    agreement and the largest intent score difference. ``ok`` is True when
+    both agreement rates reach ``min_agreement``.
+    """
+    from Bertgpt import LABELS, _load_classifier, _load_ner_model
+
+    torch_ner, onnx_ner = _load_ner_model("torch"), _load_ner_model("onnx")
+    torch_clf, onnx_clf = _load_classifier("torch"), _load_classifier("onnx")
+
+    def spans(outputs):
+        return {
+            (i, e["start"], e["end"], e["entity_group"])
+            for i, out in enumerate(outputs) for e in out
+        }
+
+    torch_spans = spans(torch_ner(list(sentences)))
+    onnx_spans = spans(onnx_ner(list(sentences)))
+    union = torch_spans | onnx_spans
+    ner_agreement = len(torch_spans & onnx_spans) / len(union) if union else 1.0
+
+    same_intent = 0
+    max_score_diff = 0.0
+    for s in sentences:
+        t, o = torch_clf(s, LABELS), onnx_clf(s, LABELS)
+        same_intent += t["labels"][0] == o["labels"][0]
+        t_scores = dict(zip(t["labels"], t["scores"]))
+        o_scores = dict(zip(o["labels"], o["scores"]))
+        max_score_diff = max(max_score_diff, *(abs(t_scores[l] - o_scores[l]) for l in LABELS))
+    intent_agreement = same_intent / len(sentences) if sentences else 1.0
+
+    return {
+        "sentences": len(sentences),
+        "ner_span_agreement": ner_agreement,
+        "intent_agreement": intent_agreement,
+        "max_intent_score_diff": max_score_diff,
+        "ok": ner_agreement >= min_agreement and intent_agreement >= min_agreement
+    }
+
+
+if __name__ == "__main__":
+    # python onnx_backend.py report.txt -> export both models and check parity
+    from Bertgpt import INTENT_MODEL_NAME, NER_MODEL_NAME, clean_and_segment
+
+    print("NER model:", export_quantized(NER_MODEL_NAME, "ner"))
+    print("Intent model:", export_quantized(INTENT_MODEL_NAME, "zero-shot-classification"))
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], encoding="utf-8") as f:
+            report = check_parity(clean_and_segment(f.read()))
+        print(json.dumps(report, indent=2))
+        sys.exit(0 if report["ok"] else 1)
@@ -0,0 +1,123 @@
+"""Generate the 7-day plan as one LLM request per day, concurrently.
+
+The single 7-day prompt is slow and often hits max_tokens before Day 7.
+Here every day (plus the closing foods-to-avoid/prefer section) is its own
+short request sent through an AsyncLLMPool, and the answers are stitched
+back together in day order, so the merged text parses with
+planner.parse_diet_plan exactly like a single-request plan.
+"""
+import asyncio
+
+import plan_cache
+from llm_pool import AsyncLLMPool, make_async_client
+from planner import LLM_MODEL, is_plan_error, patient_header, prompt_version
+
+# Bump whenever the day / summary prompts change
+DAY_PROMPT_VERSION = "3"
+
+
+def build_day_prompt(structured, prediction, day):
+    return patient_header(structured, prediction) + f"""
+This is one day of a 7-day Indian diet plan. Write ONLY Day {day}, in
+exactly this format:
+
+**Day {day}**
+
+**Breakfast:**
+- Specific items with quantities (e.g., 2 chapatis, 1 cup dal, etc.)
+
+**Lunch:**
+- Specific items with quantities
+
+**Dinner:**
+- Specific items with quantities
+
+**Snacks (Optional):**
+- Healthy between-meal options
+
+**Important Notes:**
+- Hydration reminders
+- Timing suggestions
+
+Use simple, home-cooked Indian foods. Be very specific about portions.
+Do not write any other day and no introduction.
+"""
+
+
+def build_summary_prompt(structured, prediction):
+    return patient_header(structured, prediction) + """
+For this patient's weekly diet plan, list only:
+- Foods to COMPLETELY AVOID
+- Foods to PREFER and increase
+- General nutritional guidelines
+
+IMPORTANT: This is dietary guidance, not medical advice.
+"""
+
+
+async def generate_week_plan_async(structured, prediction, pool, days=7):
+    """Fan out one request per day plus the summary and merge them.
+
+    A day whose request ultimately fails (the pool retries empty answers
+    too) keeps its header with a short warning, so the remaining days
+    still come through.
+    """
+    prompts = [build_day_prompt(structured, prediction, day) for day in range(1, days + 1)]
+    prompts.append(build_summary_prompt(structured, prediction))
+
+    results = await asyncio.gather(
+        *(pool.complete(p, model=LLM_MODEL, temperature=0.3, max_tokens=600) for p in prompts),
+        return_exceptions=True
+    )
+
+    sections = []
+    for day, result in enumerate(results[:-1], start=1):
+        text = "" if isinstance(result, Exception) else (result or "").strip()
+        if not text:
+            reason = result if isinstance(result, Exception) else "empty answer"
+            sections.append(f"**Day {day}**\n\n⚠️ Could not generate this day: {reason}")
+        else:
+            sections.append(text)
+
+    summary = results[-1]
+    if not isinstance(summary, Exception) and (summary or "").strip():
+        sections.append(summary.strip())
+
+    if all(isinstance(r, Exception) for r in results[:-1]):
+        raise results[0]
+    return "\n\n---\n\n".join(sections)
+
+
+def generate_week_plan_parallel(structured, prediction, client, cache=None, **pool_options):
+    """Synchronous entry point mirroring planner.generate_week_plan.
+
+    ``client`` is the usual sync OpenAI client; an async client with the
+    same credentials is created for the duration of the call.
+    ``pool_options`` are passed to AsyncLLMPool.
+    """
+    profile = None
+    if cache is not None:
+        profile = plan_cache.normalize_profile(
+            structured, prediction,
+            f"{prompt_version()}:per-day-{DAY_PROMPT_VERSION}"
+        )
+        cached = cache.get(profile)
+        if cached is not None:
+            return cached
+
+    if not client:
+        return "⚠️ OpenAI API not configured. Please add OPENAI_API_KEY."
+
+    async def _run():
+        async with make_async_client(client) as async_client:
+            pool = AsyncLLMPool(async_client, **pool_options)
+            return await generate_week_plan_async(structured, prediction, pool)
+
+    try:
+        plan = asyncio.run(_run())
+    except Exception as e:
+        return f"⚠️ Error generating diet plan: {str(e)}"
+
+    if cache is not None and not is_plan_error(plan):
+        cache.set(profile, plan)
+    return plan
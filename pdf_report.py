@@ -0,0 +1,73 @@
+"""PDF export of a generated diet plan."""
+import io
+from datetime import datetime
+
+from reportlab.lib.pagesizes import letter
+from reportlab.lib import colors
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from reportlab.lib.units import inch
+
+# -----------------------
+# PDF Generator
+# -----------------------
+def generate_pdf(diet_plan_data, patient_info):
+    """Generate a professional PDF of the diet plan"""
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter, topMargin=0.5*inch, bottomMargin=0.5*inch)
+    story = []
+    styles = getSampleStyleSheet()
+    
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        textColor=colors.HexColor('#1e3a8a'),
+        spaceAfter=30,
+        alignment=1
+    )
+    
+    heading_style = ParagraphStyle(
+        'CustomHeading',
+        parent=styles['Heading2'],
+        fontSize=16,
+        textColor=colors.HexColor('#0891b2'),
+        spaceAfter=12,
+        spaceBefore=12
+    )
+    
+    story.append(Paragraph("🥗 AI Diet Planner", title_style))
+    story.append(Paragraph("Your Personalized Weekly Diet Plan", styles['Normal']))
+    story.append(Paragraph(f"Generated on: {datetime.now().strftime('%B %d, %Y')}", styles['Normal']))
+    story.append(Spacer(1, 0.3*inch))
+    
+    if patient_info:
+        story.append(Paragraph("Patient Information", heading_style))
+        info_data = [[k, str(v)] for k, v in patient_info.items()]
+        info_table = Table(info_data, colWidths=[2*inch, 4*inch])
+        info_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#e0f2fe')),
+            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#0891b2'))
+        ]))
+        story.append(info_table)
+        story.append(Spacer(1, 0.3*inch))
+    
+    story.append(Paragraph("Your Weekly Diet Plan", heading_style))
+    
+    for line in diet_plan_data.split('\n'):
+        if line.strip():
+            story.append(Paragraph(line, styles['Normal']))
+            story.append(Spacer(1, 0.1*inch))
+    
+    story.append(Spacer(1, 0.5*inch))
+    story.append(Paragraph("Developed by Dhruv Bhalla | AI-Powered Healthcare", styles['Italic']))
+    story.append(Paragraph("⚠️ This is AI-generated guidance, not medical advice. Consult a doctor.", styles['Italic']))
+    
+    doc.build(story)
+    buffer.seek(0)
+    return buffer
@@ -0,0 +1,396 @@
+"""Report → diet plan pipeline, independent of any UI.
+
+DietPipeline runs the same stages the Streamlit app used to run inline:
+
+    extract  → ExtractionResult   (text + numeric values from the file or its text)
+    analyze  → AnalysisResult     (sentences, entities, intents, guidelines)
+    assess   → prediction         (LightGBM risk model)
+    plan     → PlanResult         (LLM diet plan, parsed into days)
+
+Every backend is injectable: ``nlp`` is anything with the Bertgpt
+functions (the module itself by default), ``model`` the risk model,
+``client`` an OpenAI-compatible client, plus optional result/plan caches.
+app.py, the batch CLI and the HTTP API all drive this class.
+"""
+import io
+import os
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator, List, Optional
+
+import config
+import lab_extractor
+import lexicon
+import plan_synth
+import result_cache
+import risk_model
+import sentence_filter
+from extractor import extract_text, extract_text_stream, extractor_version
+from planner import (
+    LLM_MODEL,
+    build_prompt,
+    generate_week_plan,
+    is_plan_error,
+    parse_diet_plan,
+    prompt_version,
+    stream_week_plan
+)
+
+PLAN_MODES = ("single", "parallel")
+PLAN_TIERS = ("llm", "local")
+NER_MODES = ("sentences", "windowed", "fast", "hybrid")
+
+
+@dataclass
+class ExtractionResult:
+    text: str
+    numeric_data: Optional[dict]
+    file_hash: str
+    name: str = ""
+    cache_key: str = ""
+    # sentences segmented while the PDF pages came in (None: segment the text)
+    sentences: Optional[List[str]] = None
+
+
+@dataclass
+class AnalysisResult:
+    sentences: List[str]
+    entities: List[dict]
+    intents: List[dict]
+    structured: dict
+    guidelines: dict
+    cache_key: str = ""
+    # sentences dropped before the models, per reason (see sentence_filter)
+    filtered: dict = field(default_factory=dict)
+
+
+@dataclass
+class PlanResult:
+    plan: str
+    days: List[dict] = field(default_factory=list)
+    error: Optional[str] = None
+
+
+@dataclass
+class PipelineResult:
+    extraction: ExtractionResult
+    analysis: AnalysisResult
+    prediction: Any
+    plan: Optional[PlanResult] = None
+
+
+def _default_nlp():
+    import Bertgpt
+    return Bertgpt
+
+
+def _read_source(source, name=None):
+    """(bytes, name) from a path, raw bytes or an uploaded/opened file."""
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            return f.read(), name or os.fspath(source)
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source), name or ""
+    data = source.getvalue() if hasattr(source, "getvalue") else source.read()
+    return data, name or getattr(source, "name", "")
+
+
+class DietPipeline:
+    def __init__(self, nlp=None, model=None, client=None, cache=None, plan_cache=None,
+                 plan_mode="single", extract_workers=None, filter_sentences=None, ner_mode=None,
+                 plan_tier=None):
+        if plan_mode not in PLAN_MODES:
+            raise ValueError(f"plan_mode must be one of {PLAN_MODES}, got '{plan_mode}'")
+        # "llm": plans from the LLM (local plan if that fails, PLAN_FALLBACK);
+        # "local": always the local synthesizer (plan_synth), no LLM call
+        self.plan_tier = plan_tier or config.PLAN_TIER
+        if self.plan_tier not in PLAN_TIERS:
+            raise ValueError(f"plan_tier must be one of {PLAN_TIERS}, got '{self.plan_tier}'")
+        self.nlp = nlp or _default_nlp()
+        self.model = model
+        self.client = client
+        self.cache = cache
+        self.plan_cache = plan_cache
+        self.plan_mode = plan_mode
+        # None: config.PDF_WORKERS / OCR_WORKERS; 1 keeps extraction in this process
+        self.extract_workers = extract_workers
+        self.filter_sentences = config.SENTENCE_FILTER if filter_sentences is None else filter_sentences
+        # "sentences": NER per (filtered) sentence; "windowed": over the whole
+        # text in overlapping token windows (Bertgpt.extract_entities_windowed);
+        # "fast" / "hybrid": lexicon matcher, alone or with NER on ambiguous
+        # sentences only
+        self.ner_mode = ner_mode or config.NER_MODE
+        if self.ner_mode not in NER_MODES:
+            raise ValueError(f"ner_mode must be one of {NER_MODES}, got '{self.ner_mode}'")
+
+    # -----------------------
+    # Stages
+    # -----------------------
+    def extract(self, source, name=None) -> ExtractionResult:
+        data, name = _read_source(source, name)
+        file_hash = result_cache.file_key(data)
+        key = result_cache.make_key(file_hash, extractor_version())
+
+        cached = self.cache.get("text", key) if self.cache else None
+        sentences = None
+        if cached:
+            text, numeric_data = cached["text"], cached["numeric_data"]
+        else:
+            buffer = io.BytesIO(data)
+            buffer.name = name
+            if self._streams(name):
+                text, sentences = self._extract_segmented(buffer)
+                numeric_data = None
+            else:
+                text, numeric_data = extract_text(buffer, workers=self.extract_workers)
+            if self.cache:
+                self.cache.set("text", key, {"text": text, "numeric_data": numeric_data})
+        return ExtractionResult(text, self._numeric_data(text, numeric_data), file_hash, name, key, sentences)
+
+    def _streams(self, name):
+        # PDFs come page by page, so segmentation can run while later pages
+        # are still being extracted (nlp backends with a stream segmenter only)
+        return name.lower().endswith(".pdf") and hasattr(self.nlp, "clean_and_segment_stream")
+
+    def _extract_segmented(self, buffer):
+        """(text, sentences) of a PDF, segmenting each page as it arrives."""
+        pages = []
+
+        def collect():
+            for page_text in extract_text_stream(buffer, workers=self.extract_workers):
+                pages.append(page_text)
+                yield page_text
+
+        sentences = list(self.nlp.clean_and_segment_stream(collect()))
+        return "".join(pages).strip(), sentences
+
+    def from_text(self, text, numeric_data=None, name="") -> ExtractionResult:
+        """ExtractionResult for text that did not come from a file."""
+        file_hash = result_cache.file_key(text.encode("utf-8"))
+        key = result_cache.make_key(file_hash, "text")
+        return ExtractionResult(text, self._numeric_data(text, numeric_data), file_hash, name, key)
+
+    @staticmethod
+    def _numeric_data(text, numeric_data):
+        # PDF / image / TXT reports have no table: read the lab values from
+        # the text (one linear scan, recomputed rather than cached)
+        if numeric_data is None and text:
+            return lab_extractor.extract_numeric(text)
+        return numeric_data
+
+    def _nlp_key(self, extraction):
+        # the filter keeps any sentence with a lexicon term, so it depends on the lexicon too
+        variant = (f"filter-{sentence_filter.FILTER_VERSION}-{lexicon.get_lexicon().fingerprint}"
+                   if self.filter_sentences else "unfiltered")
+        ner_mode = self.ner_mode
+        if ner_mode in ("fast", "hybrid"):
+            ner_mode = f"{ner_mode}-{lexicon.get_lexicon().fingerprint}"
+        return result_cache.make_key(
+            extraction.cache_key or extraction.file_hash, self.nlp.nlp_version(), variant, ner_mode
+        )
+
+    def segment(self, text, sentences=None):
+        """(all sentences, sentence_filter.FilterResult of what the models see).
+        ``sentences`` skips segmentation when extraction already did it."""
+        if sentences is None:
+            sentences = self.nlp.clean_and_segment(text) if text else []
+        if self.filter_sentences:
+            return sentences, sentence_filter.filter_sentences(sentences)
+        positions = list(range(len(sentences)))
+        return sentences, sentence_filter.FilterResult(sentences, positions, positions)
+
+    @staticmethod
+    def restore_indices(entities, filtered):
+        """Point entities found in ``filtered.sentences`` back at the
+        original sentence list."""
+        return [{**e, "sentence_index": filtered.index[e["sentence_index"]]} for e in entities]
+
+    def cached_analysis(self, extraction: ExtractionResult) -> Optional[AnalysisResult]:
+        """The cached AnalysisResult for ``extraction``, if any."""
+        cached = self.cache.get("nlp", self._nlp_key(extraction)) if self.cache else None
+        if not cached:
+            return None
+        return self._build_analysis(extraction, cached["sentences"], cached["entities"], cached["intents"],
+                                    cached.get("filtered", {}))
+
+    def finish_analysis(self, extraction: ExtractionResult, sentences, entities, intents,
+                        filtered=None) -> AnalysisResult:
+        """Cache NLP outputs computed elsewhere (e.g. by a batching
+        scheduler) and derive the structured intent / guidelines."""
+        filtered = filtered or {}
+        if self.cache:
+            self.cache.set("nlp", self._nlp_key(extraction), {
+                "sentences": sentences,
+                "entities": entities,
+                "intents": intents,
+                "filtered": filtered
+            })
+        return self._build_analysis(extraction, sentences, entities, intents, filtered)
+
+    def _build_analysis(self, extraction, sentences, entities, intents, filtered):
+        structured = self.nlp.build_structured_intent(entities, intents)
+        guidelines = self.nlp.generate_diet_guidelines(structured)
+        return AnalysisResult(sentences, entities, intents, structured, guidelines,
+                              self._nlp_key(extraction), filtered)
+
+    def analyze(self, extraction: ExtractionResult,
+                progress: Optional[Callable[[str], None]] = None) -> AnalysisResult:
+        """NLP stage. ``progress`` is called with "segment", "entities"
+        and "intents" as each step finishes."""
+        analysis = self.cached_analysis(extraction)
+        if analysis is None:
+            nlp = self.nlp
+            sentences, filtered = self.segment(extraction.text, extraction.sentences)
+            if progress:
+                progress("segment")
+            if self.ner_mode == "windowed":
+                entities = nlp.extract_entities_windowed(extraction.text) if extraction.text else []
+            elif self.ner_mode in ("fast", "hybrid"):
+                hybrid = self.ner_mode == "hybrid"
+                entities, ambiguous = lexicon.get_lexicon().tag(filtered.sentences, hybrid=hybrid)
+                if hybrid and ambiguous:
+                    model_entities = nlp.extract_entities([filtered.sentences[i] for i in ambiguous])
+                    entities = lexicon.merge_model_entities(entities, ambiguous, model_entities)
+                entities = self.restore_indices(entities, filtered)
+            else:
+                entities = self.restore_indices(nlp.extract_entities(filtered.sentences), filtered)
+            if progress:
+                progress("entities")
+            intents = nlp.classify_intents(filtered.sentences)
+            analysis = self.finish_analysis(extraction, sentences, entities, intents, filtered.removed)
+        if progress:
+            progress("intents")
+        return analysis
+
+    def assess(self, extraction: ExtractionResult):
+        return risk_model.predict_risk(self.model, extraction.numeric_data)
+
+    def _plan_key(self, analysis, prediction, mode):
+        # plans built from bare guidelines have no analysis key to anchor on
+        if not analysis.cache_key:
+            return None
+        if mode == "parallel":
+            from parallel_planner import DAY_PROMPT_VERSION
+            variant = f"per-day-{DAY_PROMPT_VERSION}"
+        else:
+            variant = "single"
+        return result_cache.make_key(analysis.cache_key, prediction, prompt_version(), variant)
+
+    @staticmethod
+    def _fallback_plan(plan, analysis):
+        # no LLM plan at all (not configured, failed or out of budget): build
+        # one locally instead of returning the warning; a parallel plan with
+        # some failed days is kept
+        if is_plan_error(plan) and not parse_diet_plan(plan) and config.PLAN_FALLBACK == "kb":
+            return plan_synth.synthesize(analysis.guidelines)
+        return plan
+
+    def _finish_plan(self, plan, key):
+        if is_plan_error(plan):
+            return PlanResult(plan, parse_diet_plan(plan), error=plan)
+        # local plans are not cached, so the LLM plan is made once it is back
+        if self.cache and key and not plan_synth.is_local_plan(plan):
+            self.cache.set("plan", key, plan)
+        return PlanResult(plan, parse_diet_plan(plan))
+
+    def local_plan(self, analysis: AnalysisResult) -> PlanResult:
+        """Plan from the local synthesizer; milliseconds, no LLM."""
+        plan = plan_synth.synthesize(analysis.guidelines)
+        return PlanResult(plan, parse_diet_plan(plan))
+
+    def plan(self, analysis: AnalysisResult, prediction, mode=None, tier=None) -> PlanResult:
+        if (tier or self.plan_tier) == "local":
+            return self.local_plan(analysis)
+        mode = mode or self.plan_mode
+        key = self._plan_key(analysis, prediction, mode)
+        cached = self.cache.get("plan", key) if self.cache and key else None
+        if cached is not None:
+            return PlanResult(cached, parse_diet_plan(cached))
+
+        if mode == "parallel":
+            from parallel_planner import generate_week_plan_parallel
+            plan = generate_week_plan_parallel(
+                analysis.guidelines, prediction, self.client, cache=self.plan_cache
+            )
+        else:
+            plan = generate_week_plan(analysis.guidelines, prediction, self.client, cache=self.plan_cache)
+        return self._finish_plan(self._fallback_plan(plan, analysis), key)
+
+    def stream_plan(self, analysis: AnalysisResult, prediction, tier=None) -> Iterator[str]:
+        """Yield plan text as it is generated (single-request mode).
+
+        The finished plan is cached like ``plan``; a cached or local plan
+        is yielded in one piece.
+        """
+        if (tier or self.plan_tier) == "local":
+            yield self.local_plan(analysis).plan
+            return
+        key = self._plan_key(analysis, prediction, "single")
+        cached = self.cache.get("plan", key) if self.cache and key else None
+        if cached is not None:
+            yield cached
+            return
+
+        if self.client is None:
+            # nothing to stream: the profile cache, then the fallback, as in plan()
+            plan = generate_week_plan(analysis.guidelines, prediction, None, cache=self.plan_cache)
+            yield self._finish_plan(self._fallback_plan(plan, analysis), key).plan
+            return
+
+        parts = []
+        for delta in stream_week_plan(analysis.guidelines, prediction, self.client, cache=self.plan_cache):
+            parts.append(delta)
+            yield delta
+        self._finish_plan("".join(parts), key)
+
+    async def plan_async(self, analysis: AnalysisResult, prediction, llm_pool, tier=None) -> PlanResult:
+        """Single-request plan through an llm_pool.AsyncLLMPool (or None
+        to serve only from the caches)."""
+        if (tier or self.plan_tier) == "local":
+            return self.local_plan(analysis)
+        key = self._plan_key(analysis, prediction, "single")
+        cached = self.cache.get("plan", key) if self.cache and key else None
+        if cached is not None:
+            return PlanResult(cached, parse_diet_plan(cached))
+
+        import plan_cache
+        profile = plan_cache.normalize_profile(
+            analysis.guidelines, prediction, prompt_version()
+        )
+        plan = self.plan_cache.get(profile) if self.plan_cache else None
+        if plan is None:
+            if llm_pool is None:
+                plan = "⚠️ OpenAI API not configured. Please add OPENAI_API_KEY."
+            else:
+                try:
+                    plan = await llm_pool.complete(
+                        build_prompt(analysis.guidelines, prediction),
+                        model=LLM_MODEL, temperature=0.3, max_tokens=2000
+                    )
+                    if self.plan_cache:
+                        self.plan_cache.set(profile, plan)
+                except Exception as e:
+                    plan = f"⚠️ Error generating diet plan: {str(e)}"
+        return self._finish_plan(self._fallback_plan(plan, analysis), key)
+
+    # -----------------------
+    # Whole run
+    # -----------------------
+    def run(self, source, name=None, with_plan=True) -> PipelineResult:
+        extraction = self.extract(source, name)
+        analysis = self.analyze(extraction)
+        prediction = self.assess(extraction)
+        plan = self.plan(analysis, prediction) if with_plan else None
+        return PipelineResult(extraction, analysis, prediction, plan)
+
+
+def default_pipeline(client=None, **kwargs):
+    """Pipeline wired with the on-disk caches and the bundled risk model."""
+    import plan_cache
+
+    try:
+        model = risk_model.load_model()
+    except Exception:
+        model = None
+    kwargs.setdefault("cache", result_cache.ResultCache())
+    kwargs.setdefault("plan_cache", plan_cache.PlanCache())
+    return DietPipeline(model=model, client=client, **kwargs)
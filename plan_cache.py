@@ -0,0 +1,105 @@
+"""Profile-keyed cache for LLM diet plans.
+
+The plan prompt only depends on the detected conditions and the risk
+prediction, and many patients share the same profile. Plans are keyed on a
+normalized profile (sorted, lower-cased, deduplicated diseases + bucketed
+risk + prompt version) so those patients share one LLM response. Optionally
+a profile whose disease set is similar enough (Jaccard) to a cached one
+reuses that plan too.
+"""
+import config
+import result_cache
+
+TIER = "llm"
+
+
+def risk_bucket(prediction):
+    """Coarse risk label: class-N for class predictions, low/medium/high
+    for probabilities, unknown for anything non-numeric."""
+    try:
+        value = float(prediction)
+    except (TypeError, ValueError):
+        return "unknown"
+    if value.is_integer():
+        return f"class-{int(value)}"
+    if value < 1 / 3:
+        return "low"
+    if value < 2 / 3:
+        return "medium"
+    return "high"
+
+
+def normalize_profile(structured, prediction, prompt_version):
+    """Reduce plan inputs to the parts the prompt actually varies on."""
+    diseases = structured.get("diseases")
+    if not diseases:
+        condition = structured.get("condition", "General")
+        diseases = [] if condition == "General" else condition.split(",")
+
+    return {
+        "diseases": sorted({d.strip().lower() for d in diseases if d and d.strip()}),
+        "risk": risk_bucket(prediction),
+        "prompt": prompt_version
+    }
+
+
+def _jaccard(a, b):
+    union = a | b
+    return len(a & b) / len(union) if union else 1.0
+
+
+class PlanCache:
+    def __init__(self, store=None, similarity=None):
+        self.store = store or result_cache.ResultCache(
+            config.PLAN_CACHE_PATH,
+            max_entries=config.PLAN_CACHE_MAX_ENTRIES,
+            ttl_seconds=config.PLAN_CACHE_TTL,
+            tiers=(TIER,)
+        )
+        self.similarity = similarity if similarity is not None else config.PLAN_CACHE_SIMILARITY
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(profile):
+        return result_cache.make_key(profile["prompt"], profile["risk"], *profile["diseases"])
+
+    def get(self, profile):
+        plan = self.store.get(TIER, self.key(profile))
+        if plan is not None:
+            self.hits += 1
+            return plan
+
+        if self.similarity > 0:
+            plan = self._get_near_duplicate(profile)
+            if plan is not None:
+                self.near_hits += 1
+                return plan
+
+        self.misses += 1
+        return None
+
+    def _get_near_duplicate(self, profile):
+        diseases = set(profile["diseases"])
+        best_key, best_score = None, self.similarity
+        for key, meta in self.store.metas(TIER):
+            if meta["risk"] != profile["risk"] or meta["prompt"] != profile["prompt"]:
+                continue
+            score = _jaccard(diseases, set(meta["diseases"]))
+            if score >= best_score:
+                best_key, best_score = key, score
+        return self.store.get(TIER, best_key) if best_key else None
+
+    def set(self, profile, plan):
+        self.store.set(TIER, self.key(profile), plan, meta=profile)
+
+    def stats(self):
+        lookups = self.hits + self.near_hits + self.misses
+        return {
+            "hits": self.hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.near_hits) / lookups if lookups else 0.0,
+            "entries": self.store.stats()[TIER]["entries"]
+        }
@@ -0,0 +1,291 @@
+"""Local 7-day plan synthesizer: no LLM, about ten milliseconds per plan.
+
+Meals come from MEALS_PATH (default data/meals.json), one portion each
+with nutrition (kcal, protein, carbs, fat, fibre, sodium) and tags for the
+foods they are made with. On load they are indexed per slot as NumPy
+arrays: a nutrient matrix and a boolean meal × food-tag matrix, so the
+restricted-food filter and the scoring of every candidate meal are single
+vectorized operations. Every food the food_kb rules name must be a tag or
+listed as untagged (in no meal), or loading fails.
+
+Days are planned one after another with a beam search over the slots:
+after each slot the BEAM_WIDTH best partial days (meal × SERVINGS size
+per slot) are kept. A partial day is scored on:
+
+    calories   distance from the day's kcal target so far
+    macros     how far the carbohydrate / protein / fat energy shares fall
+               outside the targets, if the open slots fill the rest of the
+               kcal target at the middle of the ranges
+    sodium     day sodium, plus the least the open slots can add, over the
+               target
+    foods      limited foods cost, preferred foods earn a little
+    rotation   meals already used this week (more if used yesterday), so
+               nothing repeats while there are alternatives
+    servings   a small cost for anything but the listed portion
+
+Complete days outside the kcal tolerance, a macro range or the sodium
+target pay a large fixed cost, so the targets are hard constraints while
+any combination meets them; a day that still misses one says so in the
+plan notes.
+
+Targets and food lists are the guidelines from food_kb. The text uses the
+layout planner.parse_diet_plan reads, so a local plan renders, exports and
+parses exactly like an LLM plan.
+"""
+import json
+from dataclasses import dataclass
+from typing import Dict, List
+
+import numpy as np
+
+import config
+import food_kb
+
+SLOTS = ("breakfast", "lunch", "dinner", "snacks")
+SLOT_TITLES = {"breakfast": "Breakfast", "lunch": "Lunch", "dinner": "Dinner", "snacks": "Snacks (Optional)"}
+# share of the day's calories per slot
+SLOT_SHARES = {"breakfast": 0.25, "lunch": 0.35, "dinner": 0.30, "snacks": 0.10}
+NUTRIENTS = ("kcal", "protein_g", "carbs_g", "fat_g", "fiber_g", "sodium_mg")
+KCAL, PROTEIN, CARBS, FAT, FIBER, SODIUM = range(len(NUTRIENTS))
+# energy per gram of protein, carbohydrate, fat
+MACRO_KCAL = {"protein_pct": (PROTEIN, 4), "carbs_pct": (CARBS, 4), "fat_pct": (FAT, 9)}
+
+# multiples of a meal's listed portion the synthesizer may serve
+SERVINGS = (1.0, 1.5, 2.0)
+
+DEFAULT_TARGETS = {"kcal": 1900, "carbs_pct": (45, 60), "protein_pct": (12, 20), "fat_pct": (20, 30),
+                   "sodium_mg": 2300, "fiber_g": 25}
+# "macro" is per percentage point outside a range, "limits" weighs a kcal
+# miss beyond KCAL_TOLERANCE and sodium over the target (both relative);
+# "miss" is added once to a day outside any target, so targets act as hard
+# constraints whenever some candidate day meets them
+WEIGHTS = {"kcal": 1.0, "macro": 5.0, "limits": 100.0, "miss": 100.0, "limited": 0.3, "preferred": 0.05,
+           "repeat": 2.0, "yesterday": 2.0, "style": 0.05, "servings": 0.1}
+KCAL_TOLERANCE = 0.1
+MISS_LABELS = {"kcal": "calories", "protein_pct": "protein share", "carbs_pct": "carbohydrate share",
+               "fat_pct": "fat share", "sodium_mg": "sodium"}
+# partial days kept after each slot
+BEAM_WIDTH = 64
+
+# First line of every local plan; such plans are not cached as LLM plans
+LOCAL_PLAN_MARKER = "*Offline plan from the local meal database (no AI model used).*"
+
+
+@dataclass
+class SlotIndex:
+    meals: List[dict]
+    nutrients: np.ndarray      # (meals, NUTRIENTS) float64
+    tags: np.ndarray           # (meals, food tags) bool
+    styles: np.ndarray         # style code per meal
+
+
+class MealDB:
+    def __init__(self, meals, untagged=()):
+        # food_kb foods no meal contains (see check_foods)
+        self.untagged = frozenset(untagged)
+        self.tag_ids = {}
+        for meal in meals:
+            for food in meal.get("foods", ()):
+                self.tag_ids.setdefault(food, len(self.tag_ids))
+        style_ids = {}
+        self.slots: Dict[str, SlotIndex] = {}
+        for slot in SLOTS:
+            slot_meals = [m for m in meals if m["slot"] == slot]
+            tags = np.zeros((len(slot_meals), len(self.tag_ids)), dtype=bool)
+            for i, meal in enumerate(slot_meals):
+                tags[i, [self.tag_ids[f] for f in meal.get("foods", ())]] = True
+            self.slots[slot] = SlotIndex(
+                slot_meals,
+                np.array([[m.get(n, 0) for n in NUTRIENTS] for m in slot_meals], dtype=np.float64)
+                .reshape(len(slot_meals), len(NUTRIENTS)),
+                tags,
+                np.array([style_ids.setdefault(m.get("style", ""), len(style_ids)) for m in slot_meals])
+            )
+
+    @classmethod
+    def load(cls, path=None):
+        with open(path or config.MEALS_PATH, encoding="utf-8") as f:
+            data = json.load(f)
+        db = cls(data["meals"], data.get("untagged", ()))
+        db.check_foods(food_kb.get_kb().foods())
+        return db
+
+    def check_foods(self, foods):
+        """Raise ValueError for foods that are neither a meal tag nor listed
+        as untagged: the food filters would silently skip them."""
+        unknown = sorted(set(foods) - set(self.tag_ids) - self.untagged)
+        if unknown:
+            raise ValueError(f"meal database has no tag for food rule(s): {', '.join(unknown)}")
+
+    def tag_mask(self, foods):
+        """Boolean vector over food tags for a list of food names."""
+        mask = np.zeros(len(self.tag_ids), dtype=bool)
+        mask[[self.tag_ids[f] for f in foods if f in self.tag_ids]] = True
+        return mask
+
+
+def _range_penalty(share, low, high):
+    """Percentage points outside [low, high] (0 inside)."""
+    return np.maximum(low - share, 0) + np.maximum(share - high, 0)
+
+
+def _target_cost(totals, targets, done, sodium_floor):
+    """How far (..., NUTRIENTS) day totals, ``done`` of the way through the
+    day's kcal shares, are from the targets. Open slots are assumed to fill
+    the rest of the kcal target at the middle of the macro ranges and to
+    add at least ``sodium_floor`` mg of sodium. Complete days (``done`` 1)
+    also pay WEIGHTS["miss"] if they miss a target (see day_misses)."""
+    kcal = targets["kcal"]
+    final = done >= 1
+    filler = np.zeros(totals.shape[:-1]) if final else np.maximum(kcal - totals[..., KCAL], 0)
+    energy = np.maximum(totals[..., KCAL] + filler, 1)
+    kcal_error = np.abs(totals[..., KCAL] - kcal * done) / kcal
+    cost = WEIGHTS["kcal"] * kcal_error + WEIGHTS["limits"] * np.maximum(kcal_error - KCAL_TOLERANCE, 0)
+    misses = kcal_error > KCAL_TOLERANCE
+    for key, (column, kcal_per_gram) in MACRO_KCAL.items():
+        share = 100 * (totals[..., column] * kcal_per_gram + filler * sum(targets[key]) / 200) / energy
+        outside = _range_penalty(share, *targets[key])
+        cost += WEIGHTS["macro"] * outside
+        misses |= outside > 0.5
+    sodium_excess = np.maximum(totals[..., SODIUM] + sodium_floor - targets["sodium_mg"], 0)
+    misses |= sodium_excess > 0
+    cost += WEIGHTS["limits"] * sodium_excess / targets["sodium_mg"]
+    # a whole day that misses any target loses to every day that meets them
+    return cost + WEIGHTS["miss"] * misses if final else cost
+
+
+def day_misses(totals, targets):
+    """Targets a day's totals (nutrient name -> amount) miss: "kcal" beyond
+    KCAL_TOLERANCE, macro ranges by more than half a point, "sodium_mg"."""
+    targets = {**DEFAULT_TARGETS, **targets}
+    misses = []
+    if abs(totals["kcal"] - targets["kcal"]) > KCAL_TOLERANCE * targets["kcal"]:
+        misses.append("kcal")
+    energy = max(totals["kcal"], 1)
+    for key, (column, kcal_per_gram) in MACRO_KCAL.items():
+        share = 100 * totals[NUTRIENTS[column]] * kcal_per_gram / energy
+        if _range_penalty(share, *targets[key]) > 0.5:
+            misses.append(key)
+    if totals["sodium_mg"] > targets["sodium_mg"]:
+        misses.append("sodium_mg")
+    return misses
+
+
+def plan_week(guidelines, days=7, db=None):
+    """Chosen meals per day: a list of {slot: (meal dict, servings)} plus
+    day totals under "totals" (nutrient name -> amount) and the targets
+    the day still misses under "misses" (see day_misses)."""
+    db = db or get_meal_db()
+    targets = {**DEFAULT_TARGETS, **(guidelines.get("targets") or {})}
+    restricted = db.tag_mask(guidelines.get("restricted_foods", ()))
+    limited = db.tag_mask(guidelines.get("limited_foods", ()))
+    preferred = db.tag_mask(guidelines.get("allowed_foods", ()))
+    servings = np.asarray(SERVINGS)
+
+    # per slot, every (meal, servings) option of the meals left after the
+    # restricted-food filter
+    options = {}
+    for slot in SLOTS:
+        index = db.slots[slot]
+        ids = np.flatnonzero(~(index.tags & restricted).any(axis=1))
+        if not len(ids):
+            continue
+        options[slot] = {
+            "ids": ids,
+            "meal": np.repeat(np.arange(len(ids)), len(servings)),
+            "serving": np.tile(np.arange(len(servings)), len(ids)),
+            "nutrients": (index.nutrients[ids][:, None, :] * servings[None, :, None]).reshape(-1, len(NUTRIENTS)),
+            "styles": np.repeat(index.styles[ids], len(servings)),
+            "static": np.repeat(WEIGHTS["limited"] * (index.tags[ids] & limited).sum(axis=1)
+                                - WEIGHTS["preferred"] * (index.tags[ids] & preferred).sum(axis=1), len(servings))
+                      + np.tile(WEIGHTS["servings"] * np.abs(servings - 1) / 0.5, len(ids)),
+            "uses": np.zeros(len(ids)),
+            "yesterday": np.zeros(len(ids), dtype=bool)
+        }
+    slots = list(options)
+    # least sodium the slots after each one can add
+    lowest = [options[slot]["nutrients"][:, SODIUM].min() for slot in slots]
+    sodium_floor = [sum(lowest[i + 1:]) for i in range(len(slots))]
+    shares = np.cumsum([SLOT_SHARES[slot] for slot in slots]) / sum(SLOT_SHARES[slot] for slot in slots)
+    shares[-1] = 1.0  # the last slot closes the day
+
+    week = []
+    for _ in range(days):
+        # beam of partial days: totals, meal costs so far, last style, picks
+        totals = np.zeros((1, len(NUTRIENTS)))
+        costs = np.zeros(1)
+        styles = np.full(1, -1)
+        picks = np.zeros((1, 0), dtype=np.int64)
+        for position, slot in enumerate(slots):
+            o = options[slot]
+            meal_cost = (o["static"] + WEIGHTS["repeat"] * o["uses"][o["meal"]]
+                         + WEIGHTS["yesterday"] * o["yesterday"][o["meal"]])
+            # (beam, options)
+            cost = (costs[:, None] + meal_cost[None, :]
+                    + WEIGHTS["style"] * (o["styles"][None, :] == styles[:, None]))
+            projected = totals[:, None, :] + o["nutrients"][None, :, :]
+            score = cost + _target_cost(projected, targets, shares[position], sodium_floor[position])
+            flat = score.ravel()
+            keep = np.argsort(flat, kind="stable")[:BEAM_WIDTH]
+            beam, option = np.unravel_index(keep, score.shape)
+            totals = projected[beam, option]
+            costs = cost[beam, option]
+            styles = o["styles"][option]
+            picks = np.column_stack([picks[beam], option])
+
+        day = {}
+        for slot, option in zip(slots, picks[0]):
+            o = options[slot]
+            meal = o["meal"][option]
+            o["uses"][meal] += 1
+            o["yesterday"][:] = False
+            o["yesterday"][meal] = True
+            day[slot] = (db.slots[slot].meals[o["ids"][meal]], float(servings[o["serving"][option]]))
+        day["totals"] = dict(zip(NUTRIENTS, totals[0].round(1).tolist()))
+        day["misses"] = day_misses(day["totals"], targets)
+        week.append(day)
+    return week
+
+
+def synthesize(guidelines, days=7, db=None):
+    """7-day plan text in the format planner.parse_diet_plan reads."""
+    week = plan_week(guidelines, days, db)
+    lines = [LOCAL_PLAN_MARKER, ""]
+    for number, day in enumerate(week, start=1):
+        lines += [f"**Day {number}**", ""]
+        for slot in SLOTS:
+            if slot in day:
+                meal, size = day[slot]
+                portion = meal["portion"] if size == 1 else f"{size:g} × {meal['portion']}"
+                lines += [f"**{SLOT_TITLES[slot]}:**", f"- {meal['name']} ({portion})", ""]
+        totals = day["totals"]
+        lines += [
+            "**Important Notes:**",
+            "- Drink 8-10 glasses of water through the day",
+            f"- About {totals['kcal']:.0f} kcal, {totals['protein_g']:.0f} g protein, "
+            f"{totals['carbs_g']:.0f} g carbohydrate, {totals['fat_g']:.0f} g fat, "
+            f"{totals['fiber_g']:.0f} g fibre, {totals['sodium_mg']:.0f} mg sodium"
+        ]
+        if day["misses"]:
+            missed = ", ".join(MISS_LABELS[key] for key in day["misses"])
+            lines.append(f"- The meal database could not meet every target today ({missed})")
+        lines += [f"- {advice}" for advice in guidelines.get("kb_advice", ())]
+        lines.append("")
+    # the food lists are in the guidelines already; food names such as
+    # "salty snacks" would read as meal headers to parse_diet_plan
+    lines.append("IMPORTANT: This is dietary guidance, not medical advice.")
+    return "\n".join(lines)
+
+
+def is_local_plan(plan):
+    return plan.startswith(LOCAL_PLAN_MARKER)
+
+
+_meal_db = None
+
+
+def get_meal_db():
+    global _meal_db
+    if _meal_db is None:
+        _meal_db = MealDB.load()
+    return _meal_db
@@ -0,0 +1,240 @@
+"""Diet plan generation (LLM prompt + call) and parsing.
+
+Kept free of Streamlit so it can be used from scripts and tested with a
+stub client.
+"""
+import food_kb
+import plan_cache
+
+# -----------------------
+# Parse Diet Plan
+# -----------------------
+DAY_KEYWORDS = ['day 1', 'day 2', 'day 3', 'day 4', 'day 5', 'day 6', 'day 7',
+                'day one', 'day two', 'day three', 'day four', 'day five', 'day six', 'day seven']
+
+class DietPlanParser:
+    """Incremental version of parse_diet_plan.
+
+    Feed it text as it arrives (e.g. LLM stream deltas); ``feed`` returns the
+    day dicts whose block has closed, i.e. once the next day's header shows
+    up. ``close`` flushes the last day.
+    """
+
+    def __init__(self):
+        self._buffer = ''
+        self._current_day = None
+        self._current_meal = None
+
+    def feed(self, text):
+        self._buffer += text
+        *lines, self._buffer = self._buffer.split('\n')
+        finished = []
+        for line in lines:
+            day = self._handle_line(line)
+            if day:
+                finished.append(day)
+        return finished
+
+    def close(self):
+        finished = self.feed('\n')
+        if self._current_day:
+            finished.append(self._current_day)
+            self._current_day = None
+        return finished
+
+    def _handle_line(self, line):
+        """Process one line; returns the previous day when a new one starts."""
+        line = line.strip()
+        if not line or line in ['---', '***', '___']:
+            return None
+        
+        line_lower = line.lower()
+        
+        if any(keyword in line_lower for keyword in DAY_KEYWORDS):
+            finished = self._current_day
+            self._current_day = {
+                'title': line,
+                'breakfast': '',
+                'lunch': '',
+                'dinner': '',
+                'snacks': '',
+                'notes': ''
+            }
+            self._current_meal = None
+            return finished
+        
+        if self._current_day:
+            if 'breakfast' in line_lower or 'morning meal' in line_lower:
+                self._current_meal = 'breakfast'
+                return None
+            elif 'lunch' in line_lower or 'afternoon meal' in line_lower or 'mid-day' in line_lower:
+                self._current_meal = 'lunch'
+                return None
+            elif 'dinner' in line_lower or 'evening meal' in line_lower or 'night' in line_lower:
+                self._current_meal = 'dinner'
+                return None
+            elif 'snack' in line_lower or 'mid-meal' in line_lower:
+                self._current_meal = 'snacks'
+                return None
+            elif any(word in line_lower for word in ['note', 'tip', 'important', 'remember', 'hydration']):
+                self._current_meal = 'notes'
+            
+            if self._current_meal:
+                line = line.replace('**', '').replace('*', '').strip()
+                if line and not line.startswith('#'):
+                    self._current_day[self._current_meal] += line + '\n'
+        return None
+
+def parse_diet_plan(plan_text):
+    """Parse the diet plan text into structured day-by-day format"""
+    parser = DietPlanParser()
+    return parser.feed(plan_text) + parser.close()
+
+# -----------------------
+# Diet Plan Generator
+# -----------------------
+LLM_MODEL = "gpt-4o-mini"
+# Bump whenever the prompt below changes so cached plans are not reused
+PROMPT_VERSION = "2"
+
+def patient_header(structured, prediction):
+    """Opening of every plan prompt: role + patient information, plus the
+    food rules from the knowledge base (food_kb) when present."""
+    header = f"""
+You are an expert clinical nutritionist creating a personalized Indian diet plan.
+
+Patient Information:
+- Condition: {structured.get('condition', 'General')}
+- Health Risk Score: {prediction}
+- Detected Issues: {', '.join(structured.get('diseases', ['None']))}
+"""
+    for label, key in (("prefer", "allowed_foods"), ("limit", "limited_foods"), ("avoid", "restricted_foods")):
+        if structured.get(key):
+            header += f"- Foods to {label}: {', '.join(structured[key])}\n"
+    return header
+
+def build_prompt(structured, prediction):
+    return patient_header(structured, prediction) + """
+Create a DETAILED 7-day Indian diet plan. For EACH day from Day 1 to Day 7, provide:
+
+**Day [Number]**
+
+**Breakfast:**
+- Specific items with quantities (e.g., 2 chapatis, 1 cup dal, etc.)
+
+**Lunch:**
+- Specific items with quantities
+
+**Dinner:**
+- Specific items with quantities
+
+**Snacks (Optional):**
+- Healthy between-meal options
+
+**Important Notes:**
+- Hydration reminders
+- Timing suggestions
+
+At the end, include:
+- Foods to COMPLETELY AVOID
+- Foods to PREFER and increase
+- General nutritional guidelines
+
+Use simple, home-cooked Indian foods. Be very specific about portions.
+
+IMPORTANT: This is dietary guidance, not medical advice.
+"""
+
+# Markers of the warning text returned instead of (part of) a plan
+PLAN_ERROR_MARKERS = (
+    "⚠️ OpenAI API not configured",
+    "⚠️ Error generating diet plan",
+    "⚠️ Could not generate this day"
+)
+
+def is_plan_error(plan):
+    """True if the plan is, or contains, one of our warning messages."""
+    return any(marker in plan for marker in PLAN_ERROR_MARKERS)
+
+def prompt_version():
+    """Model, prompt and food rules version for plan cache keys; the rules
+    (food_kb) are part of every prompt through patient_header."""
+    return f"{LLM_MODEL}:{PROMPT_VERSION}:kb-{food_kb.get_kb().fingerprint}"
+
+def _profile(structured, prediction):
+    return plan_cache.normalize_profile(structured, prediction, prompt_version())
+
+def generate_week_plan(structured, prediction, client, cache=None):
+    """Ask the LLM for a 7-day plan.
+
+    ``client`` is an OpenAI-compatible client (or None). With a PlanCache,
+    plans are looked up by normalized patient profile first and stored
+    after a successful call; a cached plan is served even without a client.
+    """
+    profile = None
+    if cache is not None:
+        profile = _profile(structured, prediction)
+        cached = cache.get(profile)
+        if cached is not None:
+            return cached
+
+    if not client:
+        return "⚠️ OpenAI API not configured. Please add OPENAI_API_KEY."
+
+    try:
+        response = client.chat.completions.create(
+            model=LLM_MODEL,
+            messages=[{"role": "user", "content": build_prompt(structured, prediction)}],
+            temperature=0.3,
+            max_tokens=2000
+        )
+        plan = response.choices[0].message.content
+    except Exception as e:
+        return f"⚠️ Error generating diet plan: {str(e)}"
+
+    if cache is not None:
+        cache.set(profile, plan)
+    return plan
+
+def stream_week_plan(structured, prediction, client, cache=None):
+    """Streaming variant of generate_week_plan.
+
+    Yields text chunks as the completion arrives; pipe them through a
+    DietPlanParser to get each day as soon as it is complete. A cached plan
+    is yielded in one piece, and a fully streamed plan is stored in the
+    cache. Errors are yielded as a warning line.
+    """
+    profile = None
+    if cache is not None:
+        profile = _profile(structured, prediction)
+        cached = cache.get(profile)
+        if cached is not None:
+            yield cached
+            return
+
+    if not client:
+        yield "⚠️ OpenAI API not configured. Please add OPENAI_API_KEY."
+        return
+
+    parts = []
+    try:
+        stream = client.chat.completions.create(
+            model=LLM_MODEL,
+            messages=[{"role": "user", "content": build_prompt(structured, prediction)}],
+            temperature=0.3,
+            max_tokens=2000,
+            stream=True
+        )
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                yield delta
+    except Exception as e:
+        yield f"\n⚠️ Error generating diet plan: {str(e)}"
+        return
+
+    if cache is not None and parts:
+        cache.set(profile, "".join(parts))
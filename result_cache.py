@@ -0,0 +1,164 @@
+"""Content-addressed cache for report analysis results.
+
+Entries are keyed by a SHA-256 of the uploaded file's bytes combined with
+the versions of whatever produced the value (extractor, NLP models, prompt),
+so changing a model or prompt never serves stale results. Values live in a
+local SQLite file, one row per (tier, key), with TTL expiry and LRU eviction
+per tier.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import config
+
+TIERS = ("text", "nlp", "plan")
+
+
+def file_key(data):
+    """SHA-256 hex digest of raw file bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def make_key(*parts):
+    """Combine a file hash and version strings into one cache key."""
+    return hashlib.sha256("\x1f".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+
+def _to_json(value):
+    # numpy scalars (NER scores, CSV cells) -> plain Python numbers
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class ResultCache:
+    def __init__(self, path=None, max_entries=None, ttl_seconds=None, tiers=TIERS):
+        self.path = path or config.RESULT_CACHE_PATH
+        self.max_entries = max_entries if max_entries is not None else config.RESULT_CACHE_MAX_ENTRIES
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else config.RESULT_CACHE_TTL
+        self.tiers = tuple(tiers)
+        self.hits = {tier: 0 for tier in self.tiers}
+        self.misses = {tier: 0 for tier in self.tiers}
+        self._lock = threading.Lock()
+
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " tier TEXT NOT NULL,"
+                " key TEXT NOT NULL,"
+                " value TEXT NOT NULL,"
+                " meta TEXT,"
+                " created REAL NOT NULL,"
+                " accessed REAL NOT NULL,"
+                " PRIMARY KEY (tier, key))"
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(results)")}
+            if "meta" not in columns:
+                self._conn.execute("ALTER TABLE results ADD COLUMN meta TEXT")
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS results_lru ON results (tier, accessed)"
+            )
+
+    def _check_tier(self, tier):
+        if tier not in self.hits:
+            raise ValueError(f"Unknown cache tier '{tier}', expected one of {self.tiers}")
+
+    def get(self, tier, key):
+        """Return the cached value or None; refreshes the entry's LRU time."""
+        self._check_tier(tier)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created FROM results WHERE tier = ? AND key = ?",
+                (tier, key)
+            ).fetchone()
+
+            if row is None or (self.ttl_seconds and now - row[1] > self.ttl_seconds):
+                if row is not None:
+                    with self._conn:
+                        self._conn.execute(
+                            "DELETE FROM results WHERE tier = ? AND key = ?", (tier, key)
+                        )
+                self.misses[tier] += 1
+                return None
+
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE results SET accessed = ? WHERE tier = ? AND key = ?",
+                    (now, tier, key)
+                )
+            self.hits[tier] += 1
+        return json.loads(row[0])
+
+    def set(self, tier, key, value, meta=None):
+        """Store ``value``; ``meta`` is a small JSON-able description that
+        can be listed later without loading the values (see ``metas``)."""
+        self._check_tier(tier)
+        now = time.time()
+        payload = json.dumps(value, default=_to_json)
+        meta_payload = json.dumps(meta, default=_to_json) if meta is not None else None
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (tier, key, value, meta, created, accessed)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (tier, key, payload, meta_payload, now, now)
+            )
+            self._evict(tier, now)
+
+    def metas(self, tier):
+        """(key, meta) for every live entry of ``tier`` that has meta."""
+        self._check_tier(tier)
+        oldest = time.time() - self.ttl_seconds if self.ttl_seconds else 0
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, meta FROM results"
+                " WHERE tier = ? AND meta IS NOT NULL AND created >= ?",
+                (tier, oldest)
+            ).fetchall()
+        return [(key, json.loads(meta)) for key, meta in rows]
+
+    def _evict(self, tier, now):
+        if self.ttl_seconds:
+            self._conn.execute(
+                "DELETE FROM results WHERE tier = ? AND created < ?",
+                (tier, now - self.ttl_seconds)
+            )
+        if self.max_entries:
+            self._conn.execute(
+                "DELETE FROM results WHERE tier = ? AND key IN ("
+                " SELECT key FROM results WHERE tier = ?"
+                " ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (tier, tier, self.max_entries)
+            )
+
+    def clear(self, tier=None):
+        with self._lock, self._conn:
+            if tier is None:
+                self._conn.execute("DELETE FROM results")
+            else:
+                self._conn.execute("DELETE FROM results WHERE tier = ?", (tier,))
+
+    def stats(self):
+        """Hit/miss counters (this process) and stored entries, per tier."""
+        with self._lock:
+            counts = dict(self._conn.execute(
+                "SELECT tier, COUNT(*) FROM results GROUP BY tier"
+            ).fetchall())
+        report = {}
+        for tier in self.tiers:
+            total = self.hits[tier] + self.misses[tier]
+            report[tier] = {
+                "hits": self.hits[tier],
+                "misses": self.misses[tier],
+                "hit_rate": self.hits[tier] / total if total else 0.0,
+                "entries": counts.get(tier, 0)
+            }
+        return report
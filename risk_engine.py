@@ -0,0 +1,209 @@
+"""Batched risk scoring for many patients at once.
+
+RiskEngine loads the LightGBM booster from the published model artifact
+(see model_artifact). Without one, the booster is exported once from
+best_model.pkl to a native model file named after the pickle's checksum.
+Backends:
+
+    booster   LightGBM Booster.predict with num_threads pinned (default)
+    treelite  trees compiled to a shared library with treelite + tl2cgen
+              (optional, needs a C compiler)
+    sklearn   the pickled LGBMClassifier.predict_proba, for comparison
+
+Every backend returns P(class 1); ``score`` adds the predicted class and
+the features that pushed each prediction most (LightGBM ``pred_contrib``).
+"""
+import hashlib
+import os
+import time
+
+import numpy as np
+
+import config
+import features
+import model_artifact
+import risk_model
+
+BACKENDS = ("booster", "treelite", "sklearn")
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def native_model_path(pickle_path=risk_model.MODEL_PATH):
+    return os.path.join(config.MODEL_DIR, f"risk_model-{_file_sha256(pickle_path)[:16]}.txt")
+
+
+def load_booster(path=None):
+    """LightGBM Booster from a native model file; exported from the
+    pickle the first time when no ``path`` is given."""
+    import lightgbm
+
+    if path is None:
+        path = native_model_path()
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            risk_model.load_model(risk_model.MODEL_PATH).booster_.save_model(tmp_path)
+            os.replace(tmp_path, path)
+    return lightgbm.Booster(model_file=path)
+
+
+def _compile_treelite(booster, num_threads, lib_path):
+    import tl2cgen
+    import treelite
+
+    if not os.path.exists(lib_path):
+        os.makedirs(os.path.dirname(lib_path), exist_ok=True)
+        tmp_path = f"{lib_path}.{os.getpid()}.tmp.so"
+        tl2cgen.export_lib(
+            treelite.frontend.from_lightgbm(booster),
+            toolchain="gcc",
+            libpath=tmp_path,
+            params={"parallel_comp": max(1, num_threads)}
+        )
+        os.replace(tmp_path, lib_path)
+    return tl2cgen.Predictor(lib_path, nthread=num_threads)
+
+
+class RiskEngine:
+    def __init__(self, booster=None, backend=None, num_threads=None, classes=(0, 1), model_path=None):
+        self.backend = backend or config.RISK_BACKEND
+        if self.backend not in BACKENDS:
+            raise ValueError(f"backend must be one of {BACKENDS}, got '{self.backend}'")
+        self.num_threads = num_threads or config.RISK_NUM_THREADS
+        if booster is None and model_path is None:
+            try:
+                artifact = model_artifact.load_current()
+                booster, classes = artifact.booster, tuple(artifact.classes_.tolist())
+            except model_artifact.ArtifactError:
+                pass
+        self.booster = booster or load_booster(model_path)
+        self.features = self.booster.feature_name()
+        self.classes = classes
+
+        self._predictor = None
+        self._model = None
+        if self.backend == "treelite":
+            model_id = hashlib.sha256(self.booster.model_to_string().encode("utf-8")).hexdigest()
+            lib_path = os.path.join(config.MODEL_DIR, f"risk_model-{model_id[:16]}.so")
+            self._predictor = _compile_treelite(self.booster, self.num_threads, lib_path)
+        elif self.backend == "sklearn":
+            self._model = risk_model.load_model(risk_model.MODEL_PATH)
+
+    def matrix(self, records):
+        """float32 feature matrix for a DataFrame / list of numeric_data dicts."""
+        return features.build_matrix(records, self.features)
+
+    def predict_proba(self, X):
+        """P(class 1) for each row of a feature matrix."""
+        if self.backend == "treelite":
+            import tl2cgen
+            return np.asarray(self._predictor.predict(tl2cgen.DMatrix(X))).reshape(len(X))
+        if self.backend == "sklearn":
+            return self._model.predict_proba(X)[:, 1]
+        return self.booster.predict(X, num_threads=self.num_threads)
+
+    def contributions(self, X):
+        """Per-feature SHAP contributions (n_rows, n_features + 1 bias)."""
+        return self.booster.predict(X, pred_contrib=True, num_threads=self.num_threads)
+
+    def top_features(self, X, k=None):
+        """For each row, the ``k`` (feature, contribution, value) triples
+        with the largest absolute contribution."""
+        k = k or config.RISK_TOP_FEATURES
+        contrib = self.contributions(X)[:, :-1]
+        order = np.argsort(-np.abs(contrib), axis=1)[:, :k]
+        return [
+            [(self.features[j], float(contrib[i, j]), float(X[i, j])) for j in order[i]]
+            for i in range(len(X))
+        ]
+
+    def score(self, X, top_k=None):
+        """{"probability", "prediction", "top_features"} for every row."""
+        probability = self.predict_proba(X)
+        # same rule as LGBMClassifier.predict: argmax of [1 - p, p]
+        prediction = np.where(probability > 0.5, self.classes[1], self.classes[0])
+        result = {"probability": probability, "prediction": prediction}
+        if top_k != 0:
+            result["top_features"] = self.top_features(X, top_k)
+        return result
+
+
+# -----------------------
+# Nightly re-scoring
+# -----------------------
+def score_csv(input_path, output_path, engine=None, chunk_rows=None, top_k=None):
+    """Score every row of a patient CSV in chunks; returns the row count."""
+    import pandas as pd
+
+    import csv_ingest
+
+    engine = engine or RiskEngine()
+    chunk_rows = chunk_rows or config.CSV_CHUNK_ROWS
+    rows = 0
+    header = True
+    for chunk in pd.read_csv(input_path, chunksize=chunk_rows):
+        X = engine.matrix(chunk)
+        scores = engine.score(X, top_k)
+        out = pd.DataFrame({"probability": scores["probability"], "prediction": scores["prediction"]})
+        patient_column = csv_ingest.match_column(chunk.columns, config.CSV_PATIENT_COLUMNS)
+        if patient_column is not None:
+            out.insert(0, patient_column, chunk[patient_column].to_numpy())
+        if "top_features" in scores:
+            out["top_features"] = [
+                ";".join(f"{name}:{value:+.3f}" for name, value, _ in top)
+                for top in scores["top_features"]
+            ]
+        out.to_csv(output_path, mode="w" if header else "a", header=header, index=False)
+        header = False
+        rows += len(chunk)
+    return rows
+
+
+def _synthetic_patients(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    X = np.column_stack([
+        rng.integers(0, 12, rows),      # Pregnancies
+        rng.normal(120, 30, rows),      # Glucose
+        rng.normal(70, 12, rows),       # BloodPressure
+        rng.normal(25, 10, rows),       # SkinThickness
+        rng.gamma(2, 60, rows),         # Insulin
+        rng.normal(32, 7, rows),        # BMI
+        rng.gamma(2, 0.25, rows),       # DiabetesPedigreeFunction
+        rng.integers(21, 80, rows)      # Age
+    ]).astype(np.float32)
+    X[rng.random(X.shape) < 0.05] = np.nan
+    return X
+
+
+def benchmark(rows=100_000, backends=BACKENDS, num_threads=None, repeat=3):
+    """Rows/second of predict_proba for each available backend, plus the
+    largest probability difference from the booster backend."""
+    X = _synthetic_patients(rows)
+    report, reference = {}, None
+    for backend in backends:
+        try:
+            engine = RiskEngine(backend=backend, num_threads=num_threads)
+        except Exception as e:
+            report[backend] = {"error": f"{type(e).__name__}: {e}"}
+            continue
+        engine.predict_proba(X[:100])  # warm up
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            probability = engine.predict_proba(X)
+            best = min(best, time.perf_counter() - start)
+        if reference is None:
+            reference = probability
+        report[backend] = {
+            "rows_per_second": rows / best,
+            "seconds": best,
+            "max_abs_diff": float(np.max(np.abs(probability - reference)))
+        }
+    return report
@@ -0,0 +1,44 @@
+"""LightGBM health-risk model: loading and per-report prediction."""
+import os
+
+import numpy as np
+
+import features
+import model_artifact
+
+MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "best_model.pkl")
+
+
+def load_model(path=None):
+    """The published model artifact (hot-swappable, see model_artifact).
+
+    ``path`` to a .pkl loads a legacy joblib pickle instead, as does the
+    default when no artifact has been converted yet.
+    """
+    if path is None:
+        try:
+            return model_artifact.ModelHandle()
+        except model_artifact.ArtifactError:
+            path = MODEL_PATH
+    import joblib
+    return joblib.load(path)
+
+
+def build_features(model, numeric_data):
+    """One feature row in the model's training column order (missing -> NaN)."""
+    return features.build_features(numeric_data, features.feature_names(model))
+
+
+def predict_risk(model, numeric_data):
+    """Model prediction, or a message explaining why there is none."""
+    if numeric_data and model:
+        try:
+            row = build_features(model, numeric_data)
+            if np.isnan(row).all():
+                return "Insufficient numerical data"
+            prediction = model.predict(row)[0]
+            # numpy scalar -> plain Python so it serializes cleanly
+            return prediction.item() if hasattr(prediction, "item") else prediction
+        except Exception as e:
+            return f"Could not generate prediction: {str(e)}"
+    return "Insufficient numerical data"
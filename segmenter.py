@@ -0,0 +1,154 @@
+"""Single-pass sentence segmentation that keeps clinical numbers and units.
+
+``segment_spans`` walks the text once with one precompiled boundary
+pattern and returns (start, end) character offsets into the original
+string; nothing is copied until a caller slices a sentence out. Boundaries
+are sentence punctuation followed by whitespace (not after abbreviations
+such as "Dr." or "approx."), blank lines and list items; decimals
+("7.2"), ranges ("70-100"), units ("mg/dL", "%") and ratios stay inside
+their sentence. Sentences longer than MAX_SENTENCE_CHARS are split at the
+last whitespace before the limit, so unpunctuated OCR text still comes
+out in pieces.
+
+``Segmenter`` does the same incrementally over a stream of text chunks
+(e.g. extractor.extract_text_stream), keeping only the unfinished tail;
+it gives the same normalized sentences as ``sentences_with_spans``.
+"""
+import re
+
+MIN_SENTENCE_CHARS = 6
+MAX_SENTENCE_CHARS = 1000
+
+_BOUNDARY = re.compile(
+    r"(?<=[.!?])[\"')\]]*\s+"             # end punctuation (+ closing quote) then space
+    r"|\n[ \t]*\n\s*"                     # blank line
+    r"|\n(?=[ \t]*(?:[-*•]|\d{1,2}[.)])\s)"  # next line starts a list item
+)
+_ABBREVIATION = re.compile(
+    r"(?:^|[\s(])(?:dr|mr|mrs|ms|prof|vs|no|approx|appr|fig|ref|inc|st|wt|ht|hr|min|max|"
+    r"e\.g|i\.e|etc|b\.i\.d|t\.i\.d|q\.i\.d)\.[\"')\]]*$",
+    re.IGNORECASE
+)
+# anything but letters, digits, whitespace and the punctuation that
+# carries meaning in lab text (7.2%, 70-100, mg/dL, <5, 1:100, ?)
+_JUNK = re.compile(r"[^\w\s.,;:%/+\-<>=()'°µ^!?]+")
+
+
+def _is_abbreviation(text, boundary_start):
+    return bool(_ABBREVIATION.search(text, max(0, boundary_start - 12), boundary_start))
+
+
+_LEADING_SPACE = re.compile(r"\s*")
+
+
+def _trimmed(text, start, end):
+    start = _LEADING_SPACE.match(text, start, end).end()
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def _split_long(text, start, end, max_chars):
+    while end - start > max_chars:
+        cut = text.rfind(" ", start + max_chars // 2, start + max_chars)
+        cut = cut if cut > start else start + max_chars
+        yield start, cut
+        start, _ = _trimmed(text, cut, end)
+    yield start, end
+
+
+def _spans(text, boundaries, start, min_chars, max_chars):
+    """Sentence spans from ``start`` up to each boundary match; returns the
+    position after the last boundary used."""
+    spans = []
+    for match in boundaries:
+        end = match.start()
+        if text[end - 1] in ".\"')]" and _is_abbreviation(text, end):
+            continue
+        s, e = _trimmed(text, start, end)
+        if e - s > max_chars:
+            spans.extend(_split_long(text, s, e, max_chars))
+        elif e - s >= min_chars:
+            spans.append((s, e))
+        start = match.end()
+    return spans, start
+
+
+def segment_spans(text, min_chars=MIN_SENTENCE_CHARS, max_chars=MAX_SENTENCE_CHARS):
+    """(start, end) offsets of every sentence in ``text``."""
+    spans, start = _spans(text, _BOUNDARY.finditer(text), 0, min_chars, max_chars)
+    s, e = _trimmed(text, start, len(text))
+    if e - s >= min_chars:
+        spans.extend(_split_long(text, s, e, max_chars))
+    return spans
+
+
+def normalize(sentence):
+    """Lower-cased sentence with junk characters dropped and whitespace
+    collapsed; numbers and units are kept."""
+    return " ".join(_JUNK.sub("", sentence).lower().split())
+
+
+def sentences_with_spans(text, min_chars=MIN_SENTENCE_CHARS, max_chars=MAX_SENTENCE_CHARS):
+    """(start, end, normalized sentence) for every sentence of ``text``."""
+    out = []
+    for start, end in segment_spans(text, min_chars, max_chars):
+        sentence = normalize(text[start:end])
+        if len(sentence) >= min_chars:
+            out.append((start, end, sentence))
+    return out
+
+
+def sentences(text, min_chars=MIN_SENTENCE_CHARS, max_chars=MAX_SENTENCE_CHARS):
+    """Normalized sentences of ``text`` (what the NLP models get)."""
+    return [sentence for _, _, sentence in sentences_with_spans(text, min_chars, max_chars)]
+
+
+class Segmenter:
+    """Incremental segmentation over a text stream.
+
+    ``feed(chunk)`` returns (start, end, normalized sentence) for the
+    sentences completed so far, with offsets into the concatenated stream;
+    ``close()`` returns the rest. Only the text after the last boundary is
+    buffered.
+    """
+
+    def __init__(self, min_chars=MIN_SENTENCE_CHARS, max_chars=MAX_SENTENCE_CHARS):
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self._buffer = ""
+        self._offset = 0  # stream position of _buffer[0]
+
+    def _emit(self, spans):
+        out = []
+        for s, e in spans:
+            sentence = normalize(self._buffer[s:e])
+            if len(sentence) >= self.min_chars:
+                out.append((self._offset + s, self._offset + e, sentence))
+        return out
+
+    def feed(self, chunk):
+        self._buffer += chunk
+        # a boundary touching the end of the buffer may still grow (more
+        # whitespace, a second newline), so only use the ones before it
+        matches = [m for m in _BOUNDARY.finditer(self._buffer) if m.end() < len(self._buffer)]
+        spans, consumed = _spans(self._buffer, matches, 0, self.min_chars, self.max_chars)
+
+        # no boundary in sight: flush full-length pieces of a run-on sentence
+        if len(self._buffer) - consumed > 2 * self.max_chars:
+            s, e = _trimmed(self._buffer, consumed, len(self._buffer))
+            pieces = list(_split_long(self._buffer, s, e, self.max_chars))
+            spans.extend(pieces[:-1])
+            consumed = pieces[-1][0]
+
+        out = self._emit(spans)
+        self._buffer = self._buffer[consumed:]
+        self._offset += consumed
+        return out
+
+    def close(self):
+        s, e = _trimmed(self._buffer, 0, len(self._buffer))
+        out = self._emit(_split_long(self._buffer, s, e, self.max_chars)) if e - s >= self.min_chars else []
+        self._offset += len(self._buffer)
+        self._buffer = ""
+        return out
@@ -0,0 +1,247 @@
+"""Pre-NLP sentence filter: drop what the transformer models need not see.
+
+Multi-page reports repeat the same headers, footers, disclaimers and
+reference-range lines on every page. Before NER and intent classification,
+``filter_sentences`` removes, in this order:
+
+    boilerplate   sentences matching the boilerplate dictionary (regex
+                  patterns plus sentences learned from many reports)
+    numeric       number / table rows where digits outweigh letters
+    exact         repeats of an earlier sentence after normalization
+    near          near-repeats (MinHash over character shingles, LSH banding)
+                  with the same negation cues
+
+A sentence the lexicon finds a disease, food, nutrient or diagnosis cue in
+is never dropped as boilerplate or numeric: the segmenter does not split on
+single newlines, so a "Page 1 of 3" footer often shares a sentence with the
+diagnosis line below it. Only the text outside the boilerplate match counts.
+
+The result keeps the surviving sentences, their indices in the original
+list, which kept sentence each original was folded into, and per-reason
+removal counts.
+"""
+import json
+import os
+import re
+import zlib
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+
+import config
+import lexicon
+
+# Bump when filtering rules change so cached NLP results are recomputed
+FILTER_VERSION = "2"
+
+DEFAULT_BOILERPLATE_PATTERNS = (
+    r"^page \d+( of \d+)?$",
+    r"\bpage \d+ of \d+\b",
+    r"\breference (range|interval)s?\b",
+    r"\b(biological|normal) ref(erence)?\.? (range|interval)\b",
+    r"\belectronically (signed|verified)\b",
+    r"\b(printed|reported|generated) (on|at|by)\b",
+    r"\bthis (report|document) is (confidential|computer generated)\b",
+    r"\bnot valid for medico ?legal\b",
+    r"\b(end of report|report end)\b",
+    r"\bdisclaimer\b",
+    r"\b(lab|laboratory) director\b",
+    r"\bresults relate only to the sample\b",
+    r"\bkindly correlate clinically\b"
+)
+
+_SPACES = re.compile(r"\s+")
+_DIGIT = re.compile(r"\d")
+_NEGATION = re.compile(
+    r"\b(?:no|not|non|nor|never|without|denies|denied|negative|absent|free of|ruled out|r/o)\b"
+)
+
+SHINGLE_SIZE = 5
+NUM_PERM = 64
+BANDS = 16
+_PRIME = (1 << 61) - 1
+
+
+def normalize(sentence):
+    return _SPACES.sub(" ", sentence.lower()).strip()
+
+
+def has_clinical_term(sentence):
+    """True when the lexicon finds any term (disease, food, nutrient or
+    diagnosis cue) in ``sentence``."""
+    return bool(lexicon.get_lexicon().match(sentence))
+
+
+def negation_cues(normalized):
+    return frozenset(_NEGATION.findall(normalized))
+
+
+def is_numeric_row(sentence):
+    """At least as many digits as letters, and no clinical term."""
+    digits = len(_DIGIT.findall(sentence))
+    if not digits:
+        return False
+    letters = sum(c.isalpha() for c in sentence)
+    return digits >= letters and not has_clinical_term(sentence)
+
+
+# -----------------------
+# Boilerplate dictionary
+# -----------------------
+class Boilerplate:
+    def __init__(self, patterns=DEFAULT_BOILERPLATE_PATTERNS, sentences=()):
+        self.patterns = list(patterns)
+        self._regex = re.compile("|".join(f"(?:{p})" for p in self.patterns)) if self.patterns else None
+        self.sentences = set(sentences)
+
+    def matches(self, normalized):
+        """A learned sentence, or pattern matches with no clinical term in
+        the text left once the matched spans are cut out."""
+        if normalized in self.sentences:
+            return not has_clinical_term(normalized)
+        if self._regex is None:
+            return False
+        rest, found = self._regex.subn(" ", normalized)
+        return bool(found) and not has_clinical_term(rest)
+
+    def learn(self, reports, min_reports=3):
+        """Add normalized sentences seen in at least ``min_reports`` of
+        ``reports`` (each a list of sentences); returns how many were new."""
+        counts = Counter()
+        for sentences in reports:
+            counts.update({normalize(s) for s in sentences})
+        learned = {s for s, n in counts.items() if n >= min_reports and not is_numeric_row(s)}
+        new = learned - self.sentences
+        self.sentences |= learned
+        return len(new)
+
+    def save(self, path=None):
+        path = path or config.BOILERPLATE_PATH
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"patterns": self.patterns, "sentences": sorted(self.sentences)}, f, indent=1)
+
+    @classmethod
+    def load(cls, path=None):
+        """Dictionary from ``path`` (default BOILERPLATE_PATH), or the
+        built-in patterns when there is no file."""
+        path = path or config.BOILERPLATE_PATH
+        if not os.path.exists(path):
+            return cls()
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data.get("patterns", DEFAULT_BOILERPLATE_PATTERNS), data.get("sentences", ()))
+
+
+# -----------------------
+# MinHash
+# -----------------------
+_rng = np.random.default_rng(20240601)
+_PERM_A = _rng.integers(1, _PRIME, NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.integers(0, _PRIME, NUM_PERM, dtype=np.uint64)
+
+
+def minhash(normalized):
+    """NUM_PERM-value MinHash signature of the character shingles."""
+    text = normalized if len(normalized) >= SHINGLE_SIZE else normalized.ljust(SHINGLE_SIZE)
+    shingles = {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+    # (a * x + b) mod p for every permutation, min over shingles; crc32
+    # values are < 2**32 and a < 2**61, so wrap-around only scrambles further
+    return ((np.outer(_PERM_A, hashes) + _PERM_B[:, None]) % np.uint64(_PRIME)).min(axis=1)
+
+
+@dataclass
+class FilterResult:
+    sentences: List[str]               # kept sentences, in document order
+    index: List[int]                   # original index of each kept sentence
+    source: List[Optional[int]]        # per original: kept position it maps to, None if dropped
+    removed: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def removed_total(self):
+        return sum(self.removed.values())
+
+
+def filter_sentences(sentences, boilerplate=None, near_threshold=None):
+    """Filter ``sentences`` (see module docstring); nothing is modified,
+    kept sentences are returned as-is.
+
+    >>> filter_sentences([
+    ...     "Page 1 of 3 Diagnosis: type 2 diabetes mellitus with dyslipidemia.",
+    ...     "Reference range for HbA1c given; patient is a known case of hypertension.",
+    ...     "Diagnosis: T2DM.",
+    ...     "Patient has type 2 diabetes mellitus and hypertension.",
+    ...     "Patient has no type 2 diabetes mellitus and hypertension.",
+    ...     "Page 2 of 3",
+    ...     "70 - 100 mg/dl 5.7 %",
+    ... ], Boilerplate(), near_threshold=0.8).removed
+    {'boilerplate': 1, 'numeric': 1, 'exact': 0, 'near': 0}
+    """
+    boilerplate = boilerplate if boilerplate is not None else get_boilerplate()
+    near_threshold = config.SENTENCE_NEAR_DUP if near_threshold is None else near_threshold
+    rows_per_band = NUM_PERM // BANDS
+
+    kept, index, source = [], [], []
+    removed = {"boilerplate": 0, "numeric": 0, "exact": 0, "near": 0}
+    seen = {}                      # normalized -> kept position
+    signatures = []                # per kept sentence
+    negations = []                 # per kept sentence
+    buckets = {}                   # (band, band hash) -> kept positions
+
+    for sentence in sentences:
+        normalized = normalize(sentence)
+        if boilerplate.matches(normalized):
+            removed["boilerplate"] += 1
+            source.append(None)
+            continue
+        if is_numeric_row(normalized):
+            removed["numeric"] += 1
+            source.append(None)
+            continue
+        if normalized in seen:
+            removed["exact"] += 1
+            source.append(seen[normalized])
+            continue
+
+        signature = None
+        if near_threshold:
+            signature = minhash(normalized)
+            keys = [(b, signature[b * rows_per_band:(b + 1) * rows_per_band].tobytes()) for b in range(BANDS)]
+            candidates = {position for key in keys for position in buckets.get(key, ())}
+            # "no diabetes" must not fold into "diabetes"
+            cues = negation_cues(normalized)
+            match = next((
+                position for position in sorted(candidates)
+                if negations[position] == cues and np.mean(signatures[position] == signature) >= near_threshold
+            ), None)
+            if match is not None:
+                removed["near"] += 1
+                seen[normalized] = match
+                source.append(match)
+                continue
+
+        position = len(kept)
+        seen[normalized] = position
+        kept.append(sentence)
+        index.append(len(source))
+        source.append(position)
+        if signature is not None:
+            signatures.append(signature)
+            negations.append(cues)
+            for key in keys:
+                buckets.setdefault(key, []).append(position)
+
+    return FilterResult(kept, index, source, removed)
+
+
+_boilerplate = None
+
+
+def get_boilerplate():
+    global _boilerplate
+    if _boilerplate is None:
+        _boilerplate = Boilerplate.load()
+    return _boilerplate